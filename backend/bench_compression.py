@@ -0,0 +1,83 @@
+# backend/bench_compression.py
+# Bytes on the wire and compression CPU per request for the big JSON
+# responses (search page, dashboard, admin users), at each gzip level and
+# Brotli quality, then end to end through CompressionMiddleware with the
+# configured settings. Payloads come from bench_serialize - no server needed.
+#
+#   python bench_compression.py --rows 10000
+import argparse
+import asyncio
+import gzip
+import sys
+import time
+import bench_serialize
+import compression
+import fastjson
+import main
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, out
+
+
+def codecs():
+    out = [(f"gzip {level}", lambda body, level=level: gzip.compress(body, level)) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        out += [(f"br {q}", lambda body, q=q: compression.brotli.compress(body, mode=compression.brotli.MODE_TEXT, quality=q))
+                for q in (1, 4, 6, 11)]
+    return out
+
+
+def through_middleware(body, accept_encoding):
+    """One request through CompressionMiddleware around an app that returns `body`."""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "method": "GET", "path": "/bench", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(compression.CompressionMiddleware(app)(scope, receive, send))
+    return b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+
+
+def main_():
+    parser = argparse.ArgumentParser(description="Response compression size/CPU report")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"brotli: {'yes' if compression.brotli else 'no (gzip only)'}, "
+          f"middleware: gzip {compression.GZIP_LEVEL} / br {compression.BROTLI_QUALITY}, "
+          f"min {compression.COMPRESS_MIN_BYTES} bytes, {args.rows:,} rows per list\n")
+    for name, build in (("/books/search/", bench_serialize.search_payload),
+                        ("/admin/dashboard-stats", bench_serialize.dashboard_payload),
+                        ("/admin/users", bench_serialize.users_payload)):
+        payload, _, lists = build(args.rows)
+        for fmt in ("rows", "columnar"):
+            body = fastjson.dumps(main.list_payload(payload, fmt, **lists))
+            print(f"📦 {name}?format={fmt}: {len(body):,} bytes uncompressed")
+            print(f"   {'':10}{'bytes':>12}{'ratio':>8}{'cpu ms':>9}")
+            for label, fn in codecs():
+                ms, out = best_of(lambda: fn(body), args.repeat)
+                print(f"   {label:10}{len(out):12,}{len(body) / len(out):7.1f}x{ms:9.1f}")
+            for accept in ("gzip", "gzip, br"):
+                ms, out = best_of(lambda: through_middleware(body, accept), args.repeat)
+                print(f"   ➡️  middleware ({accept}): {len(out):,} bytes, {ms:.1f}ms per request")
+            print()
+
+
+if __name__ == "__main__":
+    sys.exit(main_())
@@ -0,0 +1,134 @@
+# backend/bench_inventory.py
+# Oversell stress test: hundreds of concurrent issue-book and approve-request
+# calls fight over a handful of copies. Passes only if stock never goes below
+# zero, exactly as many loans exist as copies were taken, no student is over
+# their token limit and the dashboard counters still match. Runs on a
+# throwaway SQLite file (or DATABASE_URL if --use-env is given).
+#
+#   python bench_inventory.py --threads 64 --attempts 400 --copies 25
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+if "--use-env" not in sys.argv:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_inventory.db')}"
+
+from datetime import date
+from fastapi import HTTPException
+from sqlalchemy import insert, select, func
+import database
+import models
+import main
+import library_stats
+
+ADMIN = SimpleNamespace(id=0, role="admin")
+
+
+def setup(db, copies, students, tokens):
+    book_ids = []
+    for label in ("issue", "approve"):
+        book = models.Book(acc_no=f"STRESS-{label}-{time.time_ns()}", title=f"Stress test ({label})",
+                           total_copies=copies, available_copies=copies)
+        db.add(book)
+        db.flush()
+        book_ids.append(book.id)
+    suffix = time.time_ns()
+    db.execute(insert(models.User), [{
+        "full_name": f"Stress {i}", "email": f"stress{i}-{suffix}@cbit.edu.in", "hashed_password": "x",
+        "role": "student", "max_tokens": tokens,
+    } for i in range(students)])
+    emails = [f"stress{i}-{suffix}@cbit.edu.in" for i in range(students)]
+    user_ids = list(db.execute(select(models.User.id).where(models.User.email.in_(emails))).scalars())
+    db.commit()
+    library_stats.reconcile(db)
+    return book_ids, emails, user_ids
+
+
+def attempt(fn):
+    with database.SessionLocal() as db:
+        try:
+            fn(db)
+            return "ok"
+        except HTTPException as e:
+            return f"{e.status_code} {e.detail}"
+        except Exception as e:  # "database is locked" and friends
+            return type(e).__name__
+
+
+def main_():
+    parser = argparse.ArgumentParser(description="Concurrent issue/approve oversell test")
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--attempts", type=int, default=400, help="calls per path (issue and approve)")
+    parser.add_argument("--copies", type=int, default=25)
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--tokens", type=int, default=3)
+    parser.add_argument("--use-env", action="store_true", help="run against DATABASE_URL instead of a temp file")
+    args = parser.parse_args()
+
+    with database.SessionLocal() as db:
+        (issue_book_id, approve_book_id), emails, user_ids = setup(db, args.copies, args.students, args.tokens)
+        acc_no = db.get(models.Book, issue_book_id).acc_no
+        db.execute(insert(models.RentRequest), [{
+            "user_id": user_ids[i % len(user_ids)], "book_id": approve_book_id,
+            "request_date": date.today(), "status": "pending",
+        } for i in range(args.attempts)])
+        db.commit()
+        request_ids = list(db.execute(
+            select(models.RentRequest.id).where(models.RentRequest.book_id == approve_book_id)
+        ).scalars())
+
+    calls = [
+        lambda db, e=emails[i % len(emails)]: main.issue_book(
+            main.IssueRequest(student_email=e, book_acc_no=acc_no), db=db, current_user=ADMIN)
+        for i in range(args.attempts)
+    ] + [
+        lambda db, r=r: main.approve_request(r, current_user=ADMIN, db=db)
+        for r in request_ids
+    ]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        outcomes = Counter(pool.map(attempt, calls))
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(calls)} calls on {args.threads} threads in {elapsed:.1f}s")
+    for outcome, n in outcomes.most_common():
+        print(f"   {n:>6}  {outcome}")
+
+    failures = []
+    with database.SessionLocal() as db:
+        for book_id in (issue_book_id, approve_book_id):
+            book = db.get(models.Book, book_id)
+            loans = db.execute(select(func.count(models.Transaction.id)).where(
+                models.Transaction.book_id == book_id, models.Transaction.return_date == None)).scalar()
+            print(f"\n📚 {book.title}: {loans} loans, {book.available_copies}/{book.total_copies} left")
+            if book.available_copies < 0:
+                failures.append(f"negative stock on {book.title}")
+            if loans + book.available_copies != book.total_copies:
+                failures.append(f"{book.title}: loans + stock != copies")
+        over = db.execute(
+            select(models.Transaction.user_id, func.count(models.Transaction.id))
+            .where(models.Transaction.user_id.in_(user_ids), models.Transaction.return_date == None)
+            .group_by(models.Transaction.user_id)
+            .having(func.count(models.Transaction.id) > args.tokens)
+        ).all()
+        if over:
+            failures.append(f"{len(over)} students over their token limit")
+        stored, actual = library_stats.reconcile(db)
+        if stored != actual:
+            failures.append(f"library_stats drifted: {stored} vs {actual}")
+
+    if failures:
+        for f in failures:
+            print(f"❌ {f}")
+        sys.exit(1)
+    print("\n✅ No oversell, token limits held, counters in sync")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,110 @@
+# backend/bench_load.py
+# Concurrency load test against a running server: many clients searching the
+# catalogue while admins hammer /admin/issue-book. Reports latency and every
+# non-2xx status (500s here usually mean "database is locked").
+#
+#   uvicorn main:app --workers 4
+#   python bench_load.py --clients 64 --seconds 30 \
+#       --admin admin@cbit.edu.in --password admin123 \
+#       --student 232p1a3233@cbit.edu.in --acc-no 001-020
+#
+# issue-book mostly answers 400 once the student hits their token limit or
+# the book runs out - that still takes the write path, which is the point.
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+SEARCH_TERMS = ["programming", "circuit", "data", "kochan", "thermo", "management", "physics", "c", "design"]
+
+
+def call(method, url, body=None, token=None, form=False):
+    headers = {}
+    data = None
+    if body is not None:
+        if form:
+            data = urllib.parse.urlencode(body).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        else:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            resp.read()
+            code = resp.status
+    except urllib.error.HTTPError as e:
+        code = e.code
+    except (urllib.error.URLError, TimeoutError):
+        code = 0
+    return code, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent search + issue-book load test")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="share of requests that are issue-book")
+    parser.add_argument("--admin", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--student", required=True)
+    parser.add_argument("--acc-no", required=True)
+    args = parser.parse_args()
+
+    req = urllib.request.Request(
+        f"{args.base_url}/login",
+        data=urllib.parse.urlencode({"username": args.admin, "password": args.password}).encode(),
+    )
+    with urllib.request.urlopen(req) as resp:
+        token = json.load(resp)["access_token"]
+
+    results = {"search": [], "issue": []}
+    statuses = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def client(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            if rng.random() < args.write_ratio:
+                kind = "issue"
+                code, ms = call("POST", f"{args.base_url}/admin/issue-book",
+                                {"student_email": args.student, "book_acc_no": args.acc_no}, token=token)
+            else:
+                kind = "search"
+                q = urllib.parse.quote(rng.choice(SEARCH_TERMS))
+                code, ms = call("GET", f"{args.base_url}/books/search/?query={q}")
+            with lock:
+                results[kind].append(ms)
+                statuses[(kind, code)] += 1
+
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        list(pool.map(client, range(args.clients)))
+
+    print(f"{'endpoint':10}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for kind, samples in results.items():
+        if not samples:
+            continue
+        samples.sort()
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        print(f"{kind:10}{len(samples):>10}{len(samples) / args.seconds:>10.1f}"
+              f"{statistics.median(samples):>10.1f}{p99:>10.1f}")
+    print("\nstatus codes:")
+    for (kind, code), n in sorted(statuses.items()):
+        flag = "  ❌" if code >= 500 or code == 0 else ""
+        print(f"   {kind:8}{code:>5}{n:>8}{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# backend/bench_login.py
+# Login-storm benchmark against a running server: many clients log in at
+# once while one client keeps searching the catalogue. Shows login latency,
+# how many logins were shed with 429, and whether search stays responsive
+# while bcrypt is busy.
+#
+#   uvicorn main:app --workers 2
+#   python bench_login.py --clients 200 --seconds 20 \
+#       --email 232p1a3233@cbit.edu.in --password secret
+#
+# Try it with different BCRYPT_ROUNDS / PASSWORD_WORKERS / PASSWORD_MAX_PENDING
+# settings on the server side.
+import argparse
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_load import call
+
+
+def summarise(name, samples, seconds):
+    if not samples:
+        print(f"{name:10}{0:>10}")
+        return
+    samples.sort()
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:10}{len(samples):>10}{len(samples) / seconds:>10.1f}"
+          f"{statistics.median(samples):>10.1f}{p99:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent login storm + search probe")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    args = parser.parse_args()
+
+    logins, searches = [], []
+    statuses = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+    form = {"username": args.email, "password": args.password}
+
+    def login_client(_):
+        while time.perf_counter() < deadline:
+            code, ms = call("POST", f"{args.base_url}/login", form, form=True)
+            with lock:
+                statuses[code] += 1
+                if code == 200:
+                    logins.append(ms)
+            if code == 429:
+                time.sleep(0.05)
+
+    def search_probe():
+        while time.perf_counter() < deadline:
+            code, ms = call("GET", f"{args.base_url}/books/search/?query=data&limit=20")
+            searches.append(ms)
+            time.sleep(0.1)
+
+    probe = threading.Thread(target=search_probe)
+    probe.start()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        list(pool.map(login_client, range(args.clients)))
+    probe.join()
+
+    print(f"{'endpoint':10}{'ok':>10}{'ok/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    summarise("login", logins, args.seconds)
+    summarise("search", searches, args.seconds)
+    print("\nlogin status codes:")
+    for code, n in sorted(statuses.items()):
+        flag = "  ❌" if code >= 500 or code == 0 else ""
+        print(f"   {code:>5}{n:>8}{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# backend/bench_search.py
+# Compares the old 4-column LIKE scan with the full-text index on a synthetic
+# catalogue, and times mode=fuzzy on the same queries with a typo added.
+# Uses its own throwaway SQLite file, never library.db.
+#
+#   python bench_search.py --rows 500000
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import insert, select, or_
+from sqlalchemy.orm import Session
+import database
+import models
+import migrations
+import search
+
+WORDS = [
+    "programming", "introduction", "analysis", "design", "circuits", "digital", "signals",
+    "systems", "thermodynamics", "fluid", "mechanics", "structural", "concrete", "machine",
+    "learning", "data", "structures", "algorithms", "operating", "networks", "database",
+    "engineering", "mathematics", "calculus", "linear", "algebra", "physics", "chemistry",
+    "management", "marketing", "finance", "accounting", "electronics", "power", "control",
+    "communication", "microprocessors", "compiler", "theory", "applied", "advanced", "basic",
+]
+SURNAMES = [
+    "kochan", "forouzan", "bakshi", "ramana", "grewal", "kotler", "tanenbaum", "silberschatz",
+    "cormen", "sedra", "smith", "haykin", "nagrath", "rao", "reddy", "sharma", "gupta", "iyer",
+]
+DEPARTMENTS = ["CSE", "ECE", "EEE", "CIVIL", "Mech", "MBA", "BS&H.", "General"]
+
+
+def make_rows(n, rng):
+    for i in range(n):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).title()
+        author = f"{rng.choice('ABCDEFGHKMNPRSV')}. {rng.choice(SURNAMES).title()}{rng.randint(1, 999)}"
+        yield {
+            "acc_no": str(100000 + i),
+            "title": title,
+            "author": author,
+            "department": rng.choice(DEPARTMENTS),
+            "publisher": "Synthetic",
+            "total_copies": 1,
+            "available_copies": 1,
+        }
+
+
+def like_search(query):
+    # The query /books/search/ used to run
+    return select(*search.BOOK_COLUMNS).where(
+        or_(
+            models.Book.title.contains(query),
+            models.Book.author.contains(query),
+            models.Book.acc_no.contains(query),
+            models.Book.department.contains(query),
+        )
+    )
+
+
+def add_typo(query, rng):
+    # One substitution, deletion or transposition in the longest word
+    words = query.split()
+    i = max(range(len(words)), key=lambda n: len(words[n]))
+    w = words[i]
+    p = rng.randrange(1, len(w) - 1)
+    edit = rng.randint(0, 2)
+    if edit == 0:
+        w = w[:p] + rng.choice("aeiourst") + w[p + 1:]
+    elif edit == 1:
+        w = w[:p] + w[p + 1:]
+    else:
+        w = w[:p - 1] + w[p] + w[p - 1] + w[p + 1:]
+    words[i] = w
+    return " ".join(words)
+
+
+def timed(engine, run, queries):
+    samples = []
+    with Session(engine) as db:
+        for q in queries:
+            start = time.perf_counter()
+            run(db, q)
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return statistics.median(samples), p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /books/search/ query plans")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    path = os.path.join(tempfile.mkdtemp(), "bench_search.db")
+    engine = database.build_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine, log=lambda msg: None)
+    search.setup_search_index(engine)
+
+    print(f"📥 Loading {args.rows} synthetic books into {path} ...")
+    batch = []
+    with engine.begin() as conn:
+        for row in make_rows(args.rows, rng):
+            batch.append(row)
+            if len(batch) == 10_000:
+                conn.execute(insert(models.Book), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(models.Book), batch)
+
+    # Typical search-box input: a surname, a title word, a partial word, an accession number
+    queries = []
+    for _ in range(args.queries):
+        kind = rng.randint(0, 3)
+        if kind == 0:
+            queries.append(f"{rng.choice(SURNAMES)}{rng.randint(1, 999)}")
+        elif kind == 1:
+            queries.append(f"{rng.choice(WORDS)} {rng.choice(SURNAMES)}{rng.randint(1, 999)}")
+        elif kind == 2:
+            queries.append(f"{rng.choice(SURNAMES)}{rng.randint(1, 99)}")
+        else:
+            queries.append(str(100000 + rng.randrange(args.rows)))
+
+    like_p50, like_p99 = timed(engine, lambda db, q: db.execute(like_search(q)).all(), queries)
+    fts_p50, fts_p99 = timed(engine, lambda db, q: db.execute(search.build_search(q)[0]).all(), queries)
+    typos = [add_typo(q, rng) for q in queries]
+    fuzzy_p50, fuzzy_p99 = timed(engine, lambda db, q: search.fuzzy_page(db, q), typos)
+
+    print(f"\n{'':10}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'LIKE':10}{like_p50:10.2f}{like_p99:10.2f}")
+    print(f"{search.SEARCH_BACKEND:10}{fts_p50:10.2f}{fts_p99:10.2f}")
+    print(f"{'fuzzy':10}{fuzzy_p50:10.2f}{fuzzy_p99:10.2f}  ({search.FUZZY_BACKEND}, one typo per query)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# backend/bench_serialize.py
+# Encode time and payload size of the large list responses (search page,
+# dashboard active loans, admin users) at 10k rows, for each way the API can
+# serialise them. No server or database rows involved - the payloads are
+# built with the real row builders from synthetic data.
+#
+#   python bench_serialize.py --rows 10000
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_serialize.db')}")
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+import fastjson
+import main
+
+
+def search_payload(n):
+    items = [{
+        "id": i, "acc_no": str(100000 + i), "title": f"Data Structures Using C, Volume {i % 7}",
+        "author": "Aaron M. Tenenbaum", "department": "CSE", "publisher": "Pearson",
+        "edition_year": "2019", "total_copies": 3, "available_copies": i % 4,
+    } for i in range(n)]
+    return {"items": items, "next_cursor": "WyJkYXRhIiwxMDAwMF0", "total_estimate": n}, main.SearchPage, {"items": main.BookOut}
+
+
+def dashboard_payload(n):
+    today = date.today()
+    loans = [main.active_loan_row(SimpleNamespace(
+        id=i, full_name=f"Student Name {i}", email=f"23p1a{i:05d}@cbit.edu.in", mobile_number=f"98480{i:05d}",
+        branch="CSE", year="3", photo_url=f"/uploads/user_{i}_0123456789abcdef.jpg", registration_number=f"23P1A{i:05d}",
+        title="Computer Networks", acc_no=str(200000 + i), issue_date=today - timedelta(days=10),
+        due_date=today + timedelta(days=5), accrued_fine=0.0,
+    ), today) for i in range(n)]
+    payload = {"total_books": 500000, "books_lent": n, "available_copies": 400000,
+               "borrow_requests": [], "return_requests": [], "active_loans": loans}
+    lists = {"borrow_requests": main.BorrowRequestOut, "return_requests": main.ReturnRequestOut,
+             "active_loans": main.ActiveLoanOut}
+    return payload, main.DashboardStats, lists
+
+
+def users_payload(n):
+    items = [{
+        "id": i, "full_name": f"Student Name {i}", "email": f"23p1a{i:05d}@cbit.edu.in", "role": "student",
+        "registration_number": f"23P1A{i:05d}", "photo_url": f"http://127.0.0.1:8000/uploads/user_{i}_0123456789abcdef.jpg",
+        "photo_thumb_url": None, "active_loans": i % 3,
+    } for i in range(n)]
+    return {"items": items, "total": n, "next_offset": None}, main.UserPage, {"items": main.UserListItem}
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, body
+
+
+def main_():
+    parser = argparse.ArgumentParser(description="List response serialisation benchmark")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if fastjson.orjson else 'no (stdlib fallback)'}, {args.rows:,} rows per list\n")
+    for name, build in (("/books/search/", search_payload), ("/admin/dashboard-stats", dashboard_payload),
+                        ("/admin/users", users_payload)):
+        payload, model, lists = build(args.rows)
+        adapter = TypeAdapter(model)
+        variants = [
+            ("dict -> jsonable_encoder", lambda: json.dumps(jsonable_encoder(payload)).encode()),
+            ("response_model validate", lambda: adapter.dump_json(adapter.validate_python(payload))),
+            ("fastjson rows", lambda: fastjson.dumps(payload)),
+            ("fastjson columnar", lambda: fastjson.dumps(main.list_payload(payload, "columnar", **lists))),
+        ]
+        print(f"📦 {name}")
+        print(f"   {'':26}{'encode ms':>10}{'bytes':>12}{'gzip bytes':>12}")
+        for label, fn in variants:
+            ms, body = best_of(fn, args.repeat)
+            print(f"   {label:26}{ms:10.1f}{len(body):12,}{len(gzip.compress(body, 6)):12,}")
+        print()
+
+
+if __name__ == "__main__":
+    sys.exit(main_())
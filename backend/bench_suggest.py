@@ -0,0 +1,63 @@
+# backend/bench_suggest.py
+# Memory budget and lookup latency of the type-ahead index (suggest.py) on a
+# synthetic catalogue. Entirely in memory - no database is touched.
+#
+#   python bench_suggest.py --titles 500000
+import argparse
+import gc
+import random
+import statistics
+import time
+from bench_search import make_rows
+import suggest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Type-ahead index memory/latency report")
+    parser.add_argument("--titles", type=int, default=500_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=suggest.DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    rows = [(r["title"], r["author"], r["acc_no"]) for r in make_rows(args.titles, rng)]
+
+    # The server doesn't keep these rows around; don't let the collector
+    # walking 500k tuples show up as lookup latency
+    gc.collect()
+    gc.freeze()
+
+    index = suggest.SuggestIndex()
+    start = time.perf_counter()
+    index.load(rows)
+    build = time.perf_counter() - start
+
+    stats = index.stats()
+    entries = sum(stats["entries"].values())
+    print(f"📚 {args.titles:,} books -> {entries:,} distinct entries {stats['entries']}")
+    print(f"🏗️  Build: {build:.2f}s")
+    print(f"💾 Memory: {stats['approx_bytes'] / 2**20:.1f} MiB (~{stats['approx_bytes'] / entries:.0f} bytes/entry)")
+
+    # What people type: 1-8 leading characters of a real title, author or acc no
+    prefixes = []
+    for _ in range(args.lookups):
+        value = rng.choice(rows)[rng.randrange(3)]
+        prefixes.append(value[:rng.randint(1, 8)])
+
+    timings = []
+    for prefix in prefixes:
+        t = time.perf_counter()
+        index.complete(prefix, args.limit)
+        timings.append((time.perf_counter() - t) * 1e6)
+    timings.sort()
+    print(f"⚡ {args.lookups:,} lookups (top {args.limit}): "
+          f"p50 {statistics.median(timings):.1f}µs, p99 {timings[int(len(timings) * 0.99)]:.1f}µs, "
+          f"max {timings[-1]:.1f}µs")
+
+    t = time.perf_counter()
+    index.apply(removed=rows[:1000], added=[(f"{title} (2nd ed)", author, acc) for title, author, acc in rows[:1000]])
+    print(f"✏️  1,000 incremental updates: {(time.perf_counter() - t) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
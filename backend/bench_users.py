@@ -0,0 +1,96 @@
+# backend/bench_users.py
+# /admin/users latency as the user table grows: the old one-COUNT-per-user
+# loop against the GROUP BY/LEFT JOIN endpoint. Runs on a throwaway SQLite
+# file, never library.db.
+#
+#   python bench_users.py --sizes 1000 10000 100000
+import argparse
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_users.db')}"
+
+from datetime import date, timedelta
+from sqlalchemy import insert, delete
+import database
+import models
+import main
+
+
+def populate(db, n_users, rng):
+    db.execute(delete(models.Transaction))
+    db.execute(delete(models.User))
+    users = [{
+        "full_name": f"Student {i}",
+        "email": f"{i:06d}@cbit.edu.in",
+        "hashed_password": "x",
+        "role": "faculty" if i % 20 == 0 else "student",
+        "registration_number": f"REG{i:06d}",
+        "branch": rng.choice(["CSE", "ECE", "EEE", "CIVIL", "MECH"]),
+        "max_tokens": 3,
+    } for i in range(n_users)]
+    db.execute(insert(models.User), users)
+    ids = [uid for (uid,) in db.query(models.User.id)]
+    today = date.today()
+    loans = [{
+        "user_id": uid, "book_id": 1, "issue_date": today, "due_date": today + timedelta(days=15),
+        "status": rng.choice(["Issued", "Issued", "Returned"]),
+    } for uid in rng.sample(ids, len(ids) // 2) for _ in range(rng.randint(1, 3))]
+    db.execute(insert(models.Transaction), loans)
+    db.commit()
+
+
+def old_listing(db):
+    # What /admin/users did before: one COUNT per user
+    out = []
+    for u in db.query(models.User).all():
+        active = db.query(models.Transaction).filter(
+            models.Transaction.user_id == u.id, models.Transaction.status == "Issued"
+        ).count()
+        out.append((u.id, active))
+    return out
+
+
+def new_listing(db, admin, limit):
+    return main.get_all_users(
+        limit=limit, offset=0, sort="full_name", order="asc", role=None, branch=None,
+        db=db, current_user=admin,
+    )
+
+
+def ms(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        took = (time.perf_counter() - start) * 1000
+        best = took if best is None else min(best, took)
+    return best
+
+
+def main_():
+    parser = argparse.ArgumentParser(description="Benchmark /admin/users")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    db = database.SessionLocal()
+    admin = SimpleNamespace(role="admin")  # stands in for get_current_user
+
+    print(f"{'users':>8}{'old N+1 ms':>14}{'GROUP BY all ms':>18}{'page of 100 ms':>17}")
+    for n in args.sizes:
+        populate(db, n, rng)
+        # The old loop takes minutes at 100k; time it once there
+        old = ms(lambda: (old_listing(db), db.expunge_all()), args.repeat if n <= 10000 else 1)
+        every = ms(lambda: new_listing(db, admin, n + 1), args.repeat)
+        page = ms(lambda: new_listing(db, admin, 100), args.repeat)
+        print(f"{n:>8}{old:>14.1f}{every:>18.1f}{page:>17.1f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,100 @@
+# backend/cache.py
+# Small in-process caches.
+#
+# TTLCache is a bounded LRU map whose entries also expire after `ttl`
+# seconds. Optionally it tracks an approximate size per entry (`weigh`) and
+# a generation - e.g. a data version - that clears the cache when it moves.
+#
+# It is per worker process: invalidate() only clears this process, so
+# anything cached here must be fine being up to `ttl` seconds stale on the
+# other workers.
+import json
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def json_size(value):
+    """Approximate footprint of a cached response: its JSON length in bytes."""
+    return len(json.dumps(value, default=str, separators=(",", ":")))
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=60.0, weigh=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weigh = weigh
+        self._data = OrderedDict()  # key -> (expires_at, value, weight)
+        self._lock = threading.Lock()
+        self.generation = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not _MISSING:
+                self._drop(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        weight = self.weigh(value) if self.weigh else 0
+        with self._lock:
+            self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, value, weight)
+            self.bytes += weight
+            while len(self._data) > self.maxsize:
+                _, (_, _, old_weight) = self._data.popitem(last=False)
+                self.bytes -= old_weight
+                self.evictions += 1
+
+    def _drop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def set_generation(self, generation):
+        """Empty the cache if `generation` differs from the last one seen."""
+        with self._lock:
+            if generation == self.generation:
+                return
+            self.generation = generation
+            if self._data:
+                self._data.clear()
+                self.bytes = 0
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "approx_bytes": self.bytes if self.weigh else None,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
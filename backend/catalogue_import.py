@@ -0,0 +1,391 @@
+# backend/catalogue_import.py
+# Bulk catalogue loading shared by seed.py (accession register .xls) and the
+# admin upload endpoint.
+#
+# Rows are cleaned column-at-a-time with pandas and written with executemany
+# in chunks. acc_no is the natural key: rows whose acc_no already exists are
+# updated in place (stock adjusted by the change in total copies), new ones
+# are inserted, so re-running an import never duplicates the catalogue.
+#
+# The register lists most books more than once - in the master "Acc.Reg"
+# sheet, a department sheet and the catch-all "General" sheet. Rows for the
+# same acc_no are merged (merge_book) rather than overwritten: the most
+# specific department wins, and a row from a generic sheet only fills fields
+# that are still empty.
+#
+# Uploaded CSV/XLSX files are read incrementally (csv module / openpyxl
+# read-only mode) in STREAM_BATCH_SIZE row batches by run_import_job(), which
+# records its progress on an ImportJob row.
+import os
+import re
+import csv
+import time
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import select, insert, update, bindparam, case
+import models
+import library_stats
+import events
+import suggest
+
+# Normalised header name(s) for each Book column, first match wins
+COLUMN_ALIASES = {
+    "title": ["titleofthebook", "title"],
+    "author": ["author"],
+    "publisher": ["publisher", "place", "placepublisher"],
+    "edition_year": ["year", "edition"],
+    "pages": ["pages"],
+    "call_no": ["callno", "classno"],
+    "copies": ["noofcopies", "copies", "nos"],
+}
+SERIAL_COLUMNS = ["sno", "slno"]
+BOOK_FIELDS = ["acc_no", "title", "author", "department", "publisher", "edition_year", "pages", "call_no", "total_copies"]
+
+NULL_TOKENS = {"nan", "nat", "none", "", "0", "0.0"}
+# Sheets/departments that list books from every department (compared
+# lowercased, punctuation stripped)
+GENERIC_DEPARTMENTS = {"accreg", "general"}
+# Stand-in for a missing title/author; never preferred over a real value
+UNKNOWN = "Unknown"
+
+DEFAULT_CHUNK_SIZE = 500
+# Rows parsed, validated and committed together by the upload importer
+STREAM_BATCH_SIZE = 1000
+# How far down an uploaded sheet to look for the header row
+HEADER_SCAN_ROWS = 20
+
+
+def normalise_headers(columns):
+    """'Title of the Book' -> 'titleofthebook', 'Acc. No' -> 'accno'."""
+    return pd.Index(columns).astype(str).str.replace(r"[^\w]", "", regex=True).str.lower()
+
+
+def find_header_row(df):
+    """
+    Scans for the header row.
+    Priority 1: 'Acc' (Standard sheets)
+    Priority 2: 'Title' + 'Author' (Extra Books sheet which lacks Acc No)
+    """
+    rows = df.fillna("").astype(str).agg(" ".join, axis=1).str.lower()
+    has_title = rows.str.contains("title", regex=False)
+    match = has_title & (rows.str.contains("acc", regex=False) | rows.str.contains("author", regex=False))
+    return match.idxmax() if match.any() else None
+
+
+def clean_column(series):
+    """Vectorised clean_text(): strip, and blank/NaN/'0' placeholders become None."""
+    text = series.astype(str).str.strip()
+    return text.where(series.notna() & ~text.str.lower().isin(NULL_TOKENS), None)
+
+
+def _first_of(df, names, default=None):
+    present = [n for n in names if n in df.columns]
+    if not present:
+        return pd.Series(default, index=df.index, dtype=object)
+    result = clean_column(df[present[0]])
+    for name in present[1:]:
+        result = result.fillna(clean_column(df[name]))
+    return result
+
+
+def frame_to_books(df, department, start_row=0):
+    """Map a raw sheet/CSV frame onto Book columns.
+
+    `df` must already have normalised headers. Rows without an accession
+    number get '<department>-<S.No>' (or the row position), with a -2, -3...
+    suffix when the same S.No repeats, so the key is stable across re-runs.
+    """
+    out = pd.DataFrame(index=df.index)
+
+    acc_cols = [c for c in df.columns if "acc" in c]
+    acc = _first_of(df, acc_cols)
+    serial = _first_of(df, SERIAL_COLUMNS)
+    position = pd.Series(range(start_row + 1, start_row + len(df) + 1), index=df.index).astype(str)
+    generated = department + "-" + serial.fillna(position)
+    repeat = generated.groupby(generated).cumcount()
+    generated = generated.where(repeat == 0, generated + "-" + (repeat + 1).astype(str))
+    out["acc_no"] = acc.fillna(generated)
+
+    out["title"] = _first_of(df, COLUMN_ALIASES["title"])
+    out["author"] = _first_of(df, COLUMN_ALIASES["author"])
+    out["department"] = department
+    for field in ("publisher", "edition_year", "pages", "call_no"):
+        out[field] = _first_of(df, COLUMN_ALIASES[field])
+
+    copies = pd.to_numeric(_first_of(df, COLUMN_ALIASES["copies"]), errors="coerce")
+    out["total_copies"] = copies.fillna(1).astype(int).clip(lower=1)
+
+    # Same acc_no twice in one sheet: later rows win, earlier ones fill their gaps.
+    # Missing titles stay None so uploads can reject them (see fill_unknown)
+    out = out.groupby("acc_no", sort=False, as_index=False).last()
+    return out[BOOK_FIELDS]
+
+
+def fill_unknown(books):
+    """UNKNOWN for missing titles/authors, once rows have been validated."""
+    books = books.copy()
+    books[["title", "author"]] = books[["title", "author"]].fillna(UNKNOWN)
+    return books
+
+
+def is_generic(department):
+    return not department or re.sub(r"[^\w]", "", department).lower() in GENERIC_DEPARTMENTS
+
+
+def _missing(value):
+    return value is None or value == UNKNOWN
+
+
+def merge_book(existing, incoming):
+    """Combine two records (BOOK_FIELDS dicts) for the same acc_no.
+
+    The incoming row wins unless it comes from a generic department and the
+    existing one doesn't; either way the other row fills fields left empty.
+    """
+    if is_generic(incoming["department"]) and not is_generic(existing["department"]):
+        primary, fallback = existing, incoming
+    else:
+        primary, fallback = incoming, existing
+    merged = {}
+    for field in BOOK_FIELDS:
+        value = primary.get(field)
+        if _missing(value) and not _missing(fallback.get(field)):
+            value = fallback[field]
+        merged[field] = value
+    return merged
+
+
+def _records(frame):
+    # NaN -> None and numpy ints -> int, so the DB driver gets plain Python values
+    records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+    for r in records:
+        r["total_copies"] = int(r["total_copies"])
+    return records
+
+
+def upsert_books(db, frame, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Insert/update `frame` (output of frame_to_books) in chunks. Does not commit.
+
+    Returns (inserted, updated). Dashboard counters are bumped in the same
+    transaction. `progress(done, total)` is called after every chunk.
+    """
+    Book = models.Book
+    records = _records(frame)
+    # Core table, not the ORM class: a parameter list on an ORM update() means
+    # bulk-update-by-primary-key, and we match on acc_no
+    books = Book.__table__
+    update_stmt = (
+        update(books)
+        .where(books.c.acc_no == bindparam("b_acc_no"))
+        .values(
+            title=bindparam("b_title"),
+            author=bindparam("b_author"),
+            department=bindparam("b_department"),
+            publisher=bindparam("b_publisher"),
+            edition_year=bindparam("b_edition_year"),
+            pages=bindparam("b_pages"),
+            call_no=bindparam("b_call_no"),
+            # Keep loans already out: shift stock by the change in total, never below 0
+            available_copies=case(
+                (books.c.available_copies + bindparam("b_total_copies") - books.c.total_copies < 0, 0),
+                else_=books.c.available_copies + bindparam("b_total_copies") - books.c.total_copies,
+            ),
+            total_copies=bindparam("b_total_copies"),
+        )
+    )
+
+    inserted = updated = 0
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        existing = {}
+        current = {}  # acc_no -> stored record, to merge the incoming row into
+        replaced = []  # (title, author, acc_no) being overwritten, for the suggest index
+        columns = [getattr(Book, field) for field in BOOK_FIELDS]
+        for row in db.execute(
+            select(Book.available_copies, *columns).where(Book.acc_no.in_([r["acc_no"] for r in chunk]))
+        ):
+            stored = dict(zip(BOOK_FIELDS, row[1:]))
+            existing.setdefault(stored["acc_no"], []).append((stored["total_copies"] or 0, row.available_copies or 0))
+            current.setdefault(stored["acc_no"], stored)
+            replaced.append((stored["title"], stored["author"], stored["acc_no"]))
+
+        new_rows = [dict(r, available_copies=r["total_copies"]) for r in chunk if r["acc_no"] not in existing]
+        changed = [merge_book(current[r["acc_no"]], r) for r in chunk if r["acc_no"] in existing]
+
+        stock_delta = sum(r["total_copies"] for r in new_rows)
+        for r in changed:
+            for total, available in existing[r["acc_no"]]:
+                stock_delta += max(0, available + r["total_copies"] - total) - available
+
+        if new_rows:
+            db.execute(insert(Book), new_rows)
+        if changed:
+            # b_ prefix: bind names may not collide with the columns being SET
+            db.execute(update_stmt, [{f"b_{k}": v for k, v in r.items()} for r in changed])
+        library_stats.bump(db, total_books=len(new_rows), available_copies=stock_delta)
+        suggest.record_changes(db, removed=replaced,
+                               added=[(r["title"], r["author"], r["acc_no"]) for r in new_rows + changed])
+
+        inserted += len(new_rows)
+        updated += len(changed)
+        if progress:
+            progress(start + len(chunk), len(records))
+    return inserted, updated
+
+
+def import_workbook(db, path, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, log=print):
+    """Load every sheet of the accession register at `path`.
+
+    Each sheet is committed on its own. With dry_run nothing is committed and
+    everything is rolled back at the end, so later sheets still see earlier
+    ones and the new/updated counts match what a real run would do.
+    """
+    xls = pd.ExcelFile(path)
+    totals = {"inserted": 0, "updated": 0, "rows": 0}
+    started = time.perf_counter()
+
+    for sheet_name in xls.sheet_names:
+        log(f"📥 Processing Sheet: {sheet_name}")
+        try:
+            # 1. Find Header
+            df_raw = pd.read_excel(xls, sheet_name=sheet_name, header=None, nrows=20)
+            header_idx = find_header_row(df_raw)
+            if header_idx is None:
+                log(f"   ⚠️ Skipping {sheet_name}: No valid header found.")
+                continue
+
+            # 2. Read + map the whole sheet column-wise
+            df = pd.read_excel(xls, sheet_name=sheet_name, header=header_idx)
+            df.columns = normalise_headers(df.columns)
+            df = df.loc[:, ~df.columns.duplicated()]
+            books = fill_unknown(frame_to_books(df, sheet_name))
+
+            # 3. Chunked upsert
+            sheet_started = time.perf_counter()
+
+            def progress(done, total):
+                rate = done / max(time.perf_counter() - sheet_started, 1e-9)
+                log(f"   … {done}/{total} rows ({rate:,.0f} rows/s)")
+
+            inserted, updated = upsert_books(db, books, chunk_size=chunk_size, progress=progress)
+            if not dry_run:
+                db.commit()
+            log(f"   ✅ {sheet_name}: {inserted} new, {updated} updated")
+            totals["inserted"] += inserted
+            totals["updated"] += updated
+            totals["rows"] += len(books)
+        except Exception as e:
+            db.rollback()
+            log(f"   ❌ Error in {sheet_name}: {e}")
+
+    if dry_run:
+        db.rollback()
+    totals["seconds"] = time.perf_counter() - started
+    return totals
+
+
+# --- STREAMING UPLOADS ---
+
+def _batches(header, rows, batch_size):
+    batch = []
+    for row in rows:
+        # skip fully blank lines/rows
+        if not any(v not in (None, "") for v in row):
+            continue
+        batch.append(list(row)[:len(header)])
+        if len(batch) == batch_size:
+            yield pd.DataFrame(batch, columns=header)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch, columns=header)
+
+
+def _header_from(rows):
+    """Pull rows until the header row (see find_header_row) and return it normalised."""
+    seen = []
+    for row in rows:
+        seen.append(list(row))
+        idx = find_header_row(pd.DataFrame(seen[-1:]))
+        if idx is not None:
+            return normalise_headers(seen[-1])
+        if len(seen) >= HEADER_SCAN_ROWS:
+            break
+    return None
+
+
+def iter_csv_batches(path, batch_size=STREAM_BATCH_SIZE):
+    """Yield (sheet, DataFrame) batches from a CSV without reading it all."""
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        rows = csv.reader(f)
+        header = _header_from(rows)
+        if header is None:
+            raise ValueError("No header row with a Title column found")
+        for frame in _batches(header, rows, batch_size):
+            yield None, frame
+
+
+def iter_xlsx_batches(path, batch_size=STREAM_BATCH_SIZE):
+    """Yield (sheet, DataFrame) batches from every sheet of an .xlsx in read-only mode."""
+    from openpyxl import load_workbook  # only needed for uploads
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = _header_from(rows)
+            if header is None:
+                continue
+            for frame in _batches(header, rows, batch_size):
+                yield ws.title, frame
+    finally:
+        wb.close()
+
+
+def run_import_job(job_id, path, kind, department=None, batch_size=STREAM_BATCH_SIZE):
+    """Background task behind POST /admin/books/import.
+
+    Each batch is validated, upserted and committed together with the job's
+    counters, so a status poll never sees rows that aren't in the catalogue.
+    The uploaded temp file is removed when the job ends.
+    """
+    from database import SessionLocal
+
+    db = SessionLocal()
+    job = db.get(models.ImportJob, job_id)
+    job.status = "running"
+    db.commit()
+    try:
+        batches = iter_csv_batches(path, batch_size) if kind == "csv" else iter_xlsx_batches(path, batch_size)
+        offsets = {}
+        for sheet, frame in batches:
+            frame.columns = normalise_headers(frame.columns)
+            frame = frame.loc[:, ~frame.columns.duplicated()]
+            dept = department or sheet or "General"
+            start = offsets.get(dept, 0)
+            offsets[dept] = start + len(frame)
+
+            books = frame_to_books(frame, dept, start_row=start)
+            valid = books["title"].notna()
+            inserted, updated = upsert_books(db, fill_unknown(books[valid]), chunk_size=batch_size)
+
+            job.processed_rows += len(frame)
+            job.inserted_rows += inserted
+            job.updated_rows += updated
+            # rows that fail validation (no title) are counted, not inserted
+            job.failed_rows += int((~valid).sum())
+            db.commit()
+        job.status = "done"
+    except Exception as e:
+        db.rollback()
+        job.status = "failed"
+        job.error = str(e)[:500]
+    finally:
+        job.finished_at = datetime.now()
+        db.commit()
+        if events.bus.has_subscribers():
+            events.bus.publish("stats", {"stats": library_stats.read(db)})
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
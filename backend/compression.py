@@ -0,0 +1,175 @@
+# backend/compression.py
+# Negotiated response compression: Brotli when the client accepts it and the
+# brotli package is installed, gzip otherwise, identity for everything else.
+#
+# Built on Starlette's GZipMiddleware responders, so the same rules apply:
+# bodies under COMPRESS_MIN_BYTES go out as-is, already-encoded responses,
+# 206s and binary/streaming content types (images, text/event-stream) are
+# passed through, and large bodies are compressed on a worker thread instead
+# of blocking the event loop. On top of that:
+#   * COMPRESS_EXCLUDE_PATHS (comma separated prefixes, default /uploads)
+#     skips whole mounts - photos are already compressed and may be served
+#     via pathsend / X-Accel-Redirect.
+#   * A strong ETag on a compressed body stays strong but gets the encoding
+#     appended ("search-12-ab" -> "search-12-ab-br"): each encoding is its
+#     own set of bytes, so it needs its own tag. If-None-Match is rewritten
+#     back to the app's tags on the way in, so the 304 checks in main.py
+#     still match, and a 304 echoes the tag the client sent. Weak ETags
+#     (/users/me) already allow any encoding and are left alone.
+#
+# Levels are picked for dynamic JSON, not static assets: gzip 6 and Brotli 4
+# get most of the size win for a few ms per MB (python bench_compression.py).
+import os
+import re
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipResponder, IdentityResponder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+COMPRESS_EXCLUDE_PATHS = tuple(p.strip() for p in os.getenv("COMPRESS_EXCLUDE_PATHS", "/uploads").split(",") if p.strip())
+# Bodies at least this big are compressed on a worker thread
+THREAD_MIN_BYTES = 128 * 1024
+
+
+def accepted_encodings(header):
+    """{encoding: q} from an Accept-Encoding header, e.g. {"gzip": 1.0, "br": 1.0}."""
+    accepted = {}
+    for part in header.lower().split(","):
+        name, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name.strip():
+            accepted[name.strip()] = q
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get("*", 0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+# A strong entity tag with an encoding suffix added by encoded_etag()
+_ENCODED_ETAG = re.compile(r'(?<![\w/])"([^"]*)-(gzip|br)"')
+
+
+def encoded_etag(etag, encoding):
+    """'"abc"' -> '"abc-br"'. Weak tags are returned unchanged."""
+    if not etag or etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def decode_if_none_match(header):
+    """If-None-Match with encoded_etag() suffixes removed, and {app tag: tag as sent}."""
+    sent = {}
+
+    def strip(match):
+        sent[f'"{match.group(1)}"'] = match.group(0)
+        return f'"{match.group(1)}"'
+
+    return _ENCODED_ETAG.sub(strip, header), sent
+
+
+class _EncodedETag:
+    # Mixed into the responders: tag a body they compressed with its encoding
+    async def __call__(self, scope, receive, send):
+        async def send_tagged(message):
+            if message["type"] == "http.response.start" and not self.content_encoding_set:
+                headers = MutableHeaders(raw=message["headers"])
+                encoding = headers.get("content-encoding")
+                if encoding and "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+            await send(message)
+
+        await super().__call__(scope, receive, send_tagged)
+
+
+class GzipResponder(_EncodedETag, GZipResponder):
+    pass
+
+
+class BrotliResponder(_EncodedETag, IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size, quality=BROTLI_QUALITY, *,
+                 thread_minimum_size=THREAD_MIN_BYTES, exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES):
+        super().__init__(app, minimum_size, exclude_content_types=exclude_content_types)
+        self.quality = quality
+        self.thread_minimum_size = thread_minimum_size
+        self._compressor = None
+
+    async def apply_compression(self, body, *, more_body):
+        if len(body) >= self.thread_minimum_size:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body, more_body):
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=self.quality)
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES, gzip_level=GZIP_LEVEL,
+                 brotli_quality=BROTLI_QUALITY, exclude_paths=COMPRESS_EXCLUDE_PATHS):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.exclude_paths = tuple(exclude_paths)
+
+    def excluded(self, path):
+        return any(path == p or path.startswith(p.rstrip("/") + "/") for p in self.exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.excluded(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if_none_match, sent = decode_if_none_match(request_headers.get("if-none-match", ""))
+        if sent:
+            # The app compares against its own (unencoded) tags
+            raw = [(k, v) for k, v in scope["headers"] if k != b"if-none-match"]
+            scope = dict(scope, headers=raw + [(b"if-none-match", if_none_match.encode("latin-1"))])
+            send = self._echo_etag(send, sent)
+        if encoding == "br":
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif encoding == "gzip":
+            responder = GzipResponder(self.app, self.minimum_size, self.gzip_level,
+                                      thread_minimum_size=THREAD_MIN_BYTES)
+        else:
+            # Still adds Vary: Accept-Encoding, so caches don't hand this to a gzip client
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
+
+    @staticmethod
+    def _echo_etag(send, sent):
+        # A 304 must carry the tag the cached (encoded) response had
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 304:
+                headers = MutableHeaders(raw=message["headers"])
+                if headers.get("etag") in sent:
+                    headers["ETag"] = sent[headers["etag"]]
+            await send(message)
+        return send_with_etag
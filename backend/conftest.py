@@ -0,0 +1,59 @@
+# backend/conftest.py
+# Shared test setup. Importing main.py migrates DATABASE_URL, and the
+# default is ./library.db, so every test run gets a throwaway SQLite file
+# instead. Test modules that need main import this first, which also makes
+# `python test_x.py` safe:
+#
+#   python -m pytest -q     # from backend/
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+# Manual script (logs in as a real account), not a test
+collect_ignore = ["test_login.py"]
+
+
+def reset_db():
+    """Empty every table and main's caches; the database is shared by the whole run."""
+    import main
+    import database
+    import library_stats
+    import models
+
+    with database.engine.begin() as conn:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    with database.SessionLocal() as db:
+        library_stats.reconcile(db)
+    main.principal_cache.clear()
+    main.search_cache.clear()
+
+
+def add_user(db, email, role="student", **fields):
+    import models
+
+    user = models.User(email=email, role=role, full_name=fields.pop("full_name", email.split("@")[0]),
+                       hashed_password="-", max_tokens=fields.pop("max_tokens", 5), **fields)
+    db.add(user)
+    db.flush()
+    return user
+
+
+def add_book(db, acc_no, copies=1, **fields):
+    import library_stats
+    import models
+
+    book = models.Book(acc_no=acc_no, title=fields.pop("title", f"Book {acc_no}"), author=fields.pop("author", "Author"),
+                       department=fields.pop("department", "CSE"), total_copies=copies, available_copies=copies, **fields)
+    db.add(book)
+    db.flush()
+    library_stats.bump(db, total_books=1, available_copies=copies)
+    return book
+
+
+def auth(user):
+    import main
+
+    return {"Authorization": f"Bearer {main.create_access_token({'sub': user.email, 'uid': user.id})}"}
@@ -2,12 +2,12 @@
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine
 import models
-from passlib.context import CryptContext
+import migrations
+from passwords import pwd_context
 
 # 1. Setup
-models.Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
 db = SessionLocal()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def create_admin():
     email = "admin@cbit.edu.in"
@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 import os
 from dotenv import load_dotenv
 
@@ -10,9 +13,152 @@ load_dotenv()
 # Use SQLite by default, but ready for production
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./library.db")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# --- ENGINE TUNING (all overridable from .env) ---
+# SQLite: WAL lets readers run alongside the single writer, busy_timeout makes
+# a blocked writer wait instead of failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Server databases (Postgres etc.): connection pool per worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes", "on")
+
+# Opt-in async engine for the high-traffic endpoints (see the bottom of this file)
+ASYNC_DB = os.getenv("ASYNC_DB", "false").lower() in ("1", "true", "yes", "on")
+# Async driver for each backend when ASYNC_DATABASE_URL isn't set
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Runs once per new DBAPI connection
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def _sqlite_options():
+    if SQLITE_JOURNAL_MODE not in _JOURNAL_MODES or SQLITE_SYNCHRONOUS not in _SYNCHRONOUS_LEVELS:
+        raise ValueError(f"Bad SQLITE_JOURNAL_MODE/SQLITE_SYNCHRONOUS: {SQLITE_JOURNAL_MODE}/{SQLITE_SYNCHRONOUS}")
+    return {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+
+
+def _pool_options():
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def build_engine(url):
+    """Engine with settings that suit the backend named in `url`."""
+    if make_url(url).get_backend_name() == "sqlite":
+        engine = create_engine(url, **_sqlite_options())
+        event.listen(engine, "connect", set_sqlite_pragmas)
+        return engine
+    return create_engine(url, **_pool_options())
+
+
+def async_url_for(url):
+    """sqlite:///x.db -> sqlite+aiosqlite:///x.db, postgresql://... -> postgresql+asyncpg://..."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def build_async_engine(url):
+    """Async twin of build_engine() - same pragmas and pool settings."""
+    if make_url(url).get_backend_name() == "sqlite":
+        engine = create_async_engine(url, **_sqlite_options())
+        event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+        return engine
+    return create_async_engine(url, **_pool_options())
+
+
+engine = build_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+# --- ASYNC ENGINE ---
+# The high-traffic endpoints (see get_async_db in main.py) await their
+# queries. With ASYNC_DB=true they run on an async engine: aiosqlite or
+# asyncpg, plus greenlet (sqlalchemy[asyncio]). Otherwise, or when those
+# aren't installed, AsyncSessionLocal hands out ThreadedSessions on the
+# sync engine instead. Both engines point at the same database - set
+# ASYNC_DATABASE_URL only if the async driver can't be derived from
+# DATABASE_URL.
+class ThreadedSession:
+    """The part of AsyncSession that main.py uses, over a sync Session. Each
+    database call runs in the threadpool, so the event loop never waits on it."""
+
+    def __init__(self):
+        self.sync_session = _ThreadedSessionLocal()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    async def execute(self, statement, *args, **kwargs):
+        def fetched():
+            # Rows are read here too, not later on the event loop
+            result = self.sync_session.execute(statement, *args, **kwargs)
+            return result.freeze()() if getattr(result, "returns_rows", True) else result
+        return await run_in_threadpool(fetched)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+# Same settings as AsyncSessionLocal, so objects stay readable after commit
+_ThreadedSessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+def _build_async_engine_or_none():
+    if not ASYNC_DB:
+        return None
+    try:
+        import greenlet  # noqa: F401 - SQLAlchemy only complains on first use
+        return build_async_engine(ASYNC_DATABASE_URL)
+    except ImportError as e:
+        print(f"⚠️ ASYNC_DB is on but the async driver is missing, using the sync engine: {e}")
+        return None
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url_for(SQLALCHEMY_DATABASE_URL)
+async_engine = _build_async_engine_or_none()
+if async_engine is not None:
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+else:
+    AsyncSessionLocal = ThreadedSession
+
+Base = declarative_base()
@@ -0,0 +1,83 @@
+# backend/events.py
+# In-process pub/sub for the admin dashboard event stream (/admin/events).
+#
+# Mutation endpoints publish after they commit; every connected dashboard
+# gets the event on its own bounded queue. publish() is safe to call from the
+# threadpool (sync endpoints, background imports) as well as from the event
+# loop. A subscriber that falls too far behind is sent a "resync" instead of
+# the backlog and refetches the snapshot.
+#
+# The bus lives in one worker process. With several uvicorn workers a
+# dashboard only sees changes handled by the worker it is connected to, so
+# run the event stream on a single worker (or put a broker behind publish()).
+import asyncio
+import json
+import threading
+
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class Subscriber:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _deliver(self, message):
+        # Runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Drop the backlog; the client refetches the snapshot instead
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(("resync", {}))
+
+    async def next_event(self, timeout):
+        """(event, data), or None if nothing arrived within `timeout` seconds."""
+        try:
+            event, data = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event == "resync":
+            self.overflowed = False
+        return event, data
+
+
+class EventBus:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self):
+        subscriber = Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber._deliver, (event, data))
+            except RuntimeError:
+                self.unsubscribe(subscriber)  # its loop has shut down
+
+
+bus = EventBus()
+
+
+def format_sse(event, data):
+    payload = json.dumps(data, default=str, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
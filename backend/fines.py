@@ -0,0 +1,108 @@
+# backend/fines.py
+# Fine policy and the overdue ledger.
+#
+# fine_for() is the one place the policy lives (approve-return uses it for
+# the amount actually charged). For open loans the same policy is
+# materialised into transactions.is_overdue / accrued_fine by refresh(), a
+# single set-based UPDATE that the server runs at startup and just after
+# every midnight (see start_scheduler), so the dashboard, /users/me and
+# /admin/overdue read stored values instead of re-deriving them per row.
+#
+#   python fines.py   # refresh the ledger now
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, update, func, case, literal, and_, or_
+import models
+
+FINE_PER_DAY = float(os.getenv("FINE_PER_DAY", "5.0"))
+FINED_ROLES = ("student",)  # faculty borrow fine-free
+# Users per profile_version UPDATE in refresh()
+PROFILE_BUMP_CHUNK = 500
+
+
+def fine_for(due_date, role, today=None):
+    today = today or date.today()
+    if role not in FINED_ROLES or today <= due_date:
+        return 0.0
+    return (today - due_date).days * FINE_PER_DAY
+
+
+def _days_late(dialect_name, today):
+    Txn = models.Transaction
+    if dialect_name == "sqlite":
+        return func.julianday(literal(today.isoformat())) - func.julianday(Txn.due_date)
+    return literal(today) - Txn.due_date  # date - date is an integer on Postgres
+
+
+def refresh(db, today=None):
+    """Recompute is_overdue/accrued_fine for every open loan that is, or was, overdue. Commits.
+
+    Borrowers whose ledger rows actually change get their profile_version
+    bumped in the same transaction, so /users/me stops answering 304 with
+    the old fines. Returns the number of loans changed.
+    """
+    today = today or date.today()
+    Txn = models.Transaction
+    overdue = Txn.due_date < today
+    fined = Txn.user_id.in_(select(models.User.id).where(models.User.role.in_(FINED_ROLES)))
+    fine = case(
+        (and_(overdue, fined), _days_late(db.get_bind().dialect.name, today) * FINE_PER_DAY),
+        else_=0.0,
+    )
+    borrowers = db.execute(
+        update(Txn)
+        .where(
+            Txn.return_date == None,
+            or_(overdue, Txn.is_overdue.is_(True)),
+            or_(Txn.is_overdue != overdue, Txn.accrued_fine != fine),
+        )
+        .values(is_overdue=overdue, accrued_fine=fine)
+        .returning(Txn.user_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    user_ids = sorted(set(borrowers))
+    User = models.User
+    for start in range(0, len(user_ids), PROFILE_BUMP_CHUNK):
+        db.execute(
+            update(User)
+            .where(User.id.in_(user_ids[start:start + PROFILE_BUMP_CHUNK]))
+            .values(profile_version=User.profile_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return len(borrowers)
+
+
+def seconds_until_next_run(now=None):
+    # Just after midnight, once the new day's fines are due
+    now = now or datetime.now()
+    next_run = datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) + timedelta(minutes=1)
+    return (next_run - now).total_seconds()
+
+
+def run_refresh(log=print):
+    from database import SessionLocal
+
+    with SessionLocal() as db:
+        updated = refresh(db)
+    log(f"💰 Overdue ledger refreshed ({updated} loans updated)")
+    return updated
+
+
+async def scheduler(log=print):
+    """Refresh now, then daily. Runs until cancelled; a failed run is logged and retried next day."""
+    while True:
+        try:
+            await asyncio.to_thread(run_refresh, log)
+        except Exception as e:
+            log(f"❌ Overdue ledger refresh failed: {e}")
+        await asyncio.sleep(seconds_until_next_run())
+
+
+if __name__ == "__main__":
+    from database import engine
+    import migrations
+
+    migrations.upgrade(engine)
+    run_refresh()
@@ -0,0 +1,150 @@
+# backend/inventory.py
+# Stock and loan-limit changes as single conditional statements.
+#
+# Reading available_copies, checking it in Python and writing it back lets
+# two concurrent issues both see the last copy. take_copy() does the check
+# and the decrement in one UPDATE and reports whether a row matched, so the
+# database decides who gets the copy. None of these commit.
+#
+# Call take_copy() before counting a user's loans: on SQLite the UPDATE takes
+# the write lock, so the count that follows can't race another issue. On
+# Postgres the caller locks the user row first (lock_user).
+#
+# Lock order, the same on every path so concurrent issues and returns can't
+# deadlock on Postgres: the request/loan rows being settled, then users (by
+# id), then books (by id), then library_stats. Return paths therefore touch
+# the borrower (profile_changed in main.py) before restocking.
+#
+# The *_many/plural versions below are the set-based forms used by the bulk
+# admin endpoints: one statement per step however many rows are involved.
+from datetime import date
+from sqlalchemy import select, update, func, case
+import models
+
+
+def take_copy(db, book_id):
+    """Decrement stock if a copy is left. Returns False when the book is out of stock."""
+    result = db.execute(
+        update(models.Book)
+        .where(models.Book.id == book_id, models.Book.available_copies > 0)
+        .values(available_copies=models.Book.available_copies - 1)
+    )
+    return result.rowcount == 1
+
+
+def return_copy(db, book_id):
+    db.execute(
+        update(models.Book)
+        .where(models.Book.id == book_id)
+        .values(available_copies=models.Book.available_copies + 1)
+    )
+
+
+def lock_user(db, user_id):
+    """SELECT ... FOR UPDATE on the user row (no-op on SQLite). Serialises issues per user."""
+    return db.execute(
+        select(models.User).where(models.User.id == user_id).with_for_update()
+    ).scalars().first()
+
+
+def lock_users(db, user_ids):
+    """lock_user() for several users, in id order."""
+    db.execute(
+        select(models.User.id).where(models.User.id.in_(user_ids)).order_by(models.User.id).with_for_update()
+    ).all()
+
+
+def open_loans(db, user_id):
+    return db.execute(
+        select(func.count(models.Transaction.id))
+        .where(models.Transaction.user_id == user_id, models.Transaction.return_date == None)
+    ).scalar()
+
+
+def close_loan(db, transaction_id, fine):
+    """Mark a loan returned, once. Returns False if it was already returned."""
+    result = db.execute(
+        update(models.Transaction)
+        .where(models.Transaction.id == transaction_id, models.Transaction.return_date == None)
+        .values(return_date=date.today(), status="Returned", fine_amount=fine,
+                is_overdue=False, accrued_fine=fine)
+    )
+    return result.rowcount == 1
+
+
+def settle_request(db, request_id, new_status):
+    """Move a pending rent request to `new_status`. Returns False if it was no longer pending."""
+    result = db.execute(
+        update(models.RentRequest)
+        .where(models.RentRequest.id == request_id, models.RentRequest.status == "pending")
+        .values(status=new_status)
+    )
+    return result.rowcount == 1
+
+
+# --- SET-BASED (bulk endpoints) ---
+
+def begin_write(db):
+    """Open the transaction holding SQLite's write lock (BEGIN IMMEDIATE), so
+    everything read before the first UPDATE stays current. Postgres callers
+    use SELECT ... FOR UPDATE instead."""
+    conn = db.connection()
+    if conn.dialect.name == "sqlite" and not conn.connection.dbapi_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def take_copies(db, counts):
+    """Take counts[book_id] copies of each book, all or nothing. Returns False if any book is short."""
+    if not counts:
+        return True
+    wanted = case(counts, value=models.Book.id)
+    result = db.execute(
+        update(models.Book)
+        .where(models.Book.id.in_(counts), models.Book.available_copies >= wanted)
+        .values(available_copies=models.Book.available_copies - wanted)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(counts)
+
+
+def return_copies(db, counts):
+    if not counts:
+        return
+    # Row locks in id order, like the stock read in bulk approve
+    db.execute(
+        select(models.Book.id).where(models.Book.id.in_(counts)).order_by(models.Book.id).with_for_update()
+    ).all()
+    db.execute(
+        update(models.Book)
+        .where(models.Book.id.in_(counts))
+        .values(available_copies=models.Book.available_copies + case(counts, value=models.Book.id))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def close_loans(db, fines):
+    """close_loan() for {transaction_id: fine}. Returns how many were still open."""
+    if not fines:
+        return 0
+    result = db.execute(
+        update(models.Transaction)
+        .where(models.Transaction.id.in_(fines), models.Transaction.return_date == None)
+        .values(return_date=date.today(), status="Returned", is_overdue=False,
+                fine_amount=case(fines, value=models.Transaction.id),
+                accrued_fine=case(fines, value=models.Transaction.id))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def settle_requests(db, request_ids, new_status):
+    """settle_request() for many ids. Returns how many were still pending."""
+    if not request_ids:
+        return 0
+    result = db.execute(
+        update(models.RentRequest)
+        .where(models.RentRequest.id.in_(request_ids), models.RentRequest.status == "pending")
+        .values(status=new_status)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
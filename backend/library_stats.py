@@ -0,0 +1,108 @@
+# backend/library_stats.py
+# O(1) dashboard counters.
+#
+# The library_stats row is updated with relative UPDATEs (x = x + delta)
+# inside the caller's transaction, so a rolled-back issue/return never
+# touches the counters. reconcile() recomputes everything from the base
+# tables; run this file directly to check for (and fix) drift:
+#
+#   python library_stats.py          # report + repair
+#   python library_stats.py --check  # report only, exit 1 on drift
+import sys
+from sqlalchemy import select, update, func
+import models
+
+STATS_ID = 1
+COUNTERS = ("total_books", "books_lent", "available_copies")
+
+
+def bump(db, total_books=0, books_lent=0, available_copies=0):
+    """Apply deltas to the summary row. Does not commit - the caller's commit does."""
+    Stats = models.LibraryStats
+    db.execute(
+        update(Stats)
+        .where(Stats.id == STATS_ID)
+        .values(
+            total_books=Stats.total_books + total_books,
+            books_lent=Stats.books_lent + books_lent,
+            available_copies=Stats.available_copies + available_copies,
+        )
+    )
+
+
+def catalogue_version(db):
+    """Changes whenever any books row does (triggers from migration 5)."""
+    Stats = models.LibraryStats
+    return db.execute(select(Stats.catalogue_version).where(Stats.id == STATS_ID)).scalar() or 0
+
+
+def suggest_version(db):
+    """Changes when a book is added/removed or its title, author or acc_no is (not on stock changes)."""
+    Stats = models.LibraryStats
+    return db.execute(select(Stats.suggest_version).where(Stats.id == STATS_ID)).scalar() or 0
+
+
+def recompute(db):
+    """The counters as derived from books/transactions (full scans)."""
+    return {
+        "total_books": db.execute(select(func.count(models.Book.id))).scalar() or 0,
+        "books_lent": db.execute(
+            select(func.count(models.Transaction.id)).where(models.Transaction.return_date == None)
+        ).scalar() or 0,
+        "available_copies": db.execute(select(func.sum(models.Book.available_copies))).scalar() or 0,
+    }
+
+
+def read(db):
+    """Current counters; builds the row on first use."""
+    row = db.get(models.LibraryStats, STATS_ID)
+    if row is None:
+        return reconcile(db)[1]
+    return {name: getattr(row, name) for name in COUNTERS}
+
+
+def reconcile(db):
+    """Overwrite the summary row with recomputed values. Returns (stored, actual)."""
+    actual = recompute(db)
+    row = db.get(models.LibraryStats, STATS_ID)
+    if row is None:
+        stored = None
+        db.add(models.LibraryStats(id=STATS_ID, **actual))
+    else:
+        stored = {name: getattr(row, name) for name in COUNTERS}
+        for name, value in actual.items():
+            setattr(row, name, value)
+    db.commit()
+    return stored, actual
+
+
+def ensure(db):
+    """Create the summary row if this database has never had one."""
+    if db.get(models.LibraryStats, STATS_ID) is None:
+        reconcile(db)
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    import migrations
+
+    migrations.upgrade(engine)
+    check_only = "--check" in sys.argv[1:]
+    db = SessionLocal()
+    try:
+        stored = read(db) if db.get(models.LibraryStats, STATS_ID) else None
+        actual = recompute(db)
+        if stored is None:
+            print("⚠️ No library_stats row yet.")
+        drift = {k: (stored[k], actual[k]) for k in COUNTERS if stored and stored[k] != actual[k]}
+        for name, (was, now) in drift.items():
+            print(f"   ❌ {name}: stored {was}, actual {now}")
+        if stored is not None and not drift:
+            print(f"✅ Counters match: {actual}")
+        elif check_only:
+            sys.exit(1)
+        else:
+            reconcile(db)
+            print(f"🔧 Counters reset to {actual}")
+    finally:
+        db.close()
@@ -1,36 +1,88 @@
 # backend/main.py
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Form, Query, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles # --- NEW IMPORT ---
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm #
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, update, insert, or_, and_
 from datetime import date, timedelta,datetime
-from passlib.context import CryptContext
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 from jose import jwt, JWTError
 import models, database
+import migrations
+import search
+import library_stats
+import catalogue_import
+import cache
+import passwords
+import inventory
+import events
+import fines
+import suggest
+import photos
+import fastjson
+import compression
+import metrics
 import os
 import shutil # --- NEW IMPORT for saving files ---
 from dotenv import load_dotenv
-import time
+import asyncio
+import uuid
+import hashlib
+import tempfile
+from collections import Counter
 
 # --- SETUP ---
 load_dotenv()
-models.Base.metadata.create_all(bind=database.engine)
+migrations.upgrade(database.engine)
+search.setup_search_index(database.engine)
+with database.SessionLocal() as _db:
+    library_stats.ensure(_db)
+# SQL counts/timings and pool waits for /metrics (metrics.py)
+metrics.instrument_engine(database.engine, "sync")
+if database.async_engine is not None:
+    metrics.instrument_engine(database.async_engine.sync_engine, "async")
 
-app = FastAPI()
+app = FastAPI(default_response_class=fastjson.JSONResponse)
 
 # --- NEW: SETUP UPLOADS DIRECTORY ---
-UPLOAD_DIR = "uploads"
+UPLOAD_DIR = photos.UPLOAD_DIR
 # Create dir if it doesn't exist
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 # Mount it so files can be accessed via http://localhost:8000/uploads/filename.jpg
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+# Long-lived immutable caching for content-hashed names, see photos.UploadFiles
+app.mount(photos.UPLOAD_PATH, photos.UploadFiles(directory=UPLOAD_DIR), name="uploads")
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs in a process pool (see passwords.py); 429 when it is saturated
+def password_busy():
+    return HTTPException(status_code=429, detail="Server busy, please try again in a moment",
+                         headers={"Retry-After": "1"})
+
+@app.on_event("shutdown")
+def stop_password_pool():
+    passwords.shutdown()
+
+# Daily overdue/fine ledger refresh (fines.py); runs once at startup too
+@app.on_event("startup")
+async def start_fines_scheduler():
+    app.state.fines_job = asyncio.create_task(fines.scheduler())
+
+@app.on_event("shutdown")
+async def stop_fines_scheduler():
+    app.state.fines_job.cancel()
+
+# In-memory type-ahead index (suggest.py), built in the background at startup
+@app.on_event("startup")
+async def start_suggest_index():
+    app.state.suggest_job = asyncio.create_task(suggest.scheduler())
+
+@app.on_event("shutdown")
+async def stop_suggest_index():
+    app.state.suggest_job.cancel()
+
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 
@@ -48,6 +100,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/Brotli for JSON bodies over COMPRESS_MIN_BYTES; /uploads and the SSE
+# stream are left alone (see compression.py)
+app.add_middleware(compression.CompressionMiddleware)
+# Outermost, so latency includes compression
+app.add_middleware(metrics.MetricsMiddleware)
+
 def get_db():
     db = database.SessionLocal()
     try:
@@ -55,6 +113,12 @@ def get_db():
     finally:
         db.close()
 
+# Async session for the high-traffic endpoints: with ASYNC_DB on, no threadpool
+# slot is held while they wait on the database (see database.py).
+async def get_async_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
 # --- AUTH HELPERS ---
 from fastapi.security import OAuth2PasswordBearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -71,19 +135,78 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def token_claims(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None: raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None: raise HTTPException(status_code=401, detail="User not found")
-    return user
+    return payload
+
+# --- PRINCIPAL CACHE ---
+# The logged-in user's profile is cached per token subject (email), so most
+# requests skip the users SELECT. The cache is per worker: endpoints that
+# change a user call forget_principal(), and the TTL bounds how stale other
+# workers can be. Principals are read-only snapshots - load the row with
+# db.get(models.User, current_user.id) before changing it.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+principal_cache = cache.TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+def principal_query(claims: dict):
+    # Tokens issued since "uid" was added are looked up by primary key; the
+    # email check rejects a token whose user was deleted and re-registered.
+    query = select(models.User).where(models.User.email == claims["sub"])
+    if claims.get("uid") is not None:
+        query = query.where(models.User.id == claims["uid"])
+    return query
+
+def forget_principal(email: str):
+    principal_cache.invalidate(email)
+
+def profile_changed(*user_ids: int):
+    """UPDATE that invalidates the users' /users/me ETags; execute it in the same transaction as the change."""
+    return update(models.User).where(models.User.id.in_(user_ids)).values(
+        profile_version=models.User.profile_version + 1
+    )
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    claims = token_claims(token)
+    principal = principal_cache.get(claims["sub"])
+    if principal is None or claims.get("uid", principal.id) != principal.id:
+        user = db.execute(principal_query(claims)).scalars().first()
+        if user is None: raise HTTPException(status_code=401, detail="User not found")
+        principal = Principal.model_validate(user)
+        principal_cache.set(claims["sub"], principal)
+    return principal
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    claims = token_claims(token)
+    principal = principal_cache.get(claims["sub"])
+    if principal is None or claims.get("uid", principal.id) != principal.id:
+        user = (await db.execute(principal_query(claims))).scalars().first()
+        if user is None: raise HTTPException(status_code=401, detail="User not found")
+        principal = Principal.model_validate(user)
+        principal_cache.set(claims["sub"], principal)
+    return principal
 
 # --- SCHEMAS ---
+# What get_current_user returns: the users row minus the password hash
+class Principal(BaseModel):
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    role: str
+    mobile_number: Optional[str] = None
+    registration_number: Optional[str] = None
+    branch: Optional[str] = None
+    year: Optional[str] = None
+    photo_url: Optional[str] = None
+    max_tokens: Optional[int] = None
+
 class UserCreate(BaseModel):
     full_name: str
     email: str
@@ -111,10 +234,103 @@ class IssueRequest(BaseModel):
     student_email: str
     book_acc_no: str
 
+MAX_BULK_IDS = 5000
+
+class BulkIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_IDS)
+
+# --- RESPONSE MODELS (large lists) ---
+# These endpoints return fastjson.JSONResponse themselves, so the models
+# document the payload without re-validating 10k rows on the way out (see
+# fastjson.py). With ?format=columnar each list is {field: [values]} instead
+# of a list of objects, same fields in the same order.
+LIST_FORMAT = "^(rows|columnar)$"
+
+class BookOut(BaseModel):
+    id: int
+    acc_no: Optional[str] = None
+    title: Optional[str] = None
+    author: Optional[str] = None
+    department: Optional[str] = None
+    publisher: Optional[str] = None
+    edition_year: Optional[str] = None
+    total_copies: Optional[int] = None
+    available_copies: Optional[int] = None
+
+class SearchPage(BaseModel):
+    items: List[BookOut]
+    next_cursor: Optional[str] = None
+    total_estimate: Optional[int] = None
+
+class BorrowRequestOut(BaseModel):
+    request_id: int
+    student_name: Optional[str] = None
+    student_photo: Optional[str] = None
+    student_thumb: Optional[str] = None
+    student_reg: Optional[str] = None
+    book_title: Optional[str] = None
+    book_acc_no: Optional[str] = None
+    request_date: Optional[date] = None
+
+class ReturnRequestOut(BaseModel):
+    request_id: int
+    student_name: Optional[str] = None
+    student_photo: Optional[str] = None
+    student_thumb: Optional[str] = None
+    student_reg: Optional[str] = None
+    book_title: Optional[str] = None
+    book_acc_no: Optional[str] = None
+    due_date: Optional[date] = None
+
+class ActiveLoanOut(BaseModel):
+    transaction_id: int
+    student_name: Optional[str] = None
+    student_email: Optional[str] = None
+    student_mobile: Optional[str] = None
+    student_branch: Optional[str] = None
+    student_year: Optional[str] = None
+    student_photo: Optional[str] = None
+    student_thumb: Optional[str] = None
+    student_reg: Optional[str] = None
+    book_title: Optional[str] = None
+    book_acc_no: Optional[str] = None
+    issue_date: Optional[date] = None
+    due_date: Optional[date] = None
+    fine_est: float = 0.0
+
+class DashboardStats(BaseModel):
+    total_books: int
+    books_lent: int
+    available_copies: int
+    borrow_requests: List[BorrowRequestOut]
+    return_requests: List[ReturnRequestOut]
+    active_loans: List[ActiveLoanOut]
+
+class UserListItem(BaseModel):
+    id: int
+    full_name: Optional[str] = None
+    email: Optional[str] = None
+    role: Optional[str] = None
+    registration_number: Optional[str] = None
+    photo_url: Optional[str] = None
+    photo_thumb_url: Optional[str] = None
+    active_loans: int = 0
+
+class UserPage(BaseModel):
+    items: List[UserListItem]
+    total: int
+    next_offset: Optional[int] = None
+
+def list_payload(payload: dict, format: str, **lists):
+    """payload with each named list (key=row model) made columnar if asked for."""
+    if format != "columnar":
+        return payload
+    return dict(payload, **{key: fastjson.columnar(payload[key], model.model_fields) for key, model in lists.items()})
+
 # --- ENDPOINTS ---
 
 @app.post("/signup", status_code=status.HTTP_201_CREATED)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # --- SECURITY: RESTRICT TO COLLEGE DOMAIN ---
     ALLOWED_DOMAIN = "@cbit.edu.in"  # <--- Update this if needed
     
@@ -124,10 +340,13 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
             detail=f"Restricted Access: Only {ALLOWED_DOMAIN} emails are allowed."
         )
     # ---------------------------------------------
-    if db.query(models.User).filter(models.User.email == user.email).first():
+    if (await db.execute(select(models.User.id).where(models.User.email == user.email))).first():
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = pwd_context.hash(user.password)
+    try:
+        hashed_password = await passwords.hash_password(user.password)
+    except passwords.PasswordPoolBusy:
+        raise password_busy()
     token_limit = 10 if user.role.lower() == "faculty" else 3
 
     new_user = models.User(
@@ -142,21 +361,37 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         year=user.year
     )
     db.add(new_user)
-    db.commit()
+    await db.commit()
     return {"message": "Account created successfully"}
 
 @app.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     # 1. Query the user (We map 'email' to the standard 'username' field)
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
+    user = (await db.execute(select(models.User).where(models.User.email == form_data.username))).scalars().first()
 
     # 2. Verify Password
-    if not user or not pwd_context.verify(form_data.password, user.hashed_password):
+    if not user:
+        metrics.login_failures.inc(reason="unknown_user")
+        raise HTTPException(status_code=400, detail="Invalid email or password")
+    try:
+        valid, new_hash = await passwords.verify_and_update(form_data.password, user.hashed_password)
+    except passwords.PasswordPoolBusy:
+        metrics.login_failures.inc(reason="busy")
+        raise password_busy()
+    if not valid:
+        metrics.login_failures.inc(reason="bad_password")
         raise HTTPException(status_code=400, detail="Invalid email or password")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made
+        user.hashed_password = new_hash
+        await db.commit()
 
     # 3. Create Token
     # We put the email in the 'sub' (subject) field of the token
-    access_token = create_access_token(data={"sub": user.email, "role": user.role})
+    # uid/role/max_tokens ride along so the principal can be resolved by id
+    access_token = create_access_token(data={
+        "sub": user.email, "uid": user.id, "role": user.role, "max_tokens": user.max_tokens
+    })
 
     return {
         "access_token": access_token, 
@@ -164,137 +399,266 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
         "user_id": user.id, 
         "role": user.role, 
         "full_name": user.full_name,
-        "photo_url": user.photo_url
+        "photo_url": photos.public_url(user.photo_url)
     }
 
 # backend/main.py
 
+PROFILE_FIELDS = (
+    models.User.id, models.User.full_name, models.User.email, models.User.role,
+    models.User.mobile_number, models.User.registration_number, models.User.branch,
+    models.User.year, models.User.photo_url, models.User.max_tokens,
+)
+
+def profile_payload(user):
+    # Profile part of /users/me, from a User row or a PROFILE_FIELDS row; never the password hash
+    return {
+        "id": user.id,
+        "full_name": user.full_name,
+        "email": user.email,
+        "role": user.role,
+        "mobile_number": user.mobile_number,
+        "registration_number": user.registration_number,
+        "branch": user.branch,
+        "year": user.year,
+        "photo_url": photos.public_url(user.photo_url),
+        "max_tokens": user.max_tokens,
+    }
+
 @app.get("/users/me")
-def read_users_me(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    # 1. Get Active Loans (Borrowed Books)
-    loans = db.query(models.Transaction).filter(
-        models.Transaction.user_id == current_user.id,
-        models.Transaction.return_date == None
-    ).all()
-    
+async def read_users_me(
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # The ETag is the user's profile_version, bumped on every change that shows
+    # up here - including fines.refresh() rewriting their ledger rows - plus
+    # today's date. A matching If-None-Match costs one primary-key lookup and
+    # no loan queries.
+    user = (await db.execute(
+        select(*PROFILE_FIELDS, models.User.profile_version).where(models.User.id == current_user.id)
+    )).first()
+    if user is None: raise HTTPException(status_code=401, detail="User not found")
+
+    today = date.today()
+    etag = f'W/"profile-{user.id}-{user.profile_version}-{today.isoformat()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+    # 1. Get Active Loans (Borrowed Books) - one joined query; fines come from the ledger (fines.py)
+    loans = (await db.execute(
+        select(
+            models.Transaction.id, models.Transaction.issue_date, models.Transaction.due_date,
+            models.Transaction.status, models.Transaction.accrued_fine, models.Book.title, models.Book.acc_no
+        ).join(models.Book, models.Transaction.book_id == models.Book.id
+        ).where(models.Transaction.user_id == user.id, models.Transaction.return_date == None)
+    )).all()
+
     loan_data = []
     for loan in loans:
-        book = db.query(models.Book).filter(models.Book.id == loan.book_id).first()
-        fine = 0.0
-        if date.today() > loan.due_date and current_user.role == "student":
-            days = (date.today() - loan.due_date).days
-            fine = days * 5.0
-
         loan_data.append({
             "transaction_id": loan.id,
-            "title": book.title,
-            "acc_no": book.acc_no,
+            "title": loan.title,
+            "acc_no": loan.acc_no,
             "issue_date": loan.issue_date,
             "due_date": loan.due_date,
             "status": loan.status,
-            "fine_est": fine
+            "fine_est": loan.accrued_fine
         })
 
     # 2. Get Pending Requests (NEW)
-    requests = db.query(models.RentRequest).filter(
-        models.RentRequest.user_id == current_user.id,
-        models.RentRequest.status == "pending"
-    ).all()
+    requests = (await db.execute(
+        select(
+            models.RentRequest.id, models.RentRequest.request_date, models.Book.title, models.Book.acc_no
+        ).join(models.Book, models.RentRequest.book_id == models.Book.id
+        ).where(models.RentRequest.user_id == user.id, models.RentRequest.status == "pending")
+    )).all()
 
     request_data = []
     for req in requests:
-        book = db.query(models.Book).filter(models.Book.id == req.book_id).first()
         request_data.append({
             "request_id": req.id,
-            "title": book.title,
-            "acc_no": book.acc_no,
+            "title": req.title,
+            "acc_no": req.acc_no,
             "request_date": req.request_date,
             "status": "Pending Approval"
         })
 
     return {
-        "id": current_user.id,
-        "full_name": current_user.full_name,
-        "email": current_user.email,
-        "role": current_user.role,
-        "mobile_number": current_user.mobile_number,
-        "registration_number": current_user.registration_number,
-        "branch": current_user.branch,
-        "year": current_user.year,
-        "photo_url": current_user.photo_url,
-        "max_tokens": current_user.max_tokens,
+        **profile_payload(user),
         "active_loans": loan_data,
         "pending_requests": request_data # <--- Sending this to Frontend
     }
 
 # --- EXISTING TEXT UPDATE ENDPOINT ---
 @app.put("/users/me")
-def update_user_me(user_update: UserUpdate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if user_update.full_name: current_user.full_name = user_update.full_name
-    if user_update.registration_number: current_user.registration_number = user_update.registration_number
-    if user_update.branch: current_user.branch = user_update.branch
-    if user_update.year: current_user.year = user_update.year
-    if user_update.mobile_number: current_user.mobile_number = user_update.mobile_number
+def update_user_me(user_update: UserUpdate, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    user = db.get(models.User, current_user.id)
+    if user_update.full_name: user.full_name = user_update.full_name
+    if user_update.registration_number: user.registration_number = user_update.registration_number
+    if user_update.branch: user.branch = user_update.branch
+    if user_update.year: user.year = user_update.year
+    if user_update.mobile_number: user.mobile_number = user_update.mobile_number
     # photo_url update removed from here
     
+    db.execute(profile_changed(user.id))
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    forget_principal(user.email)
+    return profile_payload(user)
 
 # 1. UPDATED PHOTO UPLOAD (Fixes 304 Cache Issue)
+# Multipart form with a "file" field, read from the request stream with a size
+# cap (photos.MAX_PHOTO_BYTES, 413 past it); file and DB work stay off the loop.
+# Thumbnails are made after the response, see photos.py.
 @app.post("/users/me/photo")
 async def upload_photo(
-    file: UploadFile = File(...), 
-    current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if not file.content_type.startswith('image/'):
-        raise HTTPException(400, detail="File must be an image")
+    try:
+        upload = await photos.receive_upload(request)
+        # Named after the content hash, so the URL changes exactly when the photo does
+        new_filename = await asyncio.to_thread(photos.store, upload, f"user_{current_user.id}")
+    except photos.PhotoError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except OSError as e:
+        raise HTTPException(500, detail=f"Could not save file: {e}")
+
+    photo_url = photos.stored_path(new_filename)
+    user = await db.get(models.User, current_user.id)
+    old_url = user.photo_url
+    user.photo_url = photo_url
+    await db.execute(profile_changed(current_user.id))
+    await db.commit()
+    forget_principal(current_user.email)
+
+    # Old photo (and its thumbnails) go once the new one is saved
+    if old_url and old_url != photo_url:
+        background_tasks.add_task(photos.remove_photo, old_url)
+    background_tasks.add_task(photos.make_thumbnails, os.path.join(UPLOAD_DIR, new_filename))
+    return {"photo_url": photos.public_url(photo_url)}
 
-    # Generate Unique Filename with Timestamp
-    file_extension = os.path.splitext(file.filename)[1]
-    timestamp = int(time.time()) 
-    new_filename = f"user_{current_user.id}_{timestamp}{file_extension}" # <--- Unique Name
-    
-    file_path = os.path.join(UPLOAD_DIR, new_filename)
 
-    # Delete old photo if it exists to save space (Optional logic)
-    if current_user.photo_url:
+# --- BOOK SEARCH ---
+# Result pages are cached per normalised query and keyed by the catalogue
+# version, which triggers on `books` bump on every insert/update/delete
+# (migration 5) - stock changes included, since results show availability.
+# A new version empties the cache, so nothing stale is ever served; the TTL
+# only bounds memory for queries nobody repeats. The same version makes the
+# strong ETag, so a client revalidating an unchanged page gets a 304.
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+search_cache = cache.TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL, weigh=cache.json_size)
+
+@app.get("/books/search/", response_model=SearchPage)
+async def search_books(
+    request: Request,
+    query: str = "",
+    limit: int = Query(search.DEFAULT_PAGE_SIZE, ge=1, le=search.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    mode: str = Query("exact", pattern="^(exact|fuzzy)$"),
+    format: str = Query("rows", pattern=LIST_FORMAT),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Ranked full-text match (FTS5 / tsvector), one keyset page at a time, see search.py.
+    # mode=fuzzy is typo-tolerant (trigram candidates ranked by edit distance), single page.
+    # run_sync hands search_page a regular Session on the async connection.
+    version = await db.run_sync(library_stats.catalogue_version)
+    key = (search.normalise_query(query), limit, cursor or "", mode)
+    etag = f'"search-{version}-{hashlib.sha1(repr(key + (format,)).encode()).hexdigest()[:20]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Version in the key too, so a request that read the old version can't
+    # repopulate the cache with its (stale) page after the clear
+    search_cache.set_generation(version)
+    page = search_cache.get((version,) + key)
+    if page is None:
         try:
-            old_filename = current_user.photo_url.split("/")[-1]
-            old_path = os.path.join(UPLOAD_DIR, old_filename)
-            if os.path.exists(old_path):
-                os.remove(old_path)
-        except:
-            pass # Ignore errors deletion errors
+            if mode == "fuzzy":
+                page = await db.run_sync(search.fuzzy_page, query, limit=limit)
+            else:
+                page = await db.run_sync(search.search_page, query, limit=limit, cursor=cursor)
+        except search.InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        search_cache.set((version,) + key, page)
+    return fastjson.JSONResponse(list_payload(page, format, items=BookOut), headers=headers)
+
+# --- TYPE-AHEAD ---
+# Served from memory (suggest.py), no DB round trip; empty until the index
+# has finished its first build.
+@app.get("/books/suggest")
+async def suggest_books(
+    response: Response,
+    q: str = Query("", max_length=100),
+    limit: int = Query(suggest.DEFAULT_LIMIT, ge=1, le=suggest.MAX_LIMIT),
+):
+    response.headers["Cache-Control"] = "public, max-age=30"
+    return {"query": q, "suggestions": suggest.index.complete(q, limit)}
+
+# --- ADMIN: BULK CATALOGUE UPLOAD ---
+IMPORT_KINDS = {".csv": "csv", ".xlsx": "xlsx", ".xlsm": "xlsx"}
+
+@app.post("/admin/books/import", status_code=status.HTTP_202_ACCEPTED)
+def import_books(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    department: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
 
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-         raise HTTPException(500, detail=f"Could not save file: {e}")
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    kind = IMPORT_KINDS.get(extension)
+    if kind is None:
+        # .xls can't be read incrementally - use seed.py for the accession register
+        raise HTTPException(status_code=400, detail="Upload a .csv or .xlsx file")
+
+    # Copy the upload to our own temp file in 1 MB chunks; the background task
+    # outlives this request (and the UploadFile with it)
+    fd, path = tempfile.mkstemp(suffix=extension, prefix="import_")
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(file.file, out, 1024 * 1024)
 
-    full_url = f"http://127.0.0.1:8000/{UPLOAD_DIR}/{new_filename}"
-    current_user.photo_url = full_url
+    job = models.ImportJob(id=uuid.uuid4().hex, filename=file.filename, status="queued", created_at=datetime.now())
+    db.add(job)
     db.commit()
-    
-    return {"photo_url": full_url}
 
+    background_tasks.add_task(catalogue_import.run_import_job, job.id, path, kind, department)
+    return {"job_id": job.id, "status": job.status}
 
-# --- BOOK SEARCH ---
-@app.get("/books/search/")
-def search_books(query: str, db: Session = Depends(get_db)):
-    books = db.query(models.Book).filter(
-        (models.Book.title.contains(query)) |
-        (models.Book.author.contains(query)) |
-        (models.Book.acc_no.contains(query))|
-        (models.Book.department.contains(query))
-    ).all()
-    return books
+@app.get("/admin/books/import/{job_id}")
+def get_import_job(job_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    job = db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
+    if not job: raise HTTPException(status_code=404, detail="Import job not found")
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "processed_rows": job.processed_rows,
+        "inserted_rows": job.inserted_rows,
+        "updated_rows": job.updated_rows,
+        "failed_rows": job.failed_rows,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at
+    }
 
 # --- ADMIN ISSUE ---
 @app.post("/admin/issue-book")
-def issue_book(request: IssueRequest, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def issue_book(request: IssueRequest, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
 
@@ -303,15 +667,18 @@ def issue_book(request: IssueRequest, db: Session = Depends(get_db), current_use
 
     if not user: raise HTTPException(status_code=404, detail="Student email not found")
     if not book: raise HTTPException(status_code=404, detail="Book Accession No not found")
-    if book.available_copies < 1: raise HTTPException(status_code=400, detail="Book out of stock")
 
-    active_issues = db.query(models.Transaction).filter(
-        models.Transaction.user_id == user.id, 
-        models.Transaction.return_date == None
-    ).count()
+    # Stock and token limit are checked by the database inside this transaction,
+    # so concurrent issues can't oversell a book or a student (see inventory.py)
+    inventory.lock_user(db, user.id)
+    max_tokens = user.max_tokens
+    if not inventory.take_copy(db, book.id):
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Book out of stock")
 
-    if active_issues >= user.max_tokens:
-        raise HTTPException(status_code=400, detail=f"User limit reached ({user.max_tokens})")
+    if inventory.open_loans(db, user.id) >= max_tokens:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"User limit reached ({max_tokens})")
 
     days = 30 if user.role == "faculty" else 15
     due = date.today() + timedelta(days=days)
@@ -321,15 +688,19 @@ def issue_book(request: IssueRequest, db: Session = Depends(get_db), current_use
         issue_date=date.today(), due_date=due, status="Issued"
     )
     
-    book.available_copies -= 1
     db.add(new_issue)
+    library_stats.bump(db, books_lent=1, available_copies=-1)
+    db.execute(profile_changed(user.id))
+    db.flush()
     db.commit()
+    metrics.loans_issued.inc(via="desk")
+    publish_dashboard(db, "loan.issued", add={"active_loans": [new_issue.id]}, stats=True)
     return {"message": "Success", "book": book.title, "student": user.full_name, "due_date": due}
 
 # --- RETURN LOGIC ---
 
 @app.post("/user/return-request/{transaction_id}")
-def request_return(transaction_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def request_return(transaction_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     txn = db.query(models.Transaction).filter(
         models.Transaction.id == transaction_id,
         models.Transaction.user_id == current_user.id
@@ -339,82 +710,208 @@ def request_return(transaction_id: int, db: Session = Depends(get_db), current_u
     if txn.status != "Issued": raise HTTPException(status_code=400, detail="Return already requested or completed")
 
     txn.status = "Return Requested"
+    db.execute(profile_changed(current_user.id))
     db.commit()
+    metrics.returns.inc(stage="requested")
+    publish_dashboard(db, "return.requested", add={"return_requests": [transaction_id]},
+                      remove={"active_loans": [transaction_id]})
     return {"message": "Return request sent to Admin"}
 
+# --- DASHBOARD ROWS ---
+# The three admin lists, as joined, column-projected queries (no lazy loads).
+# Used for the /admin/dashboard-stats snapshot and for the rows pushed on
+# /admin/events, so both always have the same shape.
+BORROW_REQUESTS_QUERY = select(
+    models.RentRequest.id, models.RentRequest.request_date,
+    models.User.full_name, models.User.photo_url, models.User.registration_number,
+    models.Book.title, models.Book.acc_no
+).join(models.User, models.RentRequest.user_id == models.User.id
+).join(models.Book, models.RentRequest.book_id == models.Book.id)
+
+RETURN_REQUESTS_QUERY = select(
+    models.Transaction.id, models.Transaction.due_date,
+    models.User.full_name, models.User.photo_url, models.User.registration_number,
+    models.Book.title, models.Book.acc_no
+).join(models.User, models.Transaction.user_id == models.User.id
+).join(models.Book, models.Transaction.book_id == models.Book.id)
+
+ACTIVE_LOANS_QUERY = select(
+    models.Transaction.id, models.Transaction.issue_date, models.Transaction.due_date,
+    models.Transaction.accrued_fine,
+    models.User.full_name, models.User.email, models.User.mobile_number,
+    models.User.branch, models.User.year, models.User.photo_url,
+    models.User.registration_number,
+    models.Book.title, models.Book.acc_no
+).join(models.User, models.Transaction.user_id == models.User.id
+).join(models.Book, models.Transaction.book_id == models.Book.id)
+
+def borrow_request_row(req, today):
+    return {
+        "request_id": req.id,
+        "student_name": req.full_name,
+        "student_photo": photos.public_url(req.photo_url),
+        "student_thumb": photos.thumb_url(req.photo_url, 64),
+        "student_reg": req.registration_number,
+        "book_title": req.title,
+        "book_acc_no": req.acc_no,
+        "request_date": req.request_date
+    }
+
+def return_request_row(txn, today):
+    return {
+        "request_id": txn.id,
+        "student_name": txn.full_name,
+        "student_photo": photos.public_url(txn.photo_url),
+        "student_thumb": photos.thumb_url(txn.photo_url, 64),
+        "student_reg": txn.registration_number,
+        "book_title": txn.title,
+        "book_acc_no": txn.acc_no,
+        "due_date": txn.due_date
+    }
+
+def active_loan_row(loan, today):
+    return {
+        "transaction_id": loan.id,
+        "student_name": loan.full_name,
+        "student_email": loan.email,
+        "student_mobile": loan.mobile_number,
+        "student_branch": loan.branch,
+        "student_year": loan.year,
+        "student_photo": photos.public_url(loan.photo_url),
+        "student_thumb": photos.thumb_url(loan.photo_url, 64),
+        "student_reg": loan.registration_number,
+        "book_title": loan.title,
+        "book_acc_no": loan.acc_no,
+        "issue_date": loan.issue_date,
+        "due_date": loan.due_date,
+        "fine_est": loan.accrued_fine
+    }
+
+# list name -> (query, key column, row builder)
+DASHBOARD_LISTS = {
+    "borrow_requests": (BORROW_REQUESTS_QUERY, models.RentRequest.id, borrow_request_row),
+    "return_requests": (RETURN_REQUESTS_QUERY, models.Transaction.id, return_request_row),
+    "active_loans": (ACTIVE_LOANS_QUERY, models.Transaction.id, active_loan_row),
+}
+
+# --- ADMIN EVENT STREAM ---
+# Dashboards load /admin/dashboard-stats once, then apply these deltas:
+#   {"add": {list: [rows]}, "remove": {list: [ids]}, "stats": {counters}}
+# Events: request.created/approved/rejected, return.requested/approved,
+# loan.issued, stats (imports). Published after commit, only when someone is listening.
+EVENT_HEARTBEAT_SECONDS = 15
+
+def publish_dashboard(db: Session, event: str, add: Optional[dict] = None, remove: Optional[dict] = None, stats: bool = False):
+    if not events.bus.has_subscribers():
+        return
+    data = {}
+    if add:
+        today = date.today()
+        data["add"] = {}
+        for name, ids in add.items():
+            query, key, build = DASHBOARD_LISTS[name]
+            rows = db.execute(query.where(key.in_(ids))).all() if ids else []
+            data["add"][name] = [build(row, today) for row in rows]
+    if remove:
+        data["remove"] = {name: list(ids) for name, ids in remove.items()}
+    if stats:
+        data["stats"] = library_stats.read(db)
+    events.bus.publish(event, data)
+
+@app.get("/admin/events")
+async def admin_events(request: Request, token: str):
+    # EventSource can't send headers, so the token comes as ?token=
+    async with database.AsyncSessionLocal() as db:
+        current_user = await get_current_user_async(token=token, db=db)
+    if current_user.role != "admin": raise HTTPException(status_code=403, detail="Admin only")
+
+    subscriber = events.bus.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 3000\n" + events.format_sse("hello", {})
+            while not await request.is_disconnected():
+                item = await subscriber.next_event(EVENT_HEARTBEAT_SECONDS)
+                yield events.format_sse(*item) if item else ": ping\n\n"
+        finally:
+            events.bus.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # --- UPDATED: Admin Stats with Inventory Counts ---
-@app.get("/admin/dashboard-stats")
-def get_admin_stats(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+@app.get("/admin/dashboard-stats", response_model=DashboardStats)
+async def get_admin_stats(
+    format: str = Query("rows", pattern=LIST_FORMAT),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
     if current_user.role != "admin": raise HTTPException(status_code=403, detail="Admin only")
 
-    # 1. COUNTERS
-    total_books_count = db.query(models.Book).count()
-    books_lent_count = db.query(models.Transaction).filter(models.Transaction.return_date == None).count()
-    total_available_copies = db.query(func.sum(models.Book.available_copies)).scalar() or 0
+    # 1. COUNTERS (maintained incrementally, see library_stats.py)
+    counters = await db.run_sync(library_stats.read)
+    today = date.today()
 
     # 2. INCOMING BORROW REQUESTS (RentRequest Table)
-    borrow_requests = db.query(models.RentRequest).filter(models.RentRequest.status == "pending").all()
-    borrow_data = []
-    for req in borrow_requests:
-        borrow_data.append({
-            "request_id": req.id,
-            "student_name": req.user.full_name,
-            "student_photo": req.user.photo_url,
-            "student_reg": req.user.registration_number,
-            "book_title": req.book.title,
-            "book_acc_no": req.book.acc_no,
-            "request_date": req.request_date
-        })
+    borrow_requests = (await db.execute(BORROW_REQUESTS_QUERY.where(models.RentRequest.status == "pending"))).all()
 
     # 3. RETURN REQUESTS (Transaction Table with status 'Return Requested')
-    return_requests = db.query(models.Transaction).filter(models.Transaction.status == "Return Requested").all()
-    return_data = []
-    for txn in return_requests:
-        return_data.append({
-            "request_id": txn.id,
-            "student_name": txn.borrower.full_name,
-            "student_photo": txn.borrower.photo_url,
-            "student_reg": txn.borrower.registration_number,
-            "book_title": txn.book.title,
-            "book_acc_no": txn.book.acc_no,
-            "due_date": txn.due_date
-        })
+    return_requests = (await db.execute(RETURN_REQUESTS_QUERY.where(models.Transaction.status == "Return Requested"))).all()
 
     # 4. ACTIVE ISSUED LOANS (Transaction Table with status 'Issued')
-    active = db.query(models.Transaction).filter(models.Transaction.status == "Issued").all()
-    active_data = []
-    for loan in active:
-        fine = 0.0
-        if date.today() > loan.due_date and loan.borrower.role == "student":
-            days = (date.today() - loan.due_date).days
-            fine = days * 5.0
-            
-        active_data.append({
-            "transaction_id": loan.id,
-            "student_name": loan.borrower.full_name,
-            "student_email": loan.borrower.email,
-            "student_mobile": loan.borrower.mobile_number,
-            "student_branch": loan.borrower.branch,
-            "student_year": loan.borrower.year,
-            "student_photo": loan.borrower.photo_url,
-            "student_reg": loan.borrower.registration_number,
-            "book_title": loan.book.title,
-            "book_acc_no": loan.book.acc_no,
-            "issue_date": loan.issue_date,
-            "due_date": loan.due_date,
-            "fine_est": fine
-        })
-
-    return {
-        "total_books": total_books_count,
-        "books_lent": books_lent_count,
-        "available_copies": total_available_copies,
-        "borrow_requests": borrow_data, # NEW
-        "return_requests": return_data, # NEW
-        "active_loans": active_data
+    active = (await db.execute(ACTIVE_LOANS_QUERY.where(models.Transaction.status == "Issued"))).all()
+
+    payload = {
+        "total_books": counters["total_books"],
+        "books_lent": counters["books_lent"],
+        "available_copies": counters["available_copies"],
+        "borrow_requests": [borrow_request_row(req, today) for req in borrow_requests], # NEW
+        "return_requests": [return_request_row(txn, today) for txn in return_requests], # NEW
+        "active_loans": [active_loan_row(loan, today) for loan in active]
     }
+    return fastjson.JSONResponse(list_payload(
+        payload, format,
+        borrow_requests=BorrowRequestOut, return_requests=ReturnRequestOut, active_loans=ActiveLoanOut,
+    ))
+# --- ADMIN: OVERDUE LOANS ---
+# Pages through the overdue ledger in (due_date, id) order - oldest first -
+# straight off the partial index ix_transactions_overdue.
+MAX_OVERDUE_PAGE = 200
+
+@app.get("/admin/overdue")
+async def get_overdue_loans(
+    limit: int = Query(50, ge=1, le=MAX_OVERDUE_PAGE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    if current_user.role != "admin": raise HTTPException(status_code=403, detail="Admin only")
+    T = models.Transaction
+    overdue = T.is_overdue.is_(True)
+
+    query = ACTIVE_LOANS_QUERY.where(overdue)
+    if cursor:
+        try:
+            due, last_id = search.decode_cursor(cursor)
+            due = date.fromisoformat(due)
+        except (search.InvalidCursor, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(or_(T.due_date > due, and_(T.due_date == due, T.id > last_id)))
+    rows = (await db.execute(query.order_by(T.due_date, T.id).limit(limit + 1))).all()
+
+    today = date.today()
+    page = {"items": [active_loan_row(row, today) for row in rows[:limit]], "next_cursor": None}
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        page["next_cursor"] = search.encode_cursor([last.due_date.isoformat(), last.id])
+    if not cursor:
+        page["total"], page["total_fines"] = (await db.execute(
+            select(func.count(T.id), func.coalesce(func.sum(T.accrued_fine), 0.0)).where(overdue)
+        )).one()
+    return page
+
 @app.post("/admin/approve-return/{transaction_id}")
-def approve_return(transaction_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def approve_return(transaction_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     if current_user.role != "admin": raise HTTPException(status_code=403, detail="Admin only")
     
     txn = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
@@ -423,28 +920,31 @@ def approve_return(transaction_id: int, db: Session = Depends(get_db), current_u
     user = db.query(models.User).filter(models.User.id == txn.user_id).first()
     
     # Calculate Fine
-    fine = 0.0
-    if date.today() > txn.due_date and user.role == "student":
-        days = (date.today() - txn.due_date).days
-        fine = days * 5.0
-
-    txn.return_date = date.today()
-    txn.status = "Returned"
-    txn.fine_amount = fine
+    fine = fines.fine_for(txn.due_date, user.role)
+
+    # Close the loan only if it is still open, so a double-click can't restock twice
+    if not inventory.close_loan(db, txn.id, fine):
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Return already approved")
     
+    # Borrower before book and counters, the lock order issues use too (see inventory.py)
+    db.execute(profile_changed(txn.user_id))
     # Restock Book
-    book = db.query(models.Book).filter(models.Book.id == txn.book_id).first()
-    book.available_copies += 1
+    inventory.return_copy(db, txn.book_id)
+    library_stats.bump(db, books_lent=-1, available_copies=1)
     
     db.commit()
+    metrics.returns.inc(stage="approved")
+    publish_dashboard(db, "return.approved", remove={"return_requests": [transaction_id], "active_loans": [transaction_id]},
+                      stats=True)
     return {"message": "Return Approved", "fine": fine}
 # --- ADD THESE MISSING ENDPOINTS TO backend/main.py ---
 
 # 1. STUDENT: Request a Book
 @app.post("/request-book/{book_id}")
-def request_book(book_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def request_book(book_id: int, current_user: Principal = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
     # Check if book exists
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    book = await db.get(models.Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
@@ -452,11 +952,11 @@ def request_book(book_id: int, current_user: models.User = Depends(get_current_u
         raise HTTPException(status_code=400, detail="Book is out of stock")
 
     # Check if already requested
-    existing = db.query(models.RentRequest).filter(
+    existing = (await db.execute(select(models.RentRequest.id).where(
         models.RentRequest.user_id == current_user.id,
         models.RentRequest.book_id == book_id,
         models.RentRequest.status == "pending" # Make sure 'pending' matches your Enum or string
-    ).first()
+    ))).first()
 
     if existing:
         raise HTTPException(status_code=400, detail="You have already requested this book")
@@ -469,42 +969,63 @@ def request_book(book_id: int, current_user: models.User = Depends(get_current_u
         status="pending"
     )
     db.add(new_request)
-    db.commit()
+    await db.execute(profile_changed(current_user.id))
+    await db.flush()
+    await db.commit()
+    metrics.book_requests.inc(outcome="created")
+    await db.run_sync(publish_dashboard, "request.created", add={"borrow_requests": [new_request.id]})
     return {"message": "Request sent successfully! Wait for Admin approval."}
 
 # 2. ADMIN: View Pending Requests
 @app.get("/admin/requests/pending")
-def get_pending_requests(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_pending_requests(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
         
-    requests = db.query(models.RentRequest).filter(models.RentRequest.status == "pending").all()
+    requests = db.query(
+        models.RentRequest.id, models.RentRequest.request_date,
+        models.User.full_name, models.User.email,
+        models.Book.title, models.Book.acc_no
+    ).join(models.User, models.RentRequest.user_id == models.User.id
+    ).join(models.Book, models.RentRequest.book_id == models.Book.id
+    ).filter(models.RentRequest.status == "pending").all()
     
     data = []
     for req in requests:
         data.append({
             "request_id": req.id,
-            "user_name": req.user.full_name,
-            "user_email": req.user.email,
-            "book_title": req.book.title,
-            "book_acc_no": req.book.acc_no,
+            "user_name": req.full_name,
+            "user_email": req.email,
+            "book_title": req.title,
+            "book_acc_no": req.acc_no,
             "request_date": req.request_date
         })
     return data
 
 # 3. ADMIN: Approve Request
 @app.post("/admin/requests/{request_id}/approve")
-def approve_request(request_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def approve_request(request_id: int, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     if current_user.role != "admin": raise HTTPException(status_code=403, detail="Admin access required")
 
     req = db.query(models.RentRequest).filter(models.RentRequest.id == request_id).first()
     if not req: raise HTTPException(status_code=404, detail="Request not found")
 
-    if req.book.available_copies < 1:
+    # Request status, stock and token limit all change/check inside this
+    # transaction (see inventory.py); any failure rolls the lot back
+    if not inventory.settle_request(db, req.id, "approved"):
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Request already processed")
+    borrower = inventory.lock_user(db, req.user_id)
+    max_tokens, role = borrower.max_tokens, borrower.role
+    if not inventory.take_copy(db, req.book_id):
+        db.rollback()
         raise HTTPException(status_code=400, detail="Book is out of stock")
+    if inventory.open_loans(db, req.user_id) >= max_tokens:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"User limit reached ({max_tokens})")
 
     # Create the Transaction (Issue the book)
-    days = 15 if req.user.role == 'student' else 30
+    days = 15 if role == 'student' else 30
     new_txn = models.Transaction(
         user_id=req.user_id,
         book_id=req.book_id,
@@ -513,60 +1034,249 @@ def approve_request(request_id: int, current_user: models.User = Depends(get_cur
         status="Issued"
     )
 
-    # Update Request Status & Stock
-    req.status = "approved"
-    req.book.available_copies -= 1
-    
     db.add(new_txn)
+    library_stats.bump(db, books_lent=1, available_copies=-1)
+    db.execute(profile_changed(req.user_id))
+    db.flush()
     db.commit()
+    metrics.book_requests.inc(outcome="approved")
+    metrics.loans_issued.inc(via="request")
+    publish_dashboard(db, "request.approved", remove={"borrow_requests": [request_id]},
+                      add={"active_loans": [new_txn.id]}, stats=True)
     return {"message": "Request Approved & Book Issued"}
 
 # 4. ADMIN: Reject Request
 @app.post("/admin/requests/{request_id}/reject")
-def reject_request(request_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def reject_request(request_id: int, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     if current_user.role != "admin": raise HTTPException(status_code=403, detail="Admin access required")
 
     req = db.query(models.RentRequest).filter(models.RentRequest.id == request_id).first()
     if not req: raise HTTPException(status_code=404, detail="Request not found")
 
-    req.status = "rejected"
+    if not inventory.settle_request(db, req.id, "rejected"):
+        raise HTTPException(status_code=400, detail="Request already processed")
+    db.execute(profile_changed(req.user_id))
     db.commit()
+    metrics.book_requests.inc(outcome="rejected")
+    publish_dashboard(db, "request.rejected", remove={"borrow_requests": [request_id]})
     return {"message": "Request Rejected"}
+
+# 5. ADMIN: Bulk queue actions
+# Whole admin queues in one round trip: each endpoint reads the set, decides
+# per item, and applies the result with one statement per step in a single
+# transaction. Items are reported individually; the batch only fails as a
+# whole (409) if the rows changed underneath it, which the conditional
+# UPDATEs in inventory.py detect.
+def bulk_response(results):
+    succeeded = sum(1 for r in results if r["ok"])
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+def queue_changed(db):
+    db.rollback()
+    return HTTPException(status_code=409, detail="Queue changed while processing, please retry")
+
+@app.post("/admin/requests/bulk-approve")
+def bulk_approve_requests(body: BulkIds, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    if current_user.role != "admin": raise HTTPException(status_code=403, detail="Admin access required")
+    ids = list(dict.fromkeys(body.ids))
+    R = models.RentRequest
+
+    inventory.begin_write(db)
+    requests = {r.id: r for r in db.execute(
+        select(R.id, R.user_id, R.book_id, R.status, models.User.role, models.User.max_tokens)
+        .join(models.User, R.user_id == models.User.id)
+        .where(R.id.in_(ids))
+        .with_for_update(of=R)
+    )}
+    user_ids = {r.user_id for r in requests.values()}
+    book_ids = {r.book_id for r in requests.values()}
+    inventory.lock_users(db, user_ids)
+    open_loans = dict(db.execute(
+        select(models.Transaction.user_id, func.count(models.Transaction.id))
+        .where(models.Transaction.user_id.in_(user_ids), models.Transaction.return_date == None)
+        .group_by(models.Transaction.user_id)
+    ).all())
+    stock = dict(db.execute(
+        select(models.Book.id, models.Book.available_copies).where(models.Book.id.in_(book_ids))
+        .order_by(models.Book.id).with_for_update()
+    ).all())
+
+    # Hand out copies and tokens in the order the ids were given
+    today = date.today()
+    results, approved = [], []
+    for request_id in ids:
+        req = requests.get(request_id)
+        if req is None:
+            results.append({"id": request_id, "ok": False, "detail": "Request not found"}); continue
+        if req.status != "pending":
+            results.append({"id": request_id, "ok": False, "detail": "Request already processed"}); continue
+        if (stock.get(req.book_id) or 0) < 1:
+            results.append({"id": request_id, "ok": False, "detail": "Book is out of stock"}); continue
+        if open_loans.get(req.user_id, 0) >= req.max_tokens:
+            results.append({"id": request_id, "ok": False, "detail": f"User limit reached ({req.max_tokens})"}); continue
+        stock[req.book_id] -= 1
+        open_loans[req.user_id] = open_loans.get(req.user_id, 0) + 1
+        approved.append(req)
+        results.append({"id": request_id, "ok": True})
+
+    if approved:
+        if inventory.settle_requests(db, [r.id for r in approved], "approved") != len(approved):
+            raise queue_changed(db)
+        if not inventory.take_copies(db, Counter(r.book_id for r in approved)):
+            raise queue_changed(db)
+        loan_ids = db.execute(insert(models.Transaction).returning(models.Transaction.id), [{
+            "user_id": r.user_id,
+            "book_id": r.book_id,
+            "issue_date": today,
+            "due_date": today + timedelta(days=15 if r.role == 'student' else 30),
+            "status": "Issued",
+        } for r in approved]).scalars().all()
+        library_stats.bump(db, books_lent=len(approved), available_copies=-len(approved))
+        db.execute(profile_changed(*{r.user_id for r in approved}))
+    db.commit()
+    if approved:
+        metrics.book_requests.inc(len(approved), outcome="approved")
+        metrics.loans_issued.inc(len(approved), via="request")
+        publish_dashboard(db, "request.approved", remove={"borrow_requests": [r.id for r in approved]},
+                          add={"active_loans": loan_ids}, stats=True)
+    return bulk_response(results)
+
+@app.post("/admin/requests/bulk-reject")
+def bulk_reject_requests(body: BulkIds, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    if current_user.role != "admin": raise HTTPException(status_code=403, detail="Admin access required")
+    ids = list(dict.fromkeys(body.ids))
+    R = models.RentRequest
+
+    inventory.begin_write(db)
+    requests = {r.id: r for r in db.execute(
+        select(R.id, R.user_id, R.status).where(R.id.in_(ids)).with_for_update()
+    )}
+    results, rejected = [], []
+    for request_id in ids:
+        req = requests.get(request_id)
+        if req is None:
+            results.append({"id": request_id, "ok": False, "detail": "Request not found"}); continue
+        if req.status != "pending":
+            results.append({"id": request_id, "ok": False, "detail": "Request already processed"}); continue
+        rejected.append(req)
+        results.append({"id": request_id, "ok": True})
+
+    if rejected:
+        if inventory.settle_requests(db, [r.id for r in rejected], "rejected") != len(rejected):
+            raise queue_changed(db)
+        inventory.lock_users(db, {r.user_id for r in rejected})
+        db.execute(profile_changed(*{r.user_id for r in rejected}))
+    db.commit()
+    if rejected:
+        metrics.book_requests.inc(len(rejected), outcome="rejected")
+        publish_dashboard(db, "request.rejected", remove={"borrow_requests": [r.id for r in rejected]})
+    return bulk_response(results)
+
+@app.post("/admin/bulk-approve-return")
+def bulk_approve_returns(body: BulkIds, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    if current_user.role != "admin": raise HTTPException(status_code=403, detail="Admin only")
+    ids = list(dict.fromkeys(body.ids))
+    T = models.Transaction
+
+    inventory.begin_write(db)
+    loans = {t.id: t for t in db.execute(
+        select(T.id, T.user_id, T.book_id, T.due_date, T.return_date, models.User.role)
+        .join(models.User, T.user_id == models.User.id)
+        .where(T.id.in_(ids))
+        .with_for_update(of=T)
+    )}
+
+    today = date.today()
+    results, closing = [], {}
+    for transaction_id in ids:
+        txn = loans.get(transaction_id)
+        if txn is None:
+            results.append({"id": transaction_id, "ok": False, "detail": "Transaction not found"}); continue
+        if txn.return_date is not None:
+            results.append({"id": transaction_id, "ok": False, "detail": "Return already approved"}); continue
+        fine = fines.fine_for(txn.due_date, txn.role, today)
+        closing[transaction_id] = fine
+        results.append({"id": transaction_id, "ok": True, "fine": fine})
+
+    if closing:
+        if inventory.close_loans(db, closing) != len(closing):
+            raise queue_changed(db)
+        borrowers = {loans[t].user_id for t in closing}
+        inventory.lock_users(db, borrowers)
+        db.execute(profile_changed(*borrowers))
+        inventory.return_copies(db, Counter(loans[t].book_id for t in closing))
+        library_stats.bump(db, books_lent=-len(closing), available_copies=len(closing))
+    db.commit()
+    if closing:
+        metrics.returns.inc(len(closing), stage="approved")
+        publish_dashboard(db, "return.approved", remove={"return_requests": list(closing), "active_loans": list(closing)},
+                          stats=True)
+    return bulk_response(results)
 # --- NEW: User Management Endpoint ---
 # backend/main.py
 
-@app.get("/admin/users")
-def get_all_users(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+# Sortable columns for /admin/users (?sort=...)
+USER_SORT_FIELDS = {"id", "full_name", "email", "role", "registration_number", "branch", "active_loans"}
+MAX_USERS_PAGE = 500
+
+@app.get("/admin/users", response_model=UserPage)
+def get_all_users(
+    limit: int = Query(100, ge=1, le=MAX_USERS_PAGE),
+    offset: int = Query(0, ge=0),
+    sort: str = "full_name",
+    order: str = "asc",
+    role: Optional[str] = None,
+    branch: Optional[str] = None,
+    format: str = Query("rows", pattern=LIST_FORMAT),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
     # 1. Check if Admin
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
-    
-    # 2. Fetch Users
-    users = db.query(models.User).all()
-    
+    if sort not in USER_SORT_FIELDS or order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail=f"sort must be one of {sorted(USER_SORT_FIELDS)}, order asc|desc")
+
+    # 2. Active loans per user in one GROUP BY, LEFT JOINed onto the user page
+    loan_counts = db.query(
+        models.Transaction.user_id, func.count(models.Transaction.id).label("active_loans")
+    ).filter(models.Transaction.status == "Issued").group_by(models.Transaction.user_id).subquery()
+    active_loans = func.coalesce(loan_counts.c.active_loans, 0).label("active_loans")
+
+    users = db.query(models.User)
+    if role: users = users.filter(models.User.role == role.lower())
+    if branch: users = users.filter(models.User.branch == branch)
+    total = users.count()
+
+    sort_col = active_loans if sort == "active_loans" else getattr(models.User, sort)
+    rows = users.outerjoin(loan_counts, loan_counts.c.user_id == models.User.id).with_entities(
+        models.User.id, models.User.full_name, models.User.email, models.User.role,
+        models.User.registration_number, models.User.photo_url, active_loans
+    ).order_by(
+        sort_col.desc() if order == "desc" else sort_col.asc(), models.User.id
+    ).offset(offset).limit(limit).all()
+
     # 3. Format Data
     user_list = []
-    for u in users:
-        # Calculate active loans for each user
-        active_loans = db.query(models.Transaction).filter(
-            models.Transaction.user_id == u.id,
-            models.Transaction.status == "Issued"
-        ).count()
-        
+    for u in rows:
         user_list.append({
             "id": u.id,
             "full_name": u.full_name,
             "email": u.email,
             "role": u.role,
             "registration_number": u.registration_number,
-            "photo_url": u.photo_url,
-            "active_loans": active_loans
+            "photo_url": photos.public_url(u.photo_url),
+            "photo_thumb_url": photos.thumb_url(u.photo_url, 64),
+            "active_loans": u.active_loans
         })
-    return user_list
+    next_offset = offset + limit if offset + limit < total else None
+    return fastjson.JSONResponse(list_payload(
+        {"items": user_list, "total": total, "next_offset": next_offset}, format, items=UserListItem
+    ))
 # backend/main.py
 
 @app.delete("/admin/users/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def delete_user(user_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # 1. Admin Authorization
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -589,5 +1299,21 @@ def delete_user(user_id: int, db: Session = Depends(get_db), current_user: model
     # 4. Delete the User
     db.delete(user_to_delete)
     db.commit()
+    forget_principal(user_to_delete.email)
+
+    return {"message": "User deleted successfully"}
 
-    return {"message": "User deleted successfully"}
\ No newline at end of file
+# --- ADMIN: CACHE MONITORING ---
+@app.get("/admin/cache-stats")
+def get_cache_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin": raise HTTPException(status_code=403, detail="Admin only")
+    return {"principal": principal_cache.stats(), "search": search_cache.stats(), "suggest": suggest.index.stats()}
+
+# --- METRICS ---
+# Prometheus text format from the in-process registry (metrics.py). Scrapers
+# can't log in, so this takes METRICS_TOKEN (if set) instead of a user token.
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request):
+    if not metrics.authorized(request.headers.get("authorization", "")):
+        raise HTTPException(status_code=401, detail="Metrics token required")
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,348 @@
+# backend/metrics.py
+# Prometheus-style metrics without prometheus_client or any outside service:
+# a small in-process registry of counters, gauges and histograms, rendered
+# in the text exposition format by GET /metrics (main.py).
+#
+# What gets recorded:
+#   * MetricsMiddleware: per-route request counts and latency histograms
+#     (labelled by the route template, e.g. /admin/requests/{request_id}/approve,
+#     so ids don't explode the label set) and requests in flight.
+#   * instrument_engine(): every SQL statement via before/after_cursor_execute,
+#     plus per-request query count and DB time (summed in a ContextVar that
+#     follows the request into the threadpool and the async driver), and how
+#     long each connection checkout waited on the pool (not counting the time
+#     spent opening a new DBAPI connection).
+#   * Business counters (issues, returns, requests, login failures) that the
+#     endpoints bump directly.
+#
+# Metrics are per worker process, like the caches - scrape every worker, or
+# sum them in the query. Set METRICS_TOKEN to require
+# "Authorization: Bearer <token>" on /metrics.
+import os
+import hmac
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event, exc
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+POOL_WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+
+def authorized(authorization_header):
+    if not METRICS_TOKEN:
+        return True
+    return hmac.compare_digest(authorization_header.encode(), f"Bearer {METRICS_TOKEN}".encode())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    def value(self, **labels):
+        """(count, sum) observed so far."""
+        state = self._values.get(self._key(labels))
+        return (sum(state[0]), state[1]) if state else (0, 0.0)
+
+    def _samples(self, key, value):
+        counts, total = value
+        lines, running = [], 0
+        for le, n in zip(self.buckets + (float("inf"),), counts):
+            running += n
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, [('le', _number(le))])} {running}")
+        lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+        lines.append(f"{self.name}_count{_labels(self.label_names, key)} {running}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn):
+        """Call `fn()` before each render, to refresh gauges read at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        for fn in self._collectors:
+            fn()
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- HTTP ---
+http_requests = registry.counter("http_requests_total", "Requests handled, by route template and status",
+                                 ("method", "route", "status"))
+http_latency = registry.histogram("http_request_duration_seconds", "Time to send the full response",
+                                  ("method", "route"))
+http_in_flight = registry.gauge("http_requests_in_flight", "Requests currently being handled (incl. open SSE streams)",
+                                ("method",))
+http_db_queries = registry.histogram("http_request_db_queries", "SQL statements run per request",
+                                     ("route",), QUERY_COUNT_BUCKETS)
+http_db_seconds = registry.histogram("http_request_db_seconds", "Time spent in SQL per request",
+                                     ("route",), LATENCY_BUCKETS)
+
+# --- DATABASE ---
+db_queries = registry.counter("db_queries_total", "SQL statements executed", ("engine",))
+db_query_seconds = registry.histogram("db_query_duration_seconds", "Time per SQL statement",
+                                      ("engine",), QUERY_BUCKETS)
+db_query_errors = registry.counter("db_query_errors_total", "SQL statements that raised", ("engine",))
+pool_wait_seconds = registry.histogram("db_pool_checkout_wait_seconds", "Time waiting for a pooled connection",
+                                       ("engine",), POOL_WAIT_BUCKETS)
+pool_timeouts = registry.counter("db_pool_checkout_timeouts_total", "Checkouts that gave up waiting", ("engine",))
+pool_checked_out = registry.gauge("db_pool_checked_out", "Connections currently in use", ("engine",))
+pool_size = registry.gauge("db_pool_size", "Connections the pool keeps open (-1: unbounded pool)", ("engine",))
+pool_overflow = registry.gauge("db_pool_overflow", "Connections open beyond pool_size", ("engine",))
+
+# --- LIBRARY ---
+loans_issued = registry.counter("library_loans_issued_total", "Books issued (desk: admin issue, request: approved request)",
+                                ("via",))
+returns = registry.counter("library_returns_total", "Return requests and approved returns", ("stage",))
+book_requests = registry.counter("library_book_requests_total", "Borrow requests by outcome", ("outcome",))
+login_failures = registry.counter("library_login_failures_total", "Failed logins by reason", ("reason",))
+
+
+# --- REQUEST MIDDLEWARE ---
+# [queries, seconds] for the request being handled, if any
+_request_db = ContextVar("metrics_request_db", default=None)
+# [start, seconds opening DBAPI connections, observed] for the checkout in progress
+_checkout = ContextVar("metrics_checkout", default=None)
+
+
+def route_label(scope, root_path):
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("root_path", "") != root_path:
+        return scope["root_path"]  # a mount, e.g. /uploads
+    return "unmatched"  # 404s: don't label by raw path
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method, root_path = scope["method"], scope.get("root_path", "")
+        status = 500
+        db = [0, 0.0]
+        token = _request_db.set(db)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec(method=method)
+            _request_db.reset(token)
+            route = route_label(scope, root_path)
+            http_requests.inc(method=method, route=route, status=status)
+            http_latency.observe(elapsed, method=method, route=route)
+            http_db_queries.observe(db[0], route=route)
+            http_db_seconds.observe(db[1], route=route)
+
+
+# --- SQLALCHEMY ---
+
+def instrument_engine(engine, name):
+    """Count/time SQL on `engine` (a sync Engine; pass async_engine.sync_engine) and its pool checkouts."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _finished(conn, name)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        db_query_errors.inc(engine=name)
+        if context.connection is not None and context.connection.info.get("metrics_query_start"):
+            _finished(context.connection, name)
+
+    # Checkout wait: from the engine asking for a connection (there's no
+    # "before checkout" pool event, so wrap raw_connection) to the pool's
+    # checkout event, less any DBAPI connect in between. Engine-level pool
+    # listeners carry over to the new pool engine.dispose() makes.
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        token = _checkout.set([time.perf_counter(), 0.0, False])
+        try:
+            return raw_connection(*args, **kwargs)
+        except exc.TimeoutError:
+            pool_timeouts.inc(engine=name)
+            _checked_out(name)
+            raise
+        finally:
+            _checkout.reset(token)
+
+    engine.raw_connection = timed_raw_connection
+
+    @event.listens_for(engine, "do_connect")
+    def _connect_start(dialect, conn_rec, cargs, cparams):
+        conn_rec.info["metrics_connect_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def _connected(dbapi_connection, connection_record):
+        started = connection_record.info.pop("metrics_connect_start", None)
+        checkout = _checkout.get()
+        if started is not None and checkout is not None:
+            checkout[1] += time.perf_counter() - started
+
+    @event.listens_for(engine, "checkout")
+    def _checkout_done(dbapi_connection, connection_record, connection_proxy):
+        _checked_out(name)
+
+    @registry.collector
+    def _pool_gauges():
+        checked_out = getattr(engine.pool, "checkedout", None)
+        if checked_out is None:
+            return  # NullPool/StaticPool: nothing to report
+        pool_checked_out.set(checked_out(), engine=name)
+        pool_size.set(engine.pool.size() if hasattr(engine.pool, "size") else -1, engine=name)
+        pool_overflow.set(max(engine.pool.overflow(), 0) if hasattr(engine.pool, "overflow") else 0, engine=name)
+
+    return engine
+
+
+def _checked_out(name):
+    checkout = _checkout.get()
+    if checkout is None or checkout[2]:
+        return  # not via raw_connection, or already recorded
+    checkout[2] = True
+    pool_wait_seconds.observe(max(time.perf_counter() - checkout[0] - checkout[1], 0.0), engine=name)
+
+
+def _finished(conn, name):
+    elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+    db_queries.inc(engine=name)
+    db_query_seconds.observe(elapsed, engine=name)
+    request = _request_db.get()
+    if request is not None:
+        request[0] += 1
+        request[1] += elapsed
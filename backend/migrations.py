@@ -0,0 +1,273 @@
+# backend/migrations.py
+# Versioned schema migrations.
+#
+# Every database records the migrations it has had in `schema_migrations`.
+# upgrade() runs the missing ones in order, each in its own transaction.
+# main.py calls it at startup; with several workers, run it once up front:
+#
+#   python migrations.py           # apply pending migrations
+#   python migrations.py --status  # list applied/pending
+#
+# Rules for new migrations: append, never edit or renumber an applied one,
+# and keep them idempotent (checkfirst / IF NOT EXISTS) - version 1 builds
+# fresh databases from the current models, so later steps may find their
+# tables, columns and indexes already there.
+import sys
+from datetime import datetime
+from sqlalchemy import text, inspect
+from sqlalchemy.exc import IntegrityError
+import models
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+def _create_indexes(conn, *indexes):
+    for index in indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _index(table, name):
+    return next(i for i in table.indexes if i.name == name)
+
+
+def _add_column(conn, table, column):
+    # ALTER TABLE ... ADD COLUMN, unless create_all() already built it
+    if column.name in {c["name"] for c in inspect(conn).get_columns(table.name)}:
+        return
+    ddl = column.type.compile(dialect=conn.dialect)
+    if column.server_default is not None:
+        default = column.server_default.arg
+        if not isinstance(default, str):
+            default = default.compile(dialect=conn.dialect)
+        ddl += f" DEFAULT {default}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl}"))
+
+
+def _merge_books(conn, groups):
+    """Fold each list of books rows (same accession number, lowest id first)
+    into its first row: fields merged as catalogue_import does, loans and
+    requests repointed, the other rows deleted. Returns rows removed."""
+    from catalogue_import import BOOK_FIELDS, merge_book
+
+    # Generated keys (<sheet>-<S.No>, for sheets without accession numbers)
+    # collide for different books; number them -2, -3... in row order the way
+    # catalogue_import.frame_to_books does, instead of merging
+    renames = []
+    for acc_no, rows in list(groups.items()):
+        if rows[0]["department"] and acc_no.startswith(f"{rows[0]['department']}-"):
+            renames += [{"id": row["id"], "acc_no": f"{acc_no}-{n}"} for n, row in enumerate(rows[1:], start=2)]
+            del groups[acc_no]
+    if renames:
+        conn.execute(text("UPDATE books SET acc_no = :acc_no WHERE id = :id"), renames)
+    if not groups:
+        return 0
+    survivors, moves, removed = [], [], []
+    for acc_no, rows in groups.items():
+        merged = dict(rows[0], acc_no=acc_no)
+        for row in rows[1:]:
+            merged = merge_book(merged, dict(row, acc_no=acc_no))
+        survivors.append(dict(merged, keep_id=rows[0]["id"]))
+        for row in rows[1:]:
+            moves.append({"old": row["id"], "new": rows[0]["id"]})
+            removed.append({"old": row["id"]})
+
+    conn.execute(text("UPDATE transactions SET book_id = :new WHERE book_id = :old"), moves)
+    conn.execute(text("UPDATE rent_requests SET book_id = :new WHERE book_id = :old"), moves)
+    conn.execute(text("DELETE FROM books WHERE id = :old"), removed)
+    # The sheets list the same physical copies, so totals are merged, not
+    # summed; what's on the shelf is that less the loans now pointing here
+    open_loans = dict(conn.execute(text(
+        "SELECT book_id, count(*) FROM transactions WHERE return_date IS NULL GROUP BY book_id"
+    )).all())
+    for row in survivors:
+        row["available_copies"] = max((row["total_copies"] or 0) - open_loans.get(row["keep_id"], 0), 0)
+    sets = ", ".join(f"{field} = :{field}" for field in BOOK_FIELDS)
+    conn.execute(text(f"UPDATE books SET {sets}, available_copies = :available_copies WHERE id = :keep_id"), survivors)
+    conn.execute(text(
+        "UPDATE library_stats SET total_books = (SELECT count(*) FROM books), "
+        "available_copies = (SELECT coalesce(sum(available_copies), 0) FROM books) WHERE id = 1"
+    ))
+    return len(removed)
+
+
+def _book_rows(conn, where):
+    from catalogue_import import BOOK_FIELDS
+
+    columns = ", ".join(["id"] + BOOK_FIELDS)
+    return [dict(row._mapping) for row in conn.execute(text(f"SELECT {columns} FROM books WHERE {where} ORDER BY id"))]
+
+
+# --- MIGRATIONS ---
+
+@migration(1, "baseline tables")
+def baseline(conn):
+    # Databases that predate migrations were built by create_all() at import
+    # time; this creates whatever is missing and leaves existing tables alone.
+    models.Base.metadata.create_all(bind=conn)
+
+
+@migration(2, "hot-path indexes and unique acc_no")
+def hot_path_indexes(conn):
+    books = models.Book.__table__
+    # The accession register has the same acc_no on several rows (books that
+    # appear in Acc.Reg, a department sheet and General). Merge them into the
+    # lowest id before the unique index goes on.
+    groups = {}
+    for row in _book_rows(conn, "acc_no IN (SELECT acc_no FROM books GROUP BY acc_no HAVING count(*) > 1)"):
+        groups.setdefault(row["acc_no"], []).append(row)
+    merged = _merge_books(conn, groups)
+    if merged:
+        print(f"   🔗 Merged {merged} duplicate accession register rows into {len(groups)} books")
+    conn.execute(text("DROP INDEX IF EXISTS ix_books_acc_no"))
+    _create_indexes(conn, _index(books, "ix_books_acc_no"))
+
+    txns = models.Transaction.__table__
+    requests = models.RentRequest.__table__
+    _create_indexes(
+        conn,
+        _index(txns, "ix_transactions_user_open"),
+        _index(txns, "ix_transactions_user_status"),
+        _index(txns, "ix_transactions_status"),
+        _index(requests, "ix_rent_requests_user_book_status"),
+        _index(requests, "ix_rent_requests_pending"),
+    )
+
+
+@migration(3, "users.profile_version")
+def profile_version(conn):
+    users = models.User.__table__
+    _add_column(conn, users, users.c.profile_version)
+
+
+@migration(4, "overdue ledger columns")
+def overdue_ledger(conn):
+    txns = models.Transaction.__table__
+    _add_column(conn, txns, txns.c.is_overdue)
+    _add_column(conn, txns, txns.c.accrued_fine)
+    _create_indexes(conn, _index(txns, "ix_transactions_overdue"))
+    # Filled by fines.refresh(), which the server runs at startup
+
+
+@migration(5, "catalogue_version and books triggers")
+def catalogue_version(conn):
+    stats = models.LibraryStats.__table__
+    _add_column(conn, stats, stats.c.catalogue_version)
+    bump = "UPDATE library_stats SET catalogue_version = catalogue_version + 1 WHERE id = 1"
+    if conn.dialect.name == "sqlite":
+        # Row-level only on SQLite
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS books_catalogue_version_{op.lower()} "
+                f"AFTER {op} ON books BEGIN {bump}; END"
+            ))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "CREATE OR REPLACE FUNCTION bump_catalogue_version() RETURNS trigger AS $$ "
+            f"BEGIN {bump}; RETURN NULL; END $$ LANGUAGE plpgsql"
+        ))
+        conn.execute(text("DROP TRIGGER IF EXISTS books_catalogue_version ON books"))
+        conn.execute(text(
+            "CREATE TRIGGER books_catalogue_version AFTER INSERT OR UPDATE OR DELETE ON books "
+            "FOR EACH STATEMENT EXECUTE FUNCTION bump_catalogue_version()"
+        ))
+
+
+@migration(6, "relative photo URLs")
+def relative_photo_urls(conn):
+    # photo_url used to hold http://127.0.0.1:8000/uploads/...; now just the
+    # path, with the host added per response (photos.public_url)
+    for host in ("http://127.0.0.1:8000", "http://localhost:8000"):
+        conn.execute(
+            text("UPDATE users SET photo_url = substr(photo_url, :start) WHERE photo_url LIKE :pattern"),
+            {"start": len(host) + 1, "pattern": f"{host}/uploads/%"},
+        )
+
+
+@migration(7, "suggest_version and books triggers")
+def suggest_version(conn):
+    # Like catalogue_version, minus the stock UPDATEs every issue/return makes
+    stats = models.LibraryStats.__table__
+    _add_column(conn, stats, stats.c.suggest_version)
+    bump = "UPDATE library_stats SET suggest_version = suggest_version + 1 WHERE id = 1"
+    if conn.dialect.name == "sqlite":
+        for op in ("INSERT", "DELETE"):
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS books_suggest_version_{op.lower()} "
+                f"AFTER {op} ON books BEGIN {bump}; END"
+            ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS books_suggest_version_update "
+            "AFTER UPDATE OF title, author, acc_no ON books "
+            "WHEN OLD.title IS NOT NEW.title OR OLD.author IS NOT NEW.author OR OLD.acc_no IS NOT NEW.acc_no "
+            f"BEGIN {bump}; END"
+        ))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "CREATE OR REPLACE FUNCTION bump_suggest_version() RETURNS trigger AS $$ "
+            f"BEGIN {bump}; RETURN NULL; END $$ LANGUAGE plpgsql"
+        ))
+        conn.execute(text("DROP TRIGGER IF EXISTS books_suggest_version ON books"))
+        conn.execute(text(
+            "CREATE TRIGGER books_suggest_version AFTER INSERT OR DELETE OR UPDATE OF title, author, acc_no "
+            "ON books FOR EACH STATEMENT EXECUTE FUNCTION bump_suggest_version()"
+        ))
+
+
+# --- RUNNER ---
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, description VARCHAR, applied_at TIMESTAMP)"
+    ))
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {v for (v,) in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def upgrade(engine, log=print):
+    """Apply every pending migration. Returns the versions that were applied."""
+    done = applied_versions(engine)
+    applied = []
+    for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        try:
+            with engine.begin() as conn:
+                fn(conn)
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                    {"v": version, "d": description, "t": datetime.now()},
+                )
+        except IntegrityError:
+            if version in applied_versions(engine):
+                continue  # another worker applied it first
+            raise
+        log(f"🛠️ Applied migration {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    if "--status" in sys.argv[1:]:
+        done = applied_versions(engine)
+        for version, description, _ in sorted(MIGRATIONS, key=lambda m: m[0]):
+            mark = "✅" if version in done else "⏳"
+            print(f"{mark} {version:>3}  {description}")
+    else:
+        if not upgrade(engine):
+            print("✅ Database is up to date.")
@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, Index, false
 from sqlalchemy.orm import relationship
 from database import Base
 class User(Base):
@@ -17,13 +17,15 @@ class User(Base):
     branch = Column(String, nullable=True)
     year = Column(String, nullable=True)   
     max_tokens = Column(Integer, default=3) 
+    # Bumped whenever /users/me would change (profile edits, loans, requests) - drives its ETag
+    profile_version = Column(Integer, nullable=False, default=0, server_default="0")
     # Relationships
     issued_books = relationship("Transaction", back_populates="borrower")
     requests = relationship("RentRequest", back_populates="user")
 class Book(Base):
     __tablename__ = "books"
     id = Column(Integer, primary_key=True, index=True)
-    acc_no = Column(String, index=True)
+    acc_no = Column(String, unique=True, index=True)
     title = Column(String, index=True)
     author = Column(String)
     department = Column(String)
@@ -48,8 +50,22 @@ class Transaction(Base):
     # Status: 'Issued', 'Return Requested', 'Returned'
     status = Column(String, default="Issued") 
     fine_amount = Column(Float, default=0.0)
+    # Overdue ledger for open loans, maintained daily by fines.refresh()
+    is_overdue = Column(Boolean, nullable=False, default=False, server_default=false())
+    accrued_fine = Column(Float, nullable=False, default=0.0, server_default="0")
     borrower = relationship("User", back_populates="issued_books")
     book = relationship("Book", back_populates="transactions")
+    # Hot filters in main.py: open loans per user (token limit, /users/me),
+    # (user_id, status) for /admin/users and delete_user, status for the dashboard
+    __table_args__ = (
+        Index("ix_transactions_user_open", "user_id",
+              sqlite_where=return_date.is_(None), postgresql_where=return_date.is_(None)),
+        Index("ix_transactions_user_status", "user_id", "status"),
+        Index("ix_transactions_status", "status"),
+        # /admin/overdue pages through this in (due_date, id) order
+        Index("ix_transactions_overdue", "due_date", "id",
+              sqlite_where=is_overdue.is_(True), postgresql_where=is_overdue.is_(True)),
+    )
 # --- THIS WAS MISSING ---
 class RentRequest(Base):
     __tablename__ = "rent_requests"
@@ -59,4 +75,37 @@ class RentRequest(Base):
     request_date = Column(Date)
     status = Column(String, default="pending") # 'pending', 'approved', 'rejected'
     user = relationship("User", back_populates="requests")
-    book = relationship("Book", back_populates="requests")
\ No newline at end of file
+    book = relationship("Book", back_populates="requests")
+    # Duplicate-request check in request_book, and the pending queue on the dashboard
+    __table_args__ = (
+        Index("ix_rent_requests_user_book_status", "user_id", "book_id", "status"),
+        Index("ix_rent_requests_pending", "book_id",
+              sqlite_where=status == "pending", postgresql_where=status == "pending"),
+    )
+# Single-row summary the admin dashboard reads instead of COUNT/SUM over the
+# whole catalogue. Kept current by library_stats.bump() in the same
+# transaction as each stock change; `python library_stats.py` reconciles it.
+class LibraryStats(Base):
+    __tablename__ = "library_stats"
+    id = Column(Integer, primary_key=True)
+    total_books = Column(Integer, default=0, nullable=False)
+    books_lent = Column(Integer, default=0, nullable=False)
+    available_copies = Column(Integer, default=0, nullable=False)
+    # Bumped by triggers on every books write (migration 5); keys the search cache
+    catalogue_version = Column(Integer, default=0, nullable=False, server_default="0")
+    # Only bumped when books come and go or their title/author/acc_no change (migration 7); keys the suggest index
+    suggest_version = Column(Integer, default=0, nullable=False, server_default="0")
+# Background catalogue upload (/admin/books/import). Lives in the DB, not in
+# process memory, so any worker can answer the status poll.
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    id = Column(String, primary_key=True)
+    filename = Column(String)
+    status = Column(String, default="queued")  # 'queued', 'running', 'done', 'failed'
+    processed_rows = Column(Integer, default=0)
+    inserted_rows = Column(Integer, default=0)
+    updated_rows = Column(Integer, default=0)
+    failed_rows = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime)
+    finished_at = Column(DateTime, nullable=True)
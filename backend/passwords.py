@@ -0,0 +1,99 @@
+# backend/passwords.py
+# bcrypt hashing off the request path.
+#
+# Hashing/verifying is pure CPU (tens to hundreds of ms per call). Running it
+# in the request handler ties up a server thread and holds the GIL, so a
+# burst of logins stalls every other endpoint. Instead each call goes to a
+# small process pool, and at most PASSWORD_MAX_PENDING calls may be queued
+# or running - beyond that PasswordPoolBusy is raised (main.py answers 429)
+# rather than letting the queue grow without limit.
+#
+#   BCRYPT_ROUNDS=12         work factor for new hashes; hashes with any other
+#                            factor are rehashed on the next successful login
+#   PASSWORD_WORKERS=4       worker processes (0 = use the thread pool instead)
+#   PASSWORD_MAX_PENDING=32  hash/verify calls allowed in flight per server process
+#   PASSWORD_WORKER_NICE=5   how much to lower the worker processes' CPU priority
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(os.cpu_count() or 1, 4))))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(max(PASSWORD_WORKERS, 1) * 8)))
+PASSWORD_WORKER_NICE = int(os.getenv("PASSWORD_WORKER_NICE", "5"))
+
+# min = max = default, so a hash made with a different work factor (either
+# way) is reported as needing an update by verify_and_update()
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class PasswordPoolBusy(Exception):
+    """Too many hash/verify calls already in flight."""
+
+
+_slots = threading.BoundedSemaphore(PASSWORD_MAX_PENDING)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    if PASSWORD_WORKERS <= 0:
+        return None  # asyncio's default thread pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process has threads and open DB connections
+            _pool = ProcessPoolExecutor(PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_worker_init)
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# These run inside the worker processes
+def _worker_init():
+    # Lower priority than the server process, so on a busy box the event loop
+    # (and every other endpoint) gets the CPU before bcrypt does
+    if hasattr(os, "nice"):
+        os.nice(PASSWORD_WORKER_NICE)
+
+
+def _hash(password):
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password, hashed):
+    return pwd_context.verify_and_update(password, hashed)
+
+
+async def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise PasswordPoolBusy()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor(), fn, *args)
+    finally:
+        _slots.release()
+
+
+async def hash_password(password):
+    return await _run(_hash, password)
+
+
+async def verify_and_update(password, hashed):
+    """(matches, new_hash) - new_hash is set when the stored hash should be replaced."""
+    return await _run(_verify_and_update, password, hashed)
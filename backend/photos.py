@@ -0,0 +1,236 @@
+# backend/photos.py
+# Profile photo uploads, their thumbnails and how /uploads serves them.
+#
+# The multipart body is parsed from the request stream as it arrives, with a
+# byte cap (MAX_PHOTO_BYTES) enforced on the stream itself, so an oversized
+# upload is cut off with a 413 instead of being spooled to disk first. The
+# parsed file is copied into uploads/ in CHUNK_SIZE pieces on a worker thread
+# and named after a hash of its bytes (user_<id>_<sha256[:16]>.<ext>), so a
+# URL never changes meaning and UploadFiles can mark it immutable.
+#
+# users.photo_url stores the path ("/uploads/<name>"); public_url() adds
+# PUBLIC_BASE_URL for API responses ("" gives relative URLs when the API and
+# frontend share an origin).
+#
+# Thumbnails (THUMB_SIZES px square WebP) are written next to the original
+# as <name>_<size>.webp by make_thumbnails(), which the upload endpoint runs
+# as a background task. thumb_url() only derives the name - it doesn't touch
+# the disk, since it runs once per row in the dashboard and SSE payloads - so
+# until the background task (or the backfill below) has run, the URL 404s
+# and the frontend falls back to the original. Needs Pillow; without it
+# uploads still work, no thumbnails are made and thumb_url() returns None.
+#
+#   python photos.py   # make missing thumbnails for everything in uploads/
+import os
+import re
+import hashlib
+import tempfile
+from starlette.formparsers import MultiPartParser, MultiPartException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+UPLOAD_DIR = "uploads"
+UPLOAD_PATH = "/uploads"  # where main.py mounts UploadFiles
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://127.0.0.1:8000").rstrip("/")
+MAX_PHOTO_BYTES = int(os.getenv("MAX_PHOTO_BYTES", str(5 * 1024 * 1024)))
+# Multipart boundaries and part headers on top of the file itself
+FORM_OVERHEAD = 16 * 1024
+CHUNK_SIZE = 64 * 1024
+THUMB_SIZES = (64, 256)
+THUMB_QUALITY = 80
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+CONTENT_TYPE_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+
+
+class PhotoError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def too_large():
+    return PhotoError(413, f"Photo must be at most {MAX_PHOTO_BYTES // (1024 * 1024)} MB")
+
+
+async def _capped(stream, limit):
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > limit:
+            raise too_large()
+        yield chunk
+
+
+async def receive_upload(request, field="file"):
+    """Parse a multipart upload with the size cap applied while reading. Returns the UploadFile."""
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise PhotoError(400, "Expected a multipart/form-data upload")
+    limit = MAX_PHOTO_BYTES + FORM_OVERHEAD
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise too_large()  # before reading a byte
+    parser = MultiPartParser(request.headers, _capped(request.stream(), limit), max_files=1, max_fields=0)
+    try:
+        form = await parser.parse()
+    except MultiPartException as e:
+        raise PhotoError(400, e.message)
+    upload = form.get(field)
+    if upload is None or isinstance(upload, str):
+        raise PhotoError(400, f"Missing '{field}' file")
+    if not (upload.content_type or "").startswith("image/"):
+        await upload.close()
+        raise PhotoError(400, "File must be an image")
+    if upload.size is not None and upload.size > MAX_PHOTO_BYTES:
+        await upload.close()
+        raise too_large()  # the stream cap above allows for the form overhead
+    return upload
+
+
+def extension_for(upload):
+    ext = os.path.splitext(upload.filename or "")[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return ext
+    return CONTENT_TYPE_EXTENSIONS.get(upload.content_type, ".jpg")
+
+
+def store(upload, prefix):
+    """Copy the parsed upload into UPLOAD_DIR as <prefix>_<hash><ext> (blocking - run
+    in a thread). Returns the file name."""
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    try:
+        upload.file.seek(0)
+        with os.fdopen(fd, "wb") as out:
+            while chunk := upload.file.read(CHUNK_SIZE):
+                digest.update(chunk)
+                out.write(chunk)
+        if Image is not None:
+            try:
+                with Image.open(tmp) as img:
+                    img.verify()
+            except Exception:
+                raise PhotoError(400, "File is not a readable image")
+        filename = f"{prefix}_{digest.hexdigest()[:16]}{extension_for(upload)}"
+        os.replace(tmp, os.path.join(UPLOAD_DIR, filename))  # same bytes, same name: harmless
+    finally:
+        upload.file.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return filename
+
+
+def stored_path(filename):
+    """What users.photo_url holds for an uploaded file."""
+    return f"{UPLOAD_PATH}/{filename}"
+
+
+def public_url(photo_url):
+    """Absolute URL for API responses. Full URLs (e.g. external photos) pass through."""
+    if not photo_url or photo_url.startswith(("http://", "https://")):
+        return photo_url
+    return f"{PUBLIC_BASE_URL}{photo_url}"
+
+
+# --- THUMBNAILS ---
+
+def thumb_name(filename, size):
+    return f"{os.path.splitext(filename)[0]}_{size}.webp"
+
+
+def make_thumbnails(path, log=print):
+    """Write the square WebP thumbnails for the photo at `path`. Returns how many were made."""
+    if Image is None:
+        return 0
+    made = 0
+    try:
+        with Image.open(path) as img:
+            img = ImageOps.exif_transpose(img).convert("RGB")
+            for size in THUMB_SIZES:
+                target = os.path.join(os.path.dirname(path), thumb_name(os.path.basename(path), size))
+                tmp = f"{target}.part"
+                ImageOps.fit(img, (size, size), Image.LANCZOS).save(tmp, "WEBP", quality=THUMB_QUALITY)
+                os.replace(tmp, target)  # never serve a half-written file
+                made += 1
+    except Exception as e:
+        log(f"⚠️ Could not make thumbnails for {path}: {e}")
+    return made
+
+
+def thumb_url(photo_url, size):
+    """Public URL of the `size` thumbnail for a photo in uploads/, or None for external
+    photos and when thumbnails are off. Doesn't check the file exists (see above)."""
+    if Image is None or not photo_url:
+        return None
+    base, _, filename = photo_url.rpartition("/")
+    if base not in (UPLOAD_PATH, f"{PUBLIC_BASE_URL}{UPLOAD_PATH}"):  # older rows hold the full URL
+        return None
+    return public_url(f"{base}/{thumb_name(filename, size)}")
+
+
+def remove_photo(photo_url):
+    """Delete a stored photo and its thumbnails (blocking). Missing files are fine."""
+    if not photo_url:
+        return
+    filename = photo_url.rsplit("/", 1)[-1]
+    for name in [filename] + [thumb_name(filename, size) for size in THUMB_SIZES]:
+        try:
+            os.remove(os.path.join(UPLOAD_DIR, name))
+        except OSError:
+            pass
+
+
+# --- SERVING ---
+# Content-hashed names (and their thumbnails) never change, so browsers may
+# keep them for a year without asking. Older timestamped names revalidate
+# with the ETag/Last-Modified that FileResponse sets, which get a 304.
+#
+# FileResponse already sends via the ASGI pathsend extension (zero-copy)
+# when the server offers it. Behind nginx, set UPLOADS_SENDFILE_HEADER
+# (X-Accel-Redirect) and UPLOADS_SENDFILE_PREFIX (an `internal` location
+# aliased to uploads/) and the app only sends headers.
+IMMUTABLE_NAME = re.compile(r"_[0-9a-f]{16}(_\d+)?\.\w+$")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+SENDFILE_HEADER = os.getenv("UPLOADS_SENDFILE_HEADER")
+SENDFILE_PREFIX = os.getenv("UPLOADS_SENDFILE_PREFIX", "/internal-uploads/")
+
+
+class UploadFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        name = os.path.basename(full_path)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE if IMMUTABLE_NAME.search(name) else "no-cache"
+        if SENDFILE_HEADER and response.status_code == 200:
+            headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+            headers[SENDFILE_HEADER] = SENDFILE_PREFIX + name
+            return Response(status_code=200, headers=headers)
+        return response
+
+
+def backfill(log=print):
+    if Image is None:
+        log("❌ Pillow is not installed (pip install pillow)")
+        return 0
+    thumbs = {f"_{size}.webp" for size in THUMB_SIZES}
+    done = 0
+    for name in sorted(os.listdir(UPLOAD_DIR)):
+        if name.endswith(".part") or any(name.endswith(t) for t in thumbs):
+            continue
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+        if all(os.path.exists(os.path.join(UPLOAD_DIR, thumb_name(name, s))) for s in THUMB_SIZES):
+            continue
+        if make_thumbnails(os.path.join(UPLOAD_DIR, name), log):
+            done += 1
+    log(f"🖼️ Thumbnails made for {done} photos")
+    return done
+
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,448 @@
+# backend/search.py
+# Full-text search for the book catalogue.
+#
+# SQLite: an FTS5 "external content" table (books_fts) that mirrors the
+#         searchable columns of `books` and is kept in sync by triggers, so
+#         seed.py, the API and manual SQL edits all stay indexed.
+# Postgres: a GIN index over a weighted tsvector expression plus pg_trgm
+#         indexes on title/author/acc_no.
+# Anything else falls back to the old LIKE scan.
+#
+# mode=fuzzy (fuzzy_page) tolerates typos: a trigram index over title/author
+# (a second FTS5 table with the trigram tokenizer on SQLite, the pg_trgm
+# indexes on Postgres) prunes the catalogue to a few hundred candidates and
+# those are ranked by edit distance in Python.
+import re
+import json
+import base64
+from sqlalchemy import select, or_, and_, func, table, column, text, literal, literal_column, tuple_, bindparam
+from sqlalchemy.exc import OperationalError, ProgrammingError
+import models
+import library_stats
+
+FTS_TABLE = "books_fts"
+
+# bm25 column weights for (title, author, acc_no, department)
+FTS_RANK = "bm25(10.0, 5.0, 2.0, 1.0)"
+
+# Which engine is serving /books/search/ ('fts5', 'postgres' or 'like').
+# Set once by setup_search_index() at startup.
+SEARCH_BACKEND = "like"
+
+# Paging limits for /books/search/
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+# total_estimate stops counting here - a search box doesn't need "1 of 412,377"
+COUNT_CAP = 1000
+
+# What a search result row carries (no ORM entities, no relationship loading)
+BOOK_COLUMNS = (
+    models.Book.id,
+    models.Book.acc_no,
+    models.Book.title,
+    models.Book.author,
+    models.Book.department,
+    models.Book.publisher,
+    models.Book.edition_year,
+    models.Book.total_copies,
+    models.Book.available_copies,
+)
+BOOK_FIELDS = tuple(c.key for c in BOOK_COLUMNS)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Fuzzy mode: which trigram index is available ('fts5' or 'postgres'), set by
+# setup_search_index(); None means mode=fuzzy runs the normal search.
+FUZZY_BACKEND = None
+FUZZY_TABLE = "books_trgm"
+FUZZY_VOCAB = "books_trgm_vocab"
+# Rows pulled from the trigram index and ranked by edit distance
+FUZZY_CANDIDATES = 300
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, author, acc_no, department,
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author, acc_no, department)
+        VALUES (new.id, new.title, new.author, new.acc_no, new.department);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author, acc_no, department)
+        VALUES ('delete', old.id, old.title, old.author, old.acc_no, old.department);
+    END""",
+    # Only the indexed columns - stock updates on every issue/return must not
+    # churn the index.
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_au
+        AFTER UPDATE OF title, author, acc_no, department ON books BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author, acc_no, department)
+        VALUES ('delete', old.id, old.title, old.author, old.acc_no, old.department);
+        INSERT INTO {FTS_TABLE}(rowid, title, author, acc_no, department)
+        VALUES (new.id, new.title, new.author, new.acc_no, new.department);
+    END""",
+]
+
+# detail='none': only "which rows contain this trigram" is ever asked, so no
+# positions are stored. Triggers as for books_fts.
+_SQLITE_FUZZY_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FUZZY_TABLE} USING fts5(
+        title, author,
+        content='books', content_rowid='id',
+        tokenize='trigram', detail='none'
+    )""",
+    # Per-trigram document counts, to pick the rarest trigrams of a word
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FUZZY_VOCAB} USING fts5vocab({FUZZY_TABLE}, 'row')",
+    f"""CREATE TRIGGER IF NOT EXISTS books_trgm_ai AFTER INSERT ON books BEGIN
+        INSERT INTO {FUZZY_TABLE}(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_trgm_ad AFTER DELETE ON books BEGIN
+        INSERT INTO {FUZZY_TABLE}({FUZZY_TABLE}, rowid, title, author)
+        VALUES ('delete', old.id, old.title, old.author);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_trgm_au AFTER UPDATE OF title, author ON books BEGIN
+        INSERT INTO {FUZZY_TABLE}({FUZZY_TABLE}, rowid, title, author)
+        VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO {FUZZY_TABLE}(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+]
+
+# Must match the indexed expression exactly or Postgres won't use the index.
+PG_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(books.title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(books.author, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(books.acc_no, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(books.department, '')), 'D')"
+)
+
+_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_books_search_tsv ON books USING GIN (({PG_DOCUMENT}))",
+    "CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING GIN (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_books_author_trgm ON books USING GIN (author gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_books_acc_no_trgm ON books USING GIN (acc_no gin_trgm_ops)",
+]
+
+
+def setup_search_index(engine):
+    """Create the search index for this backend (idempotent) and pick SEARCH_BACKEND."""
+    global SEARCH_BACKEND, FUZZY_BACKEND
+    dialect = engine.dialect.name
+    try:
+        if dialect == "sqlite":
+            with engine.begin() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}
+                ).first()
+                for ddl in _SQLITE_DDL:
+                    conn.execute(text(ddl))
+                if not exists:
+                    # First run on an existing database: index the rows already there
+                    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                    conn.execute(
+                        text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', :rank)"),
+                        {"rank": FTS_RANK},
+                    )
+            SEARCH_BACKEND = "fts5"
+            setup_fuzzy_index(engine)
+        elif dialect == "postgresql":
+            with engine.begin() as conn:
+                for ddl in _POSTGRES_DDL:
+                    conn.execute(text(ddl))
+            SEARCH_BACKEND = "postgres"
+            FUZZY_BACKEND = "postgres"  # the pg_trgm indexes above
+        else:
+            SEARCH_BACKEND = "like"
+            FUZZY_BACKEND = None
+    except (OperationalError, ProgrammingError) as e:
+        # e.g. SQLite compiled without FTS5, or no rights to create pg_trgm
+        print(f"⚠️ Full-text search unavailable, falling back to LIKE: {e}")
+        SEARCH_BACKEND = "like"
+        FUZZY_BACKEND = None
+    return SEARCH_BACKEND
+
+
+def setup_fuzzy_index(engine):
+    """SQLite trigram index for mode=fuzzy. Optional: the trigram tokenizer needs SQLite 3.34+."""
+    global FUZZY_BACKEND
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FUZZY_TABLE}
+            ).first()
+            for ddl in _SQLITE_FUZZY_DDL:
+                conn.execute(text(ddl))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {FUZZY_TABLE}({FUZZY_TABLE}) VALUES ('rebuild')"))
+        FUZZY_BACKEND = "fts5"
+    except OperationalError as e:
+        print(f"⚠️ Fuzzy search unavailable (mode=fuzzy will match exactly): {e}")
+        FUZZY_BACKEND = None
+
+
+def tokenize(query):
+    """Split a raw search box string into lower-cased word tokens."""
+    return _TOKEN_RE.findall((query or "").lower())
+
+
+def normalise_query(query):
+    """Cache key for `query`: raw strings that build the same SQL share one."""
+    if SEARCH_BACKEND == "like":
+        return query or ""  # LIKE matches the raw string
+    return " ".join(tokenize(query))
+
+
+def fts5_match_expression(tokens):
+    # Every token must match, the last word can be partially typed ("progr" -> "programming")
+    # and earlier ones too, so "kochan prog" finds "Programming in C / Kochan".
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def pg_tsquery(tokens):
+    return " & ".join(f"{t}:*" for t in tokens)
+
+
+def build_search(query, columns=BOOK_COLUMNS):
+    """Return (stmt, rank) for `query`.
+
+    `rank` is the relevance expression (lower is better) or None when the
+    results are ordered by (title, id) instead - empty query or LIKE fallback.
+    The statement is not ordered; search_page() adds ORDER BY and the keyset.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return select(*columns), None
+
+    if SEARCH_BACKEND == "fts5":
+        fts = table(FTS_TABLE, column("rowid"), column("rank"))
+        stmt = (
+            select(*columns)
+            .join(fts, fts.c.rowid == models.Book.id)
+            .where(text(f"{FTS_TABLE} MATCH :match").bindparams(match=fts5_match_expression(tokens)))
+        )
+        return stmt, fts.c.rank
+
+    if SEARCH_BACKEND == "postgres":
+        document = literal_column(PG_DOCUMENT)
+        tsquery = func.to_tsquery("simple", pg_tsquery(tokens))
+        stmt = select(*columns).where(document.op("@@")(tsquery))
+        return stmt, -func.ts_rank(document, tsquery)
+
+    stmt = select(*columns).where(
+        or_(
+            models.Book.title.contains(query),
+            models.Book.author.contains(query),
+            models.Book.acc_no.contains(query),
+            models.Book.department.contains(query),
+        )
+    )
+    return stmt, None
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != 2 or not isinstance(values[1], int):
+        raise InvalidCursor(cursor)
+    return values
+
+
+def _after_title(title, book_id, nulls_first):
+    # Keyset on (title, id). 18 rows in the register have no title; SQLite sorts
+    # those first, Postgres last, so the predicate has to follow the dialect.
+    Book = models.Book
+    if title is None:
+        tail = and_(Book.title.is_(None), Book.id > book_id)
+        return or_(tail, Book.title.isnot(None)) if nulls_first else tail
+    after = tuple_(Book.title, Book.id) > tuple_(title, book_id)
+    return after if nulls_first else or_(after, Book.title.is_(None))
+
+
+def search_page(db, query, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """One page of search results plus the cursor for the next one.
+
+    Pages are keyset-paginated on (relevance, id) for text queries and on
+    (title, id) when browsing, so page 500 costs the same as page 1.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    stmt, rank = build_search(query)
+    after = decode_cursor(cursor) if cursor else None
+
+    if rank is not None:
+        order = (rank, models.Book.id)
+        if after:
+            stmt = stmt.where(or_(rank > after[0], and_(rank == after[0], models.Book.id > after[1])))
+    else:
+        order = (models.Book.title, models.Book.id)
+        if after:
+            nulls_first = db.get_bind().dialect.name == "sqlite"
+            stmt = stmt.where(_after_title(after[0], after[1], nulls_first))
+
+    total = None
+    if after is None and not tokenize(query):
+        # Browsing the whole catalogue: the maintained counter is exact and O(1)
+        total = library_stats.read(db)["total_books"]
+    elif after is None:
+        capped = stmt.with_only_columns(models.Book.id).limit(COUNT_CAP).subquery()
+        total = db.execute(select(func.count()).select_from(capped)).scalar()
+
+    if rank is not None:
+        stmt = stmt.add_columns(rank.label("score"))
+    rows = db.execute(stmt.order_by(*order).limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        key = last.score if rank is not None else last.title
+        next_cursor = encode_cursor([key, last.id])
+
+    return {
+        "items": [{field: row._mapping[field] for field in BOOK_FIELDS} for row in rows],
+        "next_cursor": next_cursor,
+        "total_estimate": total,
+    }
+
+
+# --- FUZZY MODE ---
+
+def max_edits(word):
+    # Typos allowed per query word; 3-letter words have to match as typed.
+    # Each extra edit ORs 4 more trigrams into the candidate query, so 2 only
+    # for long words.
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 8 else 2
+
+
+def trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def edit_distance(a, b, cap):
+    """Edits (insert, delete, substitute, swap two neighbours) turning a into b,
+    or cap + 1 as soon as it must exceed `cap`."""
+    if abs(len(a) - len(b)) > cap:
+        return cap + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            d = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                d = min(d, before[j - 2] + 1)
+            current.append(d)
+        if min(current) > cap:
+            return cap + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def _fts5_fuzzy_match(db, words):
+    """MATCH expression selecting the candidate rows for `words`, or None.
+
+    One edit (a swap included) destroys at most 4 of a word's trigrams, so a
+    row within k edits still contains one of any 4k+1 of them: OR the rarest (per
+    the vocab table), AND across words. A word with fewer trigrams than that
+    ORs all of them instead - best effort, bm25 puts rows sharing the most
+    rare ones first. Words under 3 letters don't take part.
+    """
+    grams = {word: trigrams(word) for word in words if len(word) >= 3}
+    if not grams:
+        return None
+    docs = dict(db.execute(
+        text(f"SELECT term, doc FROM {FUZZY_VOCAB} WHERE term IN :terms")
+        .bindparams(bindparam("terms", expanding=True)),
+        {"terms": sorted(set().union(*grams.values()))},
+    ).all())
+    clauses = []
+    for word, word_grams in grams.items():
+        rarest = sorted(word_grams, key=lambda g: (docs.get(g, 0), g))[:4 * max_edits(word) + 1]
+        clauses.append("(" + " OR ".join(f'"{g}"' for g in rarest) + ")")
+    return " AND ".join(clauses)
+
+
+def _fuzzy_candidates(db, words):
+    """Up to FUZZY_CANDIDATES rows from the trigram index, best first, or None if it can't prune."""
+    if FUZZY_BACKEND == "fts5":
+        match = _fts5_fuzzy_match(db, words)
+        if match is None:
+            return None
+        trgm = table(FUZZY_TABLE, column("rowid"), column("rank"))
+        stmt = (
+            select(*BOOK_COLUMNS)
+            .join(trgm, trgm.c.rowid == models.Book.id)
+            .where(text(f"{FUZZY_TABLE} MATCH :match").bindparams(match=match))
+            .order_by(trgm.c.rank)
+        )
+    else:
+        # pg_trgm: `<%` (word similarity above pg_trgm.word_similarity_threshold) uses the GIN indexes
+        q = literal(" ".join(words))
+        similarity = func.greatest(
+            func.word_similarity(q, func.coalesce(models.Book.title, "")),
+            func.word_similarity(q, func.coalesce(models.Book.author, "")),
+        )
+        stmt = (
+            select(*BOOK_COLUMNS)
+            .where(or_(q.op("<%")(models.Book.title), q.op("<%")(models.Book.author)))
+            .order_by(similarity.desc())
+        )
+    return db.execute(stmt.limit(FUZZY_CANDIDATES)).all()
+
+
+def fuzzy_page(db, query, limit=DEFAULT_PAGE_SIZE):
+    """Typo-tolerant search: one page of books whose title/author words are
+    each within max_edits() of a query word (or start with it), fewest edits
+    first. Single page, no cursor. Falls back to search_page() when there is
+    no trigram index or the query is too short to prune on."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    words = tokenize(query)
+    rows = _fuzzy_candidates(db, words) if FUZZY_BACKEND and words else None
+    if rows is None:
+        return search_page(db, query, limit=limit)
+
+    distances = {}  # (query word, row word) -> edits; words repeat a lot across rows
+
+    def word_distance(word, row_words):
+        best = max_edits(word) + 1
+        for other in row_words:
+            key = (word, other)
+            if key not in distances:
+                cap = max_edits(word)
+                distances[key] = min(edit_distance(word, other, cap), edit_distance(word, other[:len(word)], cap))
+            best = min(best, distances[key])
+        return best
+
+    ranked = []
+    for position, row in enumerate(rows):
+        row_words = set(tokenize(f"{row.title or ''} {row.author or ''}"))
+        total = 0
+        for word in words:
+            d = word_distance(word, row_words)
+            if d > max_edits(word):
+                break
+            total += d
+        else:
+            ranked.append((total, position, row))
+    ranked.sort(key=lambda r: (r[0], r[1]))
+
+    return {
+        "items": [{field: row._mapping[field] for field in BOOK_FIELDS} for _, _, row in ranked[:limit]],
+        "next_cursor": None,
+        "total_estimate": len(ranked),
+    }
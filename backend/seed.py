@@ -1,118 +1,45 @@
-import pandas as pd
-from sqlalchemy.orm import Session
+# backend/seed.py
+# Loads the accession register into the books table.
+#
+#   python seed.py "CBIT ACC Register- as on 28.08.25.xls"
+#   python seed.py register.xls --chunk-size 2000 --dry-run
+#
+# Safe to re-run: books are matched on acc_no and updated instead of being
+# inserted again (see catalogue_import.py).
+import argparse
 from database import SessionLocal, engine
-import models
+import migrations
+import library_stats
+import catalogue_import
 
 # 1. Ensure tables exist
-models.Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
 
-def find_header_row(df):
-    """
-    Scans for the header row.
-    Priority 1: 'Acc' (Standard sheets)
-    Priority 2: 'Title' + 'Author' (Extra Books sheet which lacks Acc No)
-    """
-    for i, row in df.iterrows():
-        row_str = " ".join(row.astype(str).values).lower()
-        
-        # Standard Sheets
-        if "acc" in row_str and "title" in row_str:
-            return i
-        # "Extra Books" Sheet (Has S.No, Title, Author but no Acc)
-        if "title" in row_str and "author" in row_str:
-            return i
-            
-    return None
 
-def clean_text(val):
-    s = str(val).strip()
-    if s.lower() in ['nan', 'nat', 'none', '', '0', '0.0']:
-        return None
-    return s
-
-def seed_data():
+def seed_data(file_path, chunk_size=catalogue_import.DEFAULT_CHUNK_SIZE, dry_run=False):
     db = SessionLocal()
-    file_path = "C:\\library_management\\backend\CBIT ACC Register- as on 28.08.25.xls"
-    
     try:
-        xls = pd.ExcelFile(file_path)
+        library_stats.ensure(db)
+        totals = catalogue_import.import_workbook(db, file_path, chunk_size=chunk_size, dry_run=dry_run)
     except FileNotFoundError:
         print(f"❌ File not found at: {file_path}")
         return
+    finally:
+        db.close()
 
-    total_books_added = 0
-
-    for sheet_name in xls.sheet_names:
-        print(f"📥 Processing Sheet: {sheet_name}")
-        
-        try:
-            # 1. Find Header
-            df_raw = pd.read_excel(xls, sheet_name=sheet_name, header=None, nrows=20)
-            header_idx = find_header_row(df_raw)
-            
-            if header_idx is None:
-                print(f"   ⚠️ Skipping {sheet_name}: No valid header found.")
-                continue
-
-            # 2. Read Data
-            df = pd.read_excel(xls, sheet_name=sheet_name, header=header_idx)
-            df.columns = df.columns.astype(str).str.replace(r'[^\w]', '', regex=True).str.lower()
-            
-            count = 0
-            for index, row in df.iterrows():
-                # 3. Find or Generate Acc No
-                acc = None
-                for col in df.columns:
-                    if 'acc' in col or 'accession' in col:
-                        acc = clean_text(row.get(col))
-                        if acc: break
-                
-                # FIX: If no Acc No (like in Extra Books), generate one using Sheet Name + S.No
-                if not acc:
-                    s_no = row.get('sno') or row.get('slno') or (index + 1)
-                    acc = f"{sheet_name}-{s_no}"
-
-                title = clean_text(row.get('titleofthebook') or row.get('title') or 'Unknown')
-                
-                # 4. Get Copy Count
-                raw_copies = row.get('noofcopies') or row.get('copies') or row.get('nos')
-                try:
-                    num_copies = int(float(raw_copies))
-                    if num_copies < 1: num_copies = 1
-                except:
-                    num_copies = 1 
-
-                author = clean_text(row.get('author') or 'Unknown')
-                publisher = clean_text(row.get('publisher') or row.get('place') or row.get('placepublisher'))
-                year = clean_text(row.get('year') or row.get('edition'))
-                pages = clean_text(row.get('pages'))
-                call_no = clean_text(row.get('callno') or row.get('classno'))
-                
-                # 5. Add to DB
-                new_book = models.Book(
-                    acc_no=acc,
-                    title=title,
-                    author=author,
-                    department=sheet_name,
-                    publisher=publisher,
-                    edition_year=year,
-                    pages=pages,
-                    call_no=call_no,
-                    total_copies=num_copies,
-                    available_copies=num_copies
-                )
-                db.add(new_book)
-                count += 1
-            
-            db.commit()
-            print(f"   ✅ Added {count} entries from {sheet_name}")
-            total_books_added += count
-
-        except Exception as e:
-            print(f"   ❌ Error in {sheet_name}: {e}")
+    rate = totals["rows"] / max(totals["seconds"], 1e-9)
+    label = "Dry run" if dry_run else "Seeding"
+    print(f"\n🎉 {label} Completed! {totals['inserted']} new, {totals['updated']} updated "
+          f"({totals['rows']} rows in {totals['seconds']:.1f}s, {rate:,.0f} rows/s)")
+    if dry_run:
+        print("   (dry run - nothing was written)")
 
-    db.close()
-    print(f"\n🎉 Seeding Completed! Total Rows: {total_books_added}")
 
 if __name__ == "__main__":
-    seed_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Import the library accession register (.xls/.xlsx)")
+    parser.add_argument("path", help="Path to the accession register workbook")
+    parser.add_argument("--chunk-size", type=int, default=catalogue_import.DEFAULT_CHUNK_SIZE,
+                        help="Rows per bulk INSERT/UPDATE batch")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and match everything, write nothing")
+    args = parser.parse_args()
+    seed_data(args.path, chunk_size=args.chunk_size, dry_run=args.dry_run)
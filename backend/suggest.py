@@ -0,0 +1,292 @@
+# backend/suggest.py
+# Type-ahead completions for the search boxes (/books/suggest).
+#
+# Each searchable field (title, author, acc_no) gets a PrefixIndex: a sorted
+# list of normalised values (search.tokenize, joined by spaces) with the
+# display text and the number of books sharing it in parallel arrays. A
+# lookup bisects to the range of keys starting with the prefix and returns
+# the ones carried by the most books, so it never touches the database.
+# Short prefixes match huge ranges; their top entries are cached until the
+# next update.
+#
+# The index is loaded at startup and kept current two ways:
+#   * catalogue_import records the old/new (title, author, acc_no) of every
+#     row it writes on the session (record_changes); they are applied to the
+#     index when that session commits and dropped if it rolls back.
+#   * scheduler() rebuilds from the table every SUGGEST_REBUILD_SECONDS if
+#     library_stats.suggest_version moved, which picks up other workers,
+#     seed.py and manual SQL edits. That version ignores stock changes, so
+#     normal lending never triggers a rebuild.
+#
+#   python bench_suggest.py --titles 500000   # memory / latency report
+import asyncio
+import heapq
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+import models
+import search
+import library_stats
+
+FIELDS = ("title", "author", "acc_no")
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Batches with more inserts/deletes than this are spliced in one pass
+SMALL_UPDATE = 16
+# Prefixes matching more keys than this have their ranking cached
+RANK_CACHE_RANGE = 2000
+SUGGEST_REBUILD_SECONDS = float(os.getenv("SUGGEST_REBUILD_SECONDS", "900"))
+
+_PENDING = "suggest_changes"  # Session.info key
+
+
+def normalise(text):
+    return " ".join(search.tokenize(text))
+
+
+class PrefixIndex:
+    def __init__(self, counts=None):
+        """`counts` maps display text -> number of books carrying it."""
+        merged = {}
+        for text, n in (counts or {}).items():
+            key = normalise(text)
+            if not key:
+                continue
+            if key in merged:
+                merged[key][1] += n
+            else:
+                merged[key] = [_display(text, key), n]
+        self.keys = sorted(merged)
+        self.texts = [merged[k][0] for k in self.keys]
+        self.counts = array("I", (merged[k][1] for k in self.keys))
+        self._top = {}  # prefix -> top MAX_LIMIT (text, books), see complete()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def update(self, removed=(), added=()):
+        """Apply a batch of removed/added display texts (one per book)."""
+        delta = {}  # key -> [display, change in book count]
+        for text in removed:
+            key = normalise(text)
+            if key:
+                delta.setdefault(key, [None, 0])[1] -= 1
+        for text in added:
+            key = normalise(text)
+            if key:
+                entry = delta.setdefault(key, [None, 0])
+                entry[1] += 1
+                if entry[0] is None:
+                    entry[0] = _display(text, key)
+
+        self._top.clear()
+        edits = []  # (position, is_drop, (key, text, count))
+        for key, (text, change) in delta.items():
+            i = bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                if self.counts[i] + change > 0:
+                    self.counts[i] += change
+                else:
+                    edits.append((i, 1, None))
+            elif change > 0:
+                edits.append((i, 0, (key, text or key, change)))
+        # By position; at one position inserts (in key order) go before the drop
+        edits.sort(key=lambda e: (e[0], e[1], e[2][0] if e[2] else ""))
+        if len(edits) <= SMALL_UPDATE:
+            # In place, back to front so earlier positions stay valid
+            for i, is_drop, item in reversed(edits):
+                if is_drop:
+                    del self.keys[i], self.texts[i], self.counts[i]
+                else:
+                    self.keys.insert(i, item[0])
+                    self.texts.insert(i, item[1])
+                    self.counts.insert(i, item[2])
+        else:
+            self._splice(edits)
+
+    def _splice(self, edits):
+        # One pass copying the untouched runs between edits: O(n + edits)
+        # instead of an O(n) memmove per list.insert
+        keys, texts, counts = [], [], array("I")
+        prev = 0
+        for i, is_drop, item in edits:
+            keys += self.keys[prev:i]
+            texts += self.texts[prev:i]
+            counts += self.counts[prev:i]
+            if is_drop:
+                prev = i + 1
+            else:
+                keys.append(item[0])
+                texts.append(item[1])
+                counts.append(item[2])
+                prev = i
+        keys += self.keys[prev:]
+        texts += self.texts[prev:]
+        counts += self.counts[prev:]
+        self.keys, self.texts, self.counts = keys, texts, counts
+
+    def complete(self, prefix, k):
+        """Up to k (text, books) pairs whose normalised value starts with `prefix`,
+        most books first (ties in key order)."""
+        cached = self._top.get(prefix)
+        if cached is not None:
+            return cached[:k]
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\uffff", lo)
+        if hi - lo <= RANK_CACHE_RANGE:
+            return self._ranked(lo, hi, k)
+        top = self._top[prefix] = self._ranked(lo, hi, MAX_LIMIT)
+        return top[:k]
+
+    def _ranked(self, lo, hi, k):
+        best = heapq.nlargest(k, range(lo, hi), key=self.counts.__getitem__)  # stable: ties keep key order
+        return [(self.texts[i], self.counts[i]) for i in best]
+
+    def approx_bytes(self):
+        strings = sum(map(sys.getsizeof, self.keys))
+        strings += sum(sys.getsizeof(t) for t, key in zip(self.texts, self.keys) if t is not key)
+        arrays = sys.getsizeof(self.keys) + sys.getsizeof(self.texts) + sys.getsizeof(self.counts)
+        return strings + arrays
+
+
+def _display(text, key):
+    # Share the key object when the display text is already normalised
+    text = " ".join(text.split())
+    return key if text == key else text
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fields = {field: PrefixIndex() for field in FIELDS}
+        self.version = None
+        self.loaded_at = None
+        self.build_seconds = None
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def load(self, rows, version=None):
+        """Replace the index with `rows` of (title, author, acc_no)."""
+        start = time.perf_counter()
+        counters = {field: Counter() for field in FIELDS}
+        for row in rows:
+            for field, value in zip(FIELDS, row):
+                if value:
+                    counters[field][value] += 1
+        fields = {field: PrefixIndex(counters[field]) for field in FIELDS}
+        with self._lock:
+            self.fields = fields
+            self.version = version
+            self.loaded_at = time.time()
+            self.build_seconds = round(time.perf_counter() - start, 3)
+
+    def apply(self, removed=(), added=()):
+        with self._lock:
+            for n, field in enumerate(FIELDS):
+                self.fields[field].update(
+                    removed=[row[n] for row in removed if row[n]],
+                    added=[row[n] for row in added if row[n]],
+                )
+
+    def complete(self, query, k=DEFAULT_LIMIT):
+        """Top-k completions across title, author and acc_no, most books first."""
+        prefix = normalise(query)
+        if not prefix:
+            return []
+        with self._lock:
+            per_field = [
+                [(text, field, n) for text, n in self.fields[field].complete(prefix, k)]
+                for field in FIELDS
+            ]
+        # Interleave the fields so ties favour variety, then rank by books
+        out = []
+        for rank in range(k):
+            for matches in per_field:
+                if rank < len(matches):
+                    out.append(matches[rank])
+        out.sort(key=lambda match: -match[2])
+        return [{"text": text, "field": field, "books": n} for text, field, n in out[:k]]
+
+    def stats(self):
+        with self._lock:
+            fields = dict(self.fields)
+        return {
+            "loaded": self.loaded,
+            "suggest_version": self.version,
+            "build_seconds": self.build_seconds,
+            "entries": {field: len(idx) for field, idx in fields.items()},
+            "approx_bytes": sum(idx.approx_bytes() for idx in fields.values()),
+        }
+
+
+index = SuggestIndex()
+
+
+# --- LOADING ---
+
+def catalogue_rows(db):
+    Book = models.Book
+    stmt = select(Book.title, Book.author, Book.acc_no).execution_options(yield_per=5000)
+    return (tuple(row) for row in db.execute(stmt))
+
+
+def rebuild(db, force=False):
+    """Reload from the books table unless suggest_version is unchanged. Returns True if rebuilt."""
+    version = library_stats.suggest_version(db)
+    if not force and index.loaded and version == index.version:
+        return False
+    index.load(catalogue_rows(db), version=version)
+    return True
+
+
+def run_rebuild(force=False, log=print):
+    from database import SessionLocal
+
+    with SessionLocal() as db:
+        if rebuild(db, force=force):
+            stats = index.stats()
+            log(f"🔤 Suggest index built: {sum(stats['entries'].values())} entries "
+                f"in {stats['build_seconds']}s (~{stats['approx_bytes'] / 2**20:.1f} MiB)")
+
+
+async def scheduler(log=print):
+    """Build now, then re-check every SUGGEST_REBUILD_SECONDS. Runs until cancelled."""
+    force = True
+    while True:
+        try:
+            await asyncio.to_thread(run_rebuild, force, log)
+            force = False
+        except Exception as e:
+            log(f"❌ Suggest index rebuild failed: {e}")
+        await asyncio.sleep(SUGGEST_REBUILD_SECONDS)
+
+
+# --- INCREMENTAL UPDATES ---
+
+def record_changes(db, removed=(), added=()):
+    """Queue (title, author, acc_no) rows to apply to the index once `db` commits."""
+    if not index.loaded:
+        return
+    pending = db.info.setdefault(_PENDING, ([], []))
+    pending[0].extend(removed)
+    pending[1].extend(added)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        index.apply(*pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop(_PENDING, None)
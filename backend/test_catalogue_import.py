@@ -0,0 +1,116 @@
+# backend/test_catalogue_import.py
+# Books listed on more than one sheet of the register (Acc.Reg, a department
+# sheet and General) must merge into one row that keeps its department.
+# Uploaded rows without a title are counted as failed, not inserted.
+#
+#   python -m pytest test_catalogue_import.py   (or: python test_catalogue_import.py)
+import os
+import tempfile
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+import database
+import migrations
+import library_stats
+import models
+import catalogue_import
+
+
+def sheet(department, rows):
+    df = pd.DataFrame(rows)
+    df.columns = catalogue_import.normalise_headers(df.columns)
+    return catalogue_import.frame_to_books(df, department)
+
+
+CSE = [
+    {"Acc. No": "1542-1551", "Title of the Book": "Expert Systems", "Author": "Giarratano", "No of Copies": 10},
+    {"Acc. No": "1552", "Title of the Book": "Software Testing", "Author": "Beizer", "No of Copies": 1},
+]
+GENERAL = [
+    {"Acc. No": "1542-1551", "Title of the Book": "Expert Systems", "Author": None, "Publisher": "Thomson",
+     "No of Copies": 10},
+    {"Acc. No": "9000", "Title of the Book": "Engineering Mathematics", "Author": "Grewal", "No of Copies": 2},
+]
+
+
+def new_db():
+    path = os.path.join(tempfile.mkdtemp(), "import.db")
+    engine = database.build_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine, log=lambda *_: None)
+    return engine, sessionmaker(bind=engine)
+
+
+def load(*sheets):
+    engine, Session = new_db()
+    db = Session()
+    library_stats.ensure(db)
+    for department, rows in sheets:
+        catalogue_import.upsert_books(db, sheet(department, rows))
+        db.commit()
+    books = {b.acc_no: b for b in db.execute(select(models.Book)).scalars()}
+    stats = library_stats.read(db)
+    db.close()
+    engine.dispose()
+    return books, stats
+
+
+def test_generic_sheet_does_not_take_over_department():
+    books, stats = load(("CSE", CSE), ("General", GENERAL))
+    shared = books["1542-1551"]
+    assert shared.department == "CSE"
+    assert shared.author == "Giarratano"  # not blanked by the General row
+    assert shared.publisher == "Thomson"  # filled in from it
+    assert books["9000"].department == "General"
+    assert stats["total_books"] == 3
+
+
+def test_department_sheet_after_generic_sheet_wins():
+    books, _ = load(("Acc.Reg", GENERAL), ("CSE", CSE))
+    shared = books["1542-1551"]
+    assert shared.department == "CSE"
+    assert shared.author == "Giarratano"
+    assert shared.publisher == "Thomson"
+
+
+def test_repeated_acc_no_within_a_sheet_merges():
+    books = sheet("CSE", [
+        {"Acc. No": "77", "Title of the Book": "Compilers", "Author": "Aho", "Publisher": "Pearson"},
+        {"Acc. No": "77", "Title of the Book": "Compilers (2nd ed)", "Author": None, "Publisher": None},
+    ])
+    assert len(books) == 1
+    row = books.iloc[0]
+    assert (row["title"], row["author"], row["publisher"]) == ("Compilers (2nd ed)", "Aho", "Pearson")
+
+
+def test_upload_rejects_rows_without_title():
+    engine, Session = new_db()
+    db = Session()
+    library_stats.ensure(db)
+    db.add(models.ImportJob(id="job", filename="blank.csv", status="queued", created_at=datetime.now()))
+    db.commit()
+    csv_path = os.path.join(tempfile.mkdtemp(), "blank.csv")
+    with open(csv_path, "w") as f:
+        f.write("Acc. No,Title of the Book,Author\n101,,Aho\n102,,\n")
+
+    saved = database.SessionLocal
+    database.SessionLocal = Session  # run_import_job opens its own session
+    try:
+        catalogue_import.run_import_job("job", csv_path, "csv", department="CSE")
+    finally:
+        database.SessionLocal = saved
+
+    db.expire_all()
+    job = db.get(models.ImportJob, "job")
+    assert (job.status, job.processed_rows, job.inserted_rows, job.failed_rows) == ("done", 2, 0, 2)
+    assert db.execute(select(models.Book)).first() is None
+    assert library_stats.read(db)["total_books"] == 0
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,107 @@
+# backend/test_compression.py
+# Accept-Encoding negotiation (br > gzip > identity), and strong ETags that
+# survive compression: the encoding is appended to the tag, and a conditional
+# GET with that tag still gets a 304 carrying it.
+#
+#   python -m pytest test_compression.py   (or: python test_compression.py)
+import conftest  # throwaway DATABASE_URL, before main is imported
+import asyncio
+import gzip
+from fastapi.testclient import TestClient
+import compression
+import database
+import main
+
+client = TestClient(main.app)
+BODY = b'{"items":[' + b",".join(b'{"id":%d,"title":"Data Structures"}' % i for i in range(200)) + b"]}"
+
+
+def test_choose_encoding():
+    br = "br" if compression.brotli is not None else "gzip"
+    assert compression.choose_encoding("gzip, deflate, br") == br
+    assert compression.choose_encoding("br;q=0, gzip") == "gzip"
+    assert compression.choose_encoding("gzip;q=0") is None
+    assert compression.choose_encoding("*") == br
+    assert compression.choose_encoding("*, gzip;q=0") == ("br" if compression.brotli is not None else None)
+    assert compression.choose_encoding("") is None
+
+
+def through_middleware(accept_encoding, etag='"v1"', if_none_match=None, path="/bench"):
+    """One request through CompressionMiddleware; the app answers 304 when If-None-Match has its tag."""
+    seen = {}
+
+    async def app(scope, receive, send):
+        headers = dict(scope["headers"])
+        seen["if-none-match"] = headers.get(b"if-none-match", b"").decode()
+        if etag in seen["if-none-match"]:
+            await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", etag.encode())]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(BODY)).encode()),
+            (b"etag", etag.encode())]})
+        await send({"type": "http.response.body", "body": BODY})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    headers = [(b"accept-encoding", accept_encoding.encode())]
+    if if_none_match:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    scope = {"type": "http", "method": "GET", "path": path, "headers": headers}
+    asyncio.run(compression.CompressionMiddleware(app)(scope, receive, send))
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body, seen
+
+
+def test_gzip_keeps_a_strong_etag_per_encoding():
+    status, headers, body, _ = through_middleware("gzip")
+    assert (status, headers["content-encoding"], headers["etag"]) == (200, "gzip", '"v1-gzip"')
+    assert gzip.decompress(body) == BODY and "accept-encoding" in headers["vary"].lower()
+
+    status, headers, body, seen = through_middleware("gzip", if_none_match='"v1-gzip"')
+    assert seen["if-none-match"] == '"v1"'  # the app sees its own tag
+    assert (status, headers["etag"], body) == (304, '"v1-gzip"', b"")
+
+
+def test_brotli_and_identity():
+    if compression.brotli is not None:
+        status, headers, body, _ = through_middleware("br, gzip")
+        assert (headers["content-encoding"], headers["etag"]) == ("br", '"v1-br"')
+        assert compression.brotli.decompress(body) == BODY
+    status, headers, body, _ = through_middleware("identity")
+    assert "content-encoding" not in headers and headers["etag"] == '"v1"' and body == BODY
+    # Weak tags and excluded mounts are left alone
+    assert through_middleware("gzip", etag='W/"v1"')[1]["etag"] == 'W/"v1"'
+    status, headers, body, _ = through_middleware("gzip", path="/uploads/user_1.jpg")
+    assert "content-encoding" not in headers and headers["etag"] == '"v1"'
+
+
+def test_search_conditional_get_under_compression():
+    conftest.reset_db()
+    with database.SessionLocal() as db:
+        for i in range(30):
+            conftest.add_book(db, f"C-{i}", title=f"Compiler Design Part {i}", author="Aho Lam Sethi Ullman")
+        db.commit()
+
+    for encoding in ("gzip",) + (("br",) if compression.brotli is not None else ()):
+        first = client.get("/books/search/", params={"query": "compiler"}, headers={"Accept-Encoding": encoding})
+        assert first.status_code == 200 and first.headers["content-encoding"] == encoding
+        etag = first.headers["etag"]
+        assert etag.startswith('"search-') and etag.endswith(f'-{encoding}"')  # still strong
+        again = client.get("/books/search/", params={"query": "compiler"},
+                           headers={"Accept-Encoding": encoding, "If-None-Match": etag})
+        assert (again.status_code, again.headers["etag"]) == (304, etag)
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,72 @@
+# backend/test_dashboard.py
+# /admin/dashboard-stats runs a fixed number of SQL statements however many
+# requests and loans are listed (joined projections, counters from
+# library_stats) - no per-row lazy loads.
+#
+#   python -m pytest test_dashboard.py   (or: python test_dashboard.py)
+import conftest  # throwaway DATABASE_URL, before main is imported
+from datetime import date, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+import database
+import models
+import main
+
+client = TestClient(main.app)
+
+
+def add_activity(db, n, start):
+    """n students, each with a pending request, a return request and an open loan."""
+    today = date.today()
+    for i in range(start, start + n):
+        student = conftest.add_user(db, f"student{i}@cbit.edu.in", photo_url=f"/uploads/user_{i}_0123456789abcdef.jpg")
+        wanted, returning, issued = (conftest.add_book(db, f"{i}-{k}", copies=2) for k in range(3))
+        db.add(models.RentRequest(user_id=student.id, book_id=wanted.id, request_date=today, status="pending"))
+        for book, status in ((returning, "Return Requested"), (issued, "Issued")):
+            db.add(models.Transaction(user_id=student.id, book_id=book.id, issue_date=today,
+                                      due_date=today + timedelta(days=14), status=status))
+    db.commit()
+
+
+def dashboard_queries(headers):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine else [])
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get("/admin/dashboard-stats", headers=headers)
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    return len(statements), response.json()
+
+
+def test_query_count_does_not_grow_with_rows():
+    conftest.reset_db()
+    with database.SessionLocal() as db:
+        admin = conftest.add_user(db, "admin@cbit.edu.in", role="admin")
+        headers = conftest.auth(admin)
+        add_activity(db, 2, start=0)
+    client.get("/admin/dashboard-stats", headers=headers)  # caches the principal
+
+    small, payload = dashboard_queries(headers)
+    assert len(payload["active_loans"]) == 2
+    with database.SessionLocal() as db:
+        add_activity(db, 40, start=2)
+    large, payload = dashboard_queries(headers)
+
+    assert (len(payload["borrow_requests"]), len(payload["return_requests"]), len(payload["active_loans"])) == (42, 42, 42)
+    assert payload["total_books"] == 126 and payload["books_lent"] == 0  # counters come from library_stats
+    assert large == small <= 4
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,55 @@
+# backend/test_database.py
+# The async engine is opt-in (ASYNC_DB): without it, or without its driver,
+# the async endpoints get ThreadedSessions on the sync engine.
+#
+#   python -m pytest test_database.py   (or: python test_database.py)
+import conftest  # throwaway DATABASE_URL
+import asyncio
+import sys
+from sqlalchemy import select
+import database
+import models
+
+
+def test_async_engine_is_opt_in():
+    if database.ASYNC_DB:
+        assert database.async_engine is not None
+    else:
+        assert database.async_engine is None and database.AsyncSessionLocal is database.ThreadedSession
+
+
+def test_missing_async_driver_falls_back_to_sync_engine():
+    saved = database.ASYNC_DB, sys.modules.get("greenlet")
+    database.ASYNC_DB = True
+    sys.modules["greenlet"] = None  # import greenlet -> ImportError
+    try:
+        assert database._build_async_engine_or_none() is None
+    finally:
+        database.ASYNC_DB = saved[0]
+        if saved[1] is None:
+            del sys.modules["greenlet"]
+        else:
+            sys.modules["greenlet"] = saved[1]
+
+
+def test_threaded_session_round_trip():
+    conftest.reset_db()
+
+    async def scenario():
+        async with database.ThreadedSession() as db:
+            db.add(models.Book(acc_no="T-1", title="Operating Systems", total_copies=1, available_copies=1))
+            await db.flush()
+            await db.commit()
+            book = await db.get(models.Book, (await db.execute(select(models.Book.id))).scalar_one())
+            titles = (await db.execute(select(models.Book.title))).scalars().all()
+            count = await db.run_sync(lambda session: session.query(models.Book).count())
+        return book.title, titles, count  # readable after close: expire_on_commit=False
+
+    assert asyncio.run(scenario()) == ("Operating Systems", ["Operating Systems"], 1)
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
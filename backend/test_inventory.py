@@ -0,0 +1,75 @@
+# backend/test_inventory.py
+# Desk issues and request approvals racing for the same few copies never
+# oversell: stock stays >= 0, loans + stock = copies, nobody goes over their
+# token limit and library_stats still matches. A small, fixed-size version
+# of bench_inventory.py.
+#
+#   python -m pytest test_inventory.py   (or: python test_inventory.py)
+import conftest  # throwaway DATABASE_URL, before main is imported
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from types import SimpleNamespace
+from fastapi import HTTPException
+from sqlalchemy import func, select
+import database
+import library_stats
+import main
+import models
+
+ADMIN = SimpleNamespace(id=0, role="admin")
+COPIES, STUDENTS, TOKENS, ATTEMPTS = 5, 8, 2, 24
+
+
+def attempt(fn):
+    with database.SessionLocal() as db:
+        try:
+            fn(db)
+            return "ok"
+        except HTTPException as e:
+            return e.status_code
+        except Exception as e:  # "database is locked" under contention is a refusal, not a bug
+            return type(e).__name__
+
+
+def test_concurrent_issue_and_approve_never_oversell():
+    conftest.reset_db()
+    with database.SessionLocal() as db:
+        book = conftest.add_book(db, "RACE-1", copies=COPIES)
+        students = [conftest.add_user(db, f"race{i}@cbit.edu.in", max_tokens=TOKENS) for i in range(STUDENTS)]
+        requests = [models.RentRequest(user_id=students[i % STUDENTS].id, book_id=book.id,
+                                       request_date=date.today(), status="pending") for i in range(ATTEMPTS)]
+        db.add_all(requests)
+        db.commit()
+        book_id, emails = book.id, [s.email for s in students]
+        user_ids, request_ids = [s.id for s in students], [r.id for r in requests]
+
+    calls = [
+        lambda db, e=emails[i % STUDENTS]: main.issue_book(
+            main.IssueRequest(student_email=e, book_acc_no="RACE-1"), db=db, current_user=ADMIN)
+        for i in range(ATTEMPTS)
+    ] + [lambda db, r=r: main.approve_request(r, current_user=ADMIN, db=db) for r in request_ids]
+    calls = [call for pair in zip(calls[:ATTEMPTS], calls[ATTEMPTS:]) for call in pair]  # interleave the paths
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        outcomes = Counter(pool.map(attempt, calls))
+
+    with database.SessionLocal() as db:
+        stock = db.get(models.Book, book_id).available_copies
+        loans = db.execute(select(func.count(models.Transaction.id)).where(
+            models.Transaction.book_id == book_id, models.Transaction.return_date == None)).scalar()
+        per_student = db.execute(
+            select(func.count(models.Transaction.id)).where(models.Transaction.user_id.in_(user_ids))
+            .group_by(models.Transaction.user_id)).scalars().all()
+        stored, actual = library_stats.reconcile(db)
+
+    assert outcomes["ok"] == loans == COPIES, outcomes  # every copy went out, and no more
+    assert stock == 0
+    assert max(per_student) <= TOKENS
+    assert stored == actual
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,53 @@
+# backend/test_metrics.py
+# The pool checkout wait is still recorded after engine.dispose() swaps the
+# pool, leaves out the time spent opening a new DBAPI connection, and counts
+# checkouts that time out.
+#
+#   python -m pytest test_metrics.py   (or: python test_metrics.py)
+import conftest  # throwaway DATABASE_URL
+import time
+import pytest
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.pool import QueuePool
+import metrics
+
+
+def test_checkout_wait_survives_dispose():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine, "test-dispose")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    engine.dispose()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert metrics.pool_wait_seconds.value(engine="test-dispose")[0] == 2
+
+
+def test_checkout_wait_excludes_connect_time():
+    engine = create_engine("sqlite://")
+    event.listen(engine, "connect", lambda dbapi_connection, record: time.sleep(0.2))  # a slow server
+    metrics.instrument_engine(engine, "test-connect")
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert time.perf_counter() - start >= 0.2
+    count, waited = metrics.pool_wait_seconds.value(engine="test-connect")
+    assert count == 1 and waited < 0.1
+
+
+def test_checkout_timeout_is_counted():
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=1, max_overflow=0, pool_timeout=0.2)
+    metrics.instrument_engine(engine, "test-timeout")
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+    assert metrics.pool_timeouts.value(engine="test-timeout") == 1
+    count, waited = metrics.pool_wait_seconds.value(engine="test-timeout")
+    assert count == 2 and waited >= 0.2
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,98 @@
+# backend/test_migrations.py
+# Migration 2: duplicate accession numbers are merged before acc_no becomes
+# unique, and the hot queries use the indexes it adds (EXPLAIN QUERY PLAN on
+# the SQL SQLAlchemy actually sends, bound parameters included).
+#
+#   python -m pytest test_migrations.py   (or: python test_migrations.py)
+import os
+import tempfile
+from sqlalchemy import event, select, text
+import database
+import migrations
+import models
+
+T, R, B = models.Transaction, models.RentRequest, models.Book
+
+
+def new_engine():
+    engine = database.build_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'migrations.db')}")
+    migrations.upgrade(engine, log=lambda *_: None)
+    return engine
+
+
+def plan(engine, stmt):
+    """EXPLAIN QUERY PLAN details for `stmt`, as compiled and bound for this engine."""
+    sent = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        sent.append((statement, parameters))
+
+    with engine.connect() as conn:
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            conn.execute(stmt).all()
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        statement, parameters = sent[-1]
+        return " | ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+
+
+def test_open_loan_lookups_use_partial_index():
+    engine = new_engine()
+    # /users/me and the loan limit check; /admin/users counts for a page of users
+    for stmt in (select(T.id).where(T.user_id == 1, T.return_date == None),
+                 select(T.user_id).where(T.user_id.in_([1, 2, 3]), T.return_date == None)):
+        assert "USING INDEX ix_transactions_user_open" in plan(engine, stmt)
+    engine.dispose()
+
+
+def test_pending_request_lookups_use_indexes():
+    engine = new_engine()
+    # request_book's duplicate check, then the dashboard's pending queue
+    duplicate = select(R.id).where(R.user_id == 1, R.book_id == 2, R.status == "pending")
+    assert "ix_rent_requests_user_book_status (user_id=? AND book_id=? AND status=?)" in plan(engine, duplicate)
+    assert "USING INDEX ix_rent_requests_pending" in plan(engine, select(R.id).where(R.status == "pending"))
+    engine.dispose()
+
+
+def test_acc_no_lookup_uses_unique_index():
+    engine = new_engine()
+    assert "ix_books_acc_no (acc_no=?)" in plan(engine, select(B.id).where(B.acc_no == "1542-1551"))
+    engine.dispose()
+
+
+def test_duplicate_acc_nos_are_merged():
+    engine = new_engine()
+    with engine.begin() as conn:
+        # A database from before migration 2: acc_no not yet unique
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = 2"))
+        conn.execute(text("DROP INDEX ix_books_acc_no"))
+        conn.execute(text("INSERT INTO library_stats (id, total_books, books_lent, available_copies) VALUES (1, 4, 1, 5)"))
+        conn.execute(text(
+            "INSERT INTO books (id, acc_no, title, author, department, publisher, total_copies, available_copies) VALUES "
+            "(1, '77', 'Compilers', 'Aho', 'Acc.Reg', 'Pearson', 2, 2), "
+            "(2, '77', 'Compilers', NULL, 'CSE', NULL, 2, 1), "
+            "(3, 'General-5', 'Maths', 'Grewal', 'General', NULL, 1, 1), "
+            "(4, 'General-5', 'Physics', 'Resnick', 'General', NULL, 1, 1)"
+        ))
+        conn.execute(text("INSERT INTO transactions (id, user_id, book_id, status) VALUES (1, 1, 2, 'Issued')"))
+        conn.execute(text("INSERT INTO rent_requests (id, user_id, book_id, status) VALUES (1, 2, 2, 'pending')"))
+
+    assert migrations.upgrade(engine, log=lambda *_: None) == [2]
+    with engine.connect() as conn:
+        books = {row.acc_no: row for row in conn.execute(text("SELECT * FROM books ORDER BY id"))}
+        assert set(books) == {"77", "General-5", "General-5-2"}  # generated keys are renumbered, not merged
+        merged = books["77"]
+        assert (merged.id, merged.department, merged.author, merged.publisher) == (1, "CSE", "Aho", "Pearson")
+        assert (merged.total_copies, merged.available_copies) == (2, 1)  # one copy is out on loan
+        assert conn.execute(text("SELECT book_id FROM transactions")).scalar() == 1
+        assert conn.execute(text("SELECT book_id FROM rent_requests")).scalar() == 1
+        assert tuple(conn.execute(text("SELECT total_books, available_copies FROM library_stats")).one()) == (3, 3)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,75 @@
+# backend/test_search.py
+# setup_search_index() must pick the fuzzy backend as well as the search
+# backend. The Postgres branch is run against a stub engine (no server
+# needed): it records the DDL and reports dialect "postgresql".
+#
+#   python -m pytest test_search.py   (or: python test_search.py)
+from contextlib import contextmanager
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+import search
+
+
+class StubPostgres:
+    dialect = SimpleNamespace(name="postgresql")
+
+    def __init__(self):
+        self.statements = []
+
+    @contextmanager
+    def begin(self):
+        yield SimpleNamespace(execute=lambda stmt, *args: self.statements.append(str(stmt)))
+
+
+class StubSession:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, stmt):
+        self.statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        return SimpleNamespace(all=lambda: [])
+
+
+def with_backends(fn):
+    def wrapper():
+        saved = search.SEARCH_BACKEND, search.FUZZY_BACKEND
+        try:
+            fn()
+        finally:
+            search.SEARCH_BACKEND, search.FUZZY_BACKEND = saved
+    wrapper.__name__ = fn.__name__
+    return wrapper
+
+
+@with_backends
+def test_postgres_enables_fuzzy_backend():
+    search.SEARCH_BACKEND, search.FUZZY_BACKEND = None, None
+    engine = StubPostgres()
+    assert search.setup_search_index(engine) == "postgres"
+    assert search.FUZZY_BACKEND == "postgres"
+    assert any("pg_trgm" in ddl for ddl in engine.statements)
+
+
+@with_backends
+def test_postgres_fuzzy_page_uses_trigram_operator():
+    search.setup_search_index(StubPostgres())
+    db = StubSession()
+    page = search.fuzzy_page(db, "tanenbam")
+    assert page["items"] == [] and page["next_cursor"] is None
+    assert len(db.statements) == 1 and "<%" in db.statements[0]
+
+
+@with_backends
+def test_unknown_dialect_disables_fuzzy_backend():
+    search.FUZZY_BACKEND = "fts5"
+    engine = StubPostgres()
+    engine.dialect = SimpleNamespace(name="mysql")
+    assert search.setup_search_index(engine) == "like"
+    assert search.FUZZY_BACKEND is None
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
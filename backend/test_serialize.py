@@ -0,0 +1,79 @@
+# backend/test_serialize.py
+# ?format=columnar carries exactly the rows of the default format, one array
+# per field, for search pages (cached or not, every cursor page) and the
+# dashboard lists; and the orjson and stdlib encoders agree on the payloads.
+#
+#   python -m pytest test_serialize.py   (or: python test_serialize.py)
+import conftest  # throwaway DATABASE_URL, before main is imported
+import json
+from datetime import date, timedelta
+from fastapi.testclient import TestClient
+import database
+import fastjson
+import main
+import models
+
+client = TestClient(main.app)
+
+
+def to_rows(columns):
+    fields = list(columns)
+    return [dict(zip(fields, values)) for values in zip(*columns.values())]
+
+
+def test_columnar_search_round_trip():
+    conftest.reset_db()
+    with database.SessionLocal() as db:
+        for i in range(7):
+            conftest.add_book(db, f"DS-{i}", copies=i + 1, title=f"Data Structures Volume {i}",
+                              author=None if i == 3 else "Tenenbaum", edition_year="2019")
+        db.commit()
+
+    params = {"query": "data structures", "limit": 3}
+    seen = 0
+    while True:
+        rows = client.get("/books/search/", params=params).json()
+        columnar = client.get("/books/search/", params={**params, "format": "columnar"}).json()
+        assert list(columnar["items"]) == list(main.BookOut.model_fields)
+        assert to_rows(columnar["items"]) == rows["items"]
+        assert {k: v for k, v in columnar.items() if k != "items"} == {k: v for k, v in rows.items() if k != "items"}
+        seen += len(rows["items"])
+        if not rows["next_cursor"]:
+            break
+        params["cursor"] = rows["next_cursor"]
+    assert seen == 7
+
+
+def test_columnar_dashboard_round_trip():
+    conftest.reset_db()
+    today = date.today()
+    with database.SessionLocal() as db:
+        admin = conftest.add_user(db, "admin@cbit.edu.in", role="admin")
+        headers = conftest.auth(admin)
+        for i in range(3):
+            student = conftest.add_user(db, f"s{i}@cbit.edu.in")
+            book = conftest.add_book(db, f"L-{i}")
+            db.add(models.Transaction(user_id=student.id, book_id=book.id, issue_date=today,
+                                      due_date=today + timedelta(days=i), status="Issued"))
+        db.commit()
+
+    rows = client.get("/admin/dashboard-stats", headers=headers).json()
+    columnar = client.get("/admin/dashboard-stats", params={"format": "columnar"}, headers=headers).json()
+    for name, model in (("borrow_requests", main.BorrowRequestOut), ("return_requests", main.ReturnRequestOut),
+                        ("active_loans", main.ActiveLoanOut)):
+        assert list(columnar[name]) == list(model.model_fields)
+        assert to_rows(columnar[name]) == rows[name]
+    assert len(rows["active_loans"]) == 3 and rows["active_loans"][0]["due_date"] == today.isoformat()
+
+
+def test_encoders_agree():
+    payload = {"items": [{"id": 1, "title": "Café ☕", "due_date": date(2026, 1, 31), "fine": 2.5, "author": None}]}
+    assert json.loads(fastjson.dumps(payload)) == json.loads(
+        json.dumps(payload, default=str, separators=(",", ":"), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
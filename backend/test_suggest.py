@@ -0,0 +1,95 @@
+# backend/test_suggest.py
+# Type-ahead ranking: completions carried by the most books come first (ties
+# in key order), across fields, and stay right after incremental updates -
+# including for short prefixes whose ranking is cached. The periodic rebuild
+# only fires on catalogue text changes, not on every issue/return.
+#
+#   python -m pytest test_suggest.py   (or: python test_suggest.py)
+import conftest  # throwaway DATABASE_URL
+import random
+import database
+import inventory
+import library_stats
+import suggest
+
+
+def brute_force(counts, prefix, k):
+    matches = [(suggest.normalise(text), text, n) for text, n in counts.items()
+               if n > 0 and suggest.normalise(text).startswith(prefix)]
+    matches.sort(key=lambda m: (-m[2], m[0]))
+    return [(text, n) for _, text, n in matches[:k]]
+
+
+def test_complete_ranks_by_book_count():
+    idx = suggest.PrefixIndex({"Data Structures": 5, "Database Systems": 9, "Data Mining": 1,
+                               "Digital Logic": 7, "Data Communications": 5})
+    assert idx.complete("data", 4) == [("Database Systems", 9), ("Data Communications", 5),
+                                       ("Data Structures", 5), ("Data Mining", 1)]
+    assert idx.complete("dig", 4) == [("Digital Logic", 7)]
+    assert idx.complete("x", 4) == []
+
+
+def test_ranking_matches_brute_force_after_updates():
+    rng = random.Random(7)
+    words = ["data", "database", "digital", "design", "discrete", "dynamics"]
+    counts = {}
+    while len(counts) < suggest.RANK_CACHE_RANGE * 2:  # "d" is a cached prefix
+        counts[f"{rng.choice(words)} {rng.randrange(10**6)}"] = rng.randint(1, 40)
+    idx = suggest.PrefixIndex(counts)
+    prefixes = ["d", "da", "data", "dis", "dyn"]
+    for prefix in prefixes:
+        assert idx.complete(prefix, 8) == brute_force(counts, prefix, 8)
+
+    for _ in range(3):
+        removed = rng.sample(sorted(counts), 50)
+        added = [f"{rng.choice(words)} {rng.randrange(10**6)}" for _ in range(30)] + ["discrete maths"] * 100
+        for text in removed:
+            counts[text] -= 1
+        for text in added:
+            counts[text] = counts.get(text, 0) + 1
+        idx.update(removed=removed, added=added)
+        for prefix in prefixes:
+            assert idx.complete(prefix, 8) == brute_force(counts, prefix, 8)
+    assert idx.complete("d", 1) == [("discrete maths", 300)]
+
+
+def test_suggestions_across_fields_rank_by_books():
+    index = suggest.SuggestIndex()
+    index.load([("Thermodynamics", "Nag", "T-1")] * 2 + [("Theory of Machines", "Rattan", "T-2")]
+               + [("Signals", "Thereja", "S-1")] * 4)
+    assert index.complete("the", 3) == [
+        {"text": "Thereja", "field": "author", "books": 4},
+        {"text": "Thermodynamics", "field": "title", "books": 2},
+        {"text": "Theory of Machines", "field": "title", "books": 1},
+    ]
+
+
+def test_rebuild_ignores_stock_changes():
+    conftest.reset_db()
+    with database.SessionLocal() as db:
+        book = conftest.add_book(db, "R-1", copies=2, title="Compiler Design")
+        db.commit()
+        assert suggest.rebuild(db, force=True)
+        version = library_stats.catalogue_version(db)
+
+        inventory.take_copy(db, book.id)  # what issue/approve do
+        db.commit()
+        inventory.return_copy(db, book.id)
+        db.commit()
+        assert library_stats.catalogue_version(db) > version  # the search cache must see stock changes...
+        assert not suggest.rebuild(db)  # ...the suggest index needn't
+
+        book.title = "Compiler Design (2nd ed)"
+        db.commit()
+        assert suggest.rebuild(db)
+        assert suggest.index.complete("compiler") == [{"text": "Compiler Design (2nd ed)", "field": "title", "books": 1}]
+        conftest.add_book(db, "R-2", title="Compilers")
+        db.commit()
+        assert suggest.rebuild(db)
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
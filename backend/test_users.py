@@ -0,0 +1,40 @@
+# backend/test_users.py
+# PUT /users/me answers with the same profile fields as GET /users/me:
+# photo_url made public (photos.public_url), no password hash.
+#
+#   python -m pytest test_users.py   (or: python test_users.py)
+import conftest  # throwaway DATABASE_URL, before main is imported
+from fastapi.testclient import TestClient
+import database
+import main
+import photos
+
+client = TestClient(main.app)
+
+
+def test_update_me_returns_public_profile():
+    conftest.reset_db()
+    with database.SessionLocal() as db:
+        student = conftest.add_user(db, "profile@cbit.edu.in", photo_url="/uploads/user_1_0123456789abcdef.jpg")
+        db.commit()
+        headers = conftest.auth(student)
+
+    before = client.get("/users/me", headers=headers)
+    response = client.put("/users/me", headers=headers, json={"branch": "ECE", "year": "4"})
+    assert response.status_code == 200
+    body = response.json()
+    assert "hashed_password" not in body
+    assert body["photo_url"] == f"{photos.PUBLIC_BASE_URL}/uploads/user_1_0123456789abcdef.jpg"
+    assert (body["branch"], body["year"]) == ("ECE", "4")
+
+    after = client.get("/users/me", headers=headers)
+    assert after.headers["etag"] != before.headers["etag"]
+    profile = {k: v for k, v in after.json().items() if k not in ("active_loans", "pending_requests")}
+    assert profile == body
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -5,9 +5,14 @@ import './index.css';
 
 function AdminBooks() {
   const [books, setBooks] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  // The query nextCursor belongs to; the box may have been edited since
+  const [cursorQuery, setCursorQuery] = useState('');
+  const [totalEstimate, setTotalEstimate] = useState(null);
   const [query, setQuery] = useState('');
   const [loading, setLoading] = useState(false);
   const [showAddForm, setShowAddForm] = useState(false);
+  const [importJob, setImportJob] = useState(null);
   
   // New Book Form State
   const [newBook, setNewBook] = useState({
@@ -19,17 +24,50 @@ function AdminBooks() {
   const fetchBooks = async (searchQuery = '') => {
     setLoading(true);
     try {
-      // Use the existing search API
-      const res = await axios.get(`http://127.0.0.1:8000/books/search/?query=${searchQuery}`);
-      setBooks(res.data);
+      // Use the existing search API (first page only)
+      const res = await axios.get('http://127.0.0.1:8000/books/search/', { params: { query: searchQuery } });
+      setBooks(res.data.items);
+      setNextCursor(res.data.next_cursor);
+      setCursorQuery(searchQuery);
+      setTotalEstimate(res.data.total_estimate);
     } catch (err) { console.error(err); } 
     finally { setLoading(false); }
   };
 
+  const loadMore = async () => {
+    try {
+      const res = await axios.get('http://127.0.0.1:8000/books/search/', { params: { query: cursorQuery, cursor: nextCursor } });
+      setBooks(prev => [...prev, ...res.data.items]);
+      setNextCursor(res.data.next_cursor);
+    } catch (err) { console.error(err); }
+  };
+
   useEffect(() => {
     fetchBooks(); // Load all books initially (or empty query)
   }, []);
 
+  // Type-ahead: ask /books/suggest once typing pauses (served from memory, no search)
+  const [suggestions, setSuggestions] = useState([]);
+  useEffect(() => {
+    if (query.trim().length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await axios.get('http://127.0.0.1:8000/books/suggest', { params: { q: query } });
+        if (!cancelled) setSuggestions(res.data.suggestions);
+      } catch (err) {
+        if (!cancelled) setSuggestions([]);
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
+
   const handleDelete = async (acc_no) => {
     if (!window.confirm(`⚠️ WARNING: Are you sure you want to delete book with Acc No: ${acc_no}? This cannot be undone.`)) return;
 
@@ -58,16 +96,61 @@ function AdminBooks() {
     }
   };
 
+  // Bulk CSV/XLSX upload: the server imports in the background, we poll the job
+  const handleImport = async (e) => {
+    const file = e.target.files[0];
+    if (!file) return;
+    const fd = new FormData();
+    fd.append('file', file);
+    try {
+      const res = await axios.post('http://127.0.0.1:8000/admin/books/import', fd, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      pollImport(res.data.job_id);
+    } catch (err) {
+      alert("Error: " + (err.response?.data?.detail || "Upload Failed"));
+    }
+    e.target.value = '';
+  };
+
+  const pollImport = async (jobId) => {
+    try {
+      const res = await axios.get(`http://127.0.0.1:8000/admin/books/import/${jobId}`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      setImportJob(res.data);
+      if (res.data.status === 'queued' || res.data.status === 'running') {
+        setTimeout(() => pollImport(jobId), 2000);
+      } else {
+        fetchBooks(query);
+      }
+    } catch (err) { console.error(err); }
+  };
+
   return (
     <div className="container">
       <div className="glass-card">
         <div style={{display:'flex', justifyContent:'space-between', alignItems:'center', marginBottom:'20px'}}>
             <h2 style={{ color: '#003366', margin:0 }}>📖 Library Inventory Manager</h2>
-            <button className="btn-gold" onClick={() => setShowAddForm(!showAddForm)}>
-                {showAddForm ? 'Close Form' : '+ Add New Book'}
-            </button>
+            <div style={{display:'flex', gap:'10px', alignItems:'center'}}>
+                <label className="btn-gold" style={{cursor:'pointer'}}>
+                    ⬆ Import CSV/XLSX
+                    <input type="file" accept=".csv,.xlsx" onChange={handleImport} style={{display:'none'}} />
+                </label>
+                <button className="btn-gold" onClick={() => setShowAddForm(!showAddForm)}>
+                    {showAddForm ? 'Close Form' : '+ Add New Book'}
+                </button>
+            </div>
         </div>
 
+        {importJob && (
+            <p style={{fontSize:'0.9rem', color: importJob.status === 'failed' ? '#dc3545' : '#666'}}>
+                Import of {importJob.filename}: <b>{importJob.status}</b> — {importJob.processed_rows} rows processed,
+                {' '}{importJob.inserted_rows} new, {importJob.updated_rows} updated, {importJob.failed_rows} failed
+                {importJob.error && <> ({importJob.error})</>}
+            </p>
+        )}
+
         {/* --- ADD BOOK FORM --- */}
         {showAddForm && (
             <div style={{background:'#f8f9fa', padding:'20px', borderRadius:'10px', marginBottom:'30px', border:'1px solid #ddd'}}>
@@ -108,9 +191,13 @@ function AdminBooks() {
             className="modern-input"
             placeholder="Search inventory by Title, Author, or ID..." 
             value={query}
+            list="inventory-suggestions"
             onChange={(e) => setQuery(e.target.value)}
             onKeyDown={(e) => e.key === 'Enter' && fetchBooks(query)}
           />
+          <datalist id="inventory-suggestions">
+            {suggestions.map(s => <option key={`${s.field}:${s.text}`} value={s.text}>{s.field}</option>)}
+          </datalist>
           <button className="btn-gold" onClick={() => fetchBooks(query)}>Search</button>
         </div>
 
@@ -151,6 +238,12 @@ function AdminBooks() {
             </tbody>
             </table>
         )}
+        {!loading && totalEstimate !== null && (
+          <p style={{fontSize:'0.85rem', color:'#666'}}>Showing {books.length} of {totalEstimate}{nextCursor && totalEstimate >= 1000 ? '+' : ''} books</p>
+        )}
+        {nextCursor && !loading && (
+          <button className="btn-gold" onClick={loadMore}>Load More</button>
+        )}
       </div>
     </div>
   );
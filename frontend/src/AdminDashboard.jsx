@@ -4,6 +4,30 @@ import axios from 'axios';
 import AdminIssue from './AdminIssue'; 
 import './index.css';
 
+// --- LIVE UPDATES (/admin/events) ---
+const DASHBOARD_EVENTS = ['request.created', 'request.approved', 'request.rejected',
+                          'return.requested', 'return.approved', 'loan.issued', 'stats'];
+const LIST_KEYS = { borrow_requests: 'request_id', return_requests: 'request_id', active_loans: 'transaction_id' };
+
+// Apply one {add, remove, stats} delta from the server to the dashboard state
+const applyDelta = (prev, delta) => {
+  const next = { ...prev, ...(delta.stats || {}) };
+  Object.entries(LIST_KEYS).forEach(([list, key]) => {
+    const removed = new Set(delta.remove?.[list] || []);
+    const added = delta.add?.[list] || [];
+    if (!removed.size && !added.length) return;
+    const addedIds = new Set(added.map(row => row[key]));
+    next[list] = [...prev[list].filter(row => !removed.has(row[key]) && !addedIds.has(row[key])), ...added];
+  });
+  return next;
+};
+
+// Thumbnail URLs aren't checked server-side: until the thumbnail is made it 404s, so show the full photo
+const photoFallback = (photo) => (e) => {
+  const img = e.currentTarget;
+  if (photo && img.src !== photo) img.src = photo;
+};
+
 function AdminDashboard() {
   const [stats, setStats] = useState({ 
     borrow_requests: [], 
@@ -14,15 +38,37 @@ function AdminDashboard() {
     available_copies: 0 
   });
   const [users, setUsers] = useState([]);
+  const [usersNextOffset, setUsersNextOffset] = useState(null);
   const [activeTab, setActiveTab] = useState('overview'); 
   
   const issuedSectionRef = useRef(null);
+  const liveRef = useRef(false); // true while the event stream is connected
 
   useEffect(() => {
-    fetchStats();
     fetchUsers();
+
+    // The snapshot is fetched on every (re)connect ("hello") and on "resync";
+    // everything in between arrives as deltas.
+    const token = encodeURIComponent(localStorage.getItem('token'));
+    const source = new EventSource(`http://127.0.0.1:8000/admin/events?token=${token}`);
+    const onDelta = (e) => setStats(prev => applyDelta(prev, JSON.parse(e.data)));
+    source.addEventListener('hello', () => { liveRef.current = true; fetchStats(); });
+    source.addEventListener('resync', fetchStats);
+    DASHBOARD_EVENTS.forEach(type => source.addEventListener(type, onDelta));
+    source.onerror = () => {
+      liveRef.current = false;
+      // CLOSED = the stream was refused (not just dropped); load the snapshot the plain way
+      if (source.readyState === EventSource.CLOSED) fetchStats();
+    };
+
+    return () => source.close();
   }, []);
 
+  // Without the event stream, fall back to refetching after each action
+  const refreshStats = () => {
+    if (!liveRef.current) fetchStats();
+  };
+
   const fetchStats = async () => {
     try {
       const res = await axios.get('http://127.0.0.1:8000/admin/dashboard-stats', {
@@ -32,12 +78,14 @@ function AdminDashboard() {
     } catch (err) { console.error(err); }
   };
 
-  const fetchUsers = async () => {
+  const fetchUsers = async (offset = 0) => {
     try {
         const res = await axios.get('http://127.0.0.1:8000/admin/users', {
+            params: { offset },
             headers: { Authorization: `Bearer ${localStorage.getItem('token')}` }
         });
-        setUsers(res.data);
+        setUsers(prev => offset === 0 ? res.data.items : [...prev, ...res.data.items]);
+        setUsersNextOffset(res.data.next_offset);
     } catch (err) { console.error(err); }
   };
 
@@ -52,7 +100,7 @@ function AdminDashboard() {
             headers: { Authorization: `Bearer ${localStorage.getItem('token')}` } 
         });
         alert(`Request ${type}ed!`);
-        fetchStats();
+        refreshStats();
     } catch (err) { alert("Failed to process request"); }
   };
 
@@ -62,10 +110,28 @@ function AdminDashboard() {
         headers: { Authorization: `Bearer ${localStorage.getItem('token')}` }
       });
       alert(`Return Approved. Fine Collected: ₹${res.data.fine}`);
-      fetchStats();
+      refreshStats();
     } catch (err) { alert("Error approving return"); }
   };
 
+  // --- BULK QUEUE HANDLER (one request for the whole list) ---
+  const handleBulk = async (path, ids, label) => {
+    if (!window.confirm(`${label} ${ids.length} item(s)?`)) return;
+    try {
+      const res = await axios.post(`http://127.0.0.1:8000/admin/${path}`, { ids }, {
+        headers: { Authorization: `Bearer ${localStorage.getItem('token')}` }
+      });
+      const skipped = res.data.results.filter(r => !r.ok);
+      const fines = res.data.results.reduce((sum, r) => sum + (r.fine || 0), 0);
+      alert(`${label}: ${res.data.succeeded} done` +
+            (fines ? `, fines ₹${fines}` : '') +
+            (skipped.length ? `, ${skipped.length} skipped (e.g. ${skipped[0].detail})` : ''));
+      refreshStats();
+    } catch (err) {
+      alert(`${label} failed: ` + (err.response?.data?.detail || "Unknown Error"));
+    }
+  };
+
   // --- NEW DELETE USER HANDLER ---
   const handleDeleteUser = async (userId) => {
     if(!window.confirm("Are you sure you want to permanently delete this user?")) return;
@@ -126,7 +192,12 @@ function AdminDashboard() {
             {/* 3. RETURN REQUESTS */}
             {stats.return_requests.length > 0 && (
                 <div className="glass-card" style={{marginBottom:'30px', borderLeft: '5px solid #ffc107', background:'#fffbf2'}}>
-                    <h3 style={{color: '#856404'}}>⚠️ Return Requests</h3>
+                    <div style={{display:'flex', justifyContent:'space-between', alignItems:'center'}}>
+                        <h3 style={{color: '#856404'}}>⚠️ Return Requests</h3>
+                        <button className="btn-gold" onClick={() => handleBulk('bulk-approve-return', stats.return_requests.map(r => r.request_id), 'Approve returns')}>
+                            Approve All ({stats.return_requests.length})
+                        </button>
+                    </div>
                     <table>
                         <thead>
                             <tr style={{background: '#ffc107', color: '#000'}}>
@@ -141,7 +212,7 @@ function AdminDashboard() {
                                 <tr key={req.request_id}>
                                     <td>
                                         <div style={{display:'flex', alignItems:'center', gap:'10px'}}>
-                                            <img src={req.student_photo || "https://via.placeholder.com/40"} style={{width:'40px', height:'40px', borderRadius:'50%'}} />
+                                            <img src={req.student_thumb || req.student_photo || "https://via.placeholder.com/40"} onError={photoFallback(req.student_photo)} style={{width:'40px', height:'40px', borderRadius:'50%'}} />
                                             <div><strong>{req.student_name}</strong><br/><span style={{fontSize:'0.8rem'}}>{req.student_reg}</span></div>
                                         </div>
                                     </td>
@@ -162,7 +233,17 @@ function AdminDashboard() {
             {/* 4. INCOMING BORROW REQUESTS */}
             {stats.borrow_requests.length > 0 && (
                 <div className="glass-card" style={{marginBottom:'30px', borderLeft: '5px solid #28a745'}}>
-                    <h3 style={{color: '#155724'}}>📥 Incoming Borrow Requests</h3>
+                    <div style={{display:'flex', justifyContent:'space-between', alignItems:'center'}}>
+                        <h3 style={{color: '#155724'}}>📥 Incoming Borrow Requests</h3>
+                        <div>
+                            <button className="btn-gold" style={{marginRight:'10px'}} onClick={() => handleBulk('requests/bulk-approve', stats.borrow_requests.map(r => r.request_id), 'Approve requests')}>
+                                Approve All ({stats.borrow_requests.length})
+                            </button>
+                            <button className="btn-danger" onClick={() => handleBulk('requests/bulk-reject', stats.borrow_requests.map(r => r.request_id), 'Reject requests')}>
+                                Reject All
+                            </button>
+                        </div>
+                    </div>
                     <table>
                         <thead>
                             <tr style={{background: '#28a745', color: 'white'}}>
@@ -177,7 +258,7 @@ function AdminDashboard() {
                                 <tr key={req.request_id}>
                                     <td>
                                         <div style={{display:'flex', alignItems:'center', gap:'10px'}}>
-                                            <img src={req.student_photo || "https://via.placeholder.com/40"} style={{width:'40px', height:'40px', borderRadius:'50%'}} />
+                                            <img src={req.student_thumb || req.student_photo || "https://via.placeholder.com/40"} onError={photoFallback(req.student_photo)} style={{width:'40px', height:'40px', borderRadius:'50%'}} />
                                             <div><strong>{req.student_name}</strong><br/><span style={{fontSize:'0.8rem'}}>{req.student_reg}</span></div>
                                         </div>
                                     </td>
@@ -216,7 +297,7 @@ function AdminDashboard() {
                         <tr key={loan.transaction_id} style={{background:'white', boxShadow:'0 2px 5px rgba(0,0,0,0.05)'}}>
                           <td style={{padding:'15px', borderRadius:'10px 0 0 10px'}}>
                             <div style={{display:'flex', alignItems:'center', gap:'15px'}}>
-                                <img src={loan.student_photo || "https://via.placeholder.com/50"} style={{width:'55px', height:'55px', borderRadius:'50%', objectFit:'cover', border:'2px solid var(--accent)'}} />
+                                <img src={loan.student_thumb || loan.student_photo || "https://via.placeholder.com/50"} onError={photoFallback(loan.student_photo)} style={{width:'55px', height:'55px', borderRadius:'50%', objectFit:'cover', border:'2px solid var(--accent)'}} />
                                 <div>
                                     <div style={{fontWeight:'bold', fontSize:'1.05rem', color:'var(--primary)'}}>{loan.student_name}</div>
                                     <div style={{fontSize:'0.85rem', color:'#555', marginTop:'2px'}}>
@@ -261,7 +342,7 @@ function AdminDashboard() {
                 <tbody>
                     {users.map(u => (
                         <tr key={u.id}>
-                            <td><img src={u.photo_url || "https://via.placeholder.com/40"} style={{width:'40px', height:'40px', borderRadius:'50%'}} /></td>
+                            <td><img src={u.photo_thumb_url || u.photo_url || "https://via.placeholder.com/40"} onError={photoFallback(u.photo_url)} style={{width:'40px', height:'40px', borderRadius:'50%'}} /></td>
                             <td><strong>{u.full_name}</strong><br/><span style={{fontSize:'0.8rem', color:'#666'}}>{u.registration_number || 'N/A'}</span></td>
                             <td>{u.email}</td>
                             <td><span className="badge">{u.role}</span></td>
@@ -282,6 +363,9 @@ function AdminDashboard() {
                     ))}
                 </tbody>
             </table>
+            {usersNextOffset !== null && (
+                <button className="btn-gold" style={{marginTop:'15px'}} onClick={() => fetchUsers(usersNextOffset)}>Load More</button>
+            )}
         </div>
       )}
     </div>
@@ -1,19 +1,53 @@
 // frontend/src/Books.jsx
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 
 function Books() {
   const [query, setQuery] = useState('');
   const [books, setBooks] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  // The query nextCursor belongs to; the box may have been edited since
+  const [cursorQuery, setCursorQuery] = useState('');
   const [loading, setLoading] = useState(false);
+  const [fuzzy, setFuzzy] = useState(false);
   const role = localStorage.getItem('role');
   const token = localStorage.getItem('token');
 
+  // Type-ahead: ask /books/suggest once typing pauses (served from memory, no search)
+  const [suggestions, setSuggestions] = useState([]);
+  useEffect(() => {
+    if (query.trim().length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await axios.get('http://127.0.0.1:8000/books/suggest', { params: { q: query } });
+        if (!cancelled) setSuggestions(res.data.suggestions);
+      } catch (err) {
+        if (!cancelled) setSuggestions([]);
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
+
   const handleSearch = async () => {
     setLoading(true);
     try {
-      const res = await axios.get(`http://127.0.0.1:8000/books/search/?query=${query}`);
-      setBooks(res.data);
+      let res = await axios.get('http://127.0.0.1:8000/books/search/', { params: { query } });
+      // Nothing spelled like that: retry typo-tolerant (single page, no cursor)
+      const retry = res.data.items.length === 0 && query.trim() !== '';
+      if (retry) {
+        res = await axios.get('http://127.0.0.1:8000/books/search/', { params: { query, mode: 'fuzzy' } });
+      }
+      setFuzzy(retry && res.data.items.length > 0);
+      setBooks(res.data.items);
+      setNextCursor(res.data.next_cursor);
+      setCursorQuery(query);
     } catch (err) {
       console.error(err);
     } finally {
@@ -21,6 +55,17 @@ function Books() {
     }
   };
 
+  // Next page of the same search (keyset cursor from the previous response)
+  const loadMore = async () => {
+    try {
+      const res = await axios.get('http://127.0.0.1:8000/books/search/', { params: { query: cursorQuery, cursor: nextCursor } });
+      setBooks(prev => [...prev, ...res.data.items]);
+      setNextCursor(res.data.next_cursor);
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
   const handleRequest = async (bookId) => {
     if (!token) {
       alert("Please login to request books.");
@@ -46,12 +91,19 @@ function Books() {
           <input 
             placeholder="Search by Title, Author, or Accession No..." 
             value={query}
+            list="book-suggestions"
             onChange={(e) => setQuery(e.target.value)}
+            onKeyDown={(e) => e.key === 'Enter' && handleSearch()}
             style={{ padding: '10px', width: '60%', borderRadius: '5px', border: '1px solid #ccc' }}
           />
+          <datalist id="book-suggestions">
+            {suggestions.map(s => <option key={`${s.field}:${s.text}`} value={s.text}>{s.field}</option>)}
+          </datalist>
           <button className="btn-gold" onClick={handleSearch}>Search</button>
         </div>
 
+        {fuzzy && !loading && <p>No exact matches for "{query}" - showing close spellings.</p>}
+
         {loading ? <p>Loading...</p> : (
           <table>
             <thead>
@@ -93,6 +145,9 @@ function Books() {
             </tbody>
             </table>
         )}
+        {nextCursor && !loading && (
+          <button className="btn-gold" style={{ marginTop: '15px' }} onClick={loadMore}>Load More</button>
+        )}
         {books.length === 0 && !loading && <p>Type something to search...</p>}
       </div>
     </div>
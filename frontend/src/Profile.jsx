@@ -41,7 +41,7 @@ function Profile() {
         });
         alert("Photo Updated!");
         fetchProfile();
-    } catch (error) { alert("Failed to upload photo."); }
+    } catch (error) { alert(error.response?.data?.detail || "Failed to upload photo."); }
   };
 
   const handleSave = async () => {